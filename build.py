@@ -309,5 +309,13 @@ node = build.generate_image("skill_pointer_surf", "data/800x600/gfx/skill_pointe
 if node is not None: node.value = "SubSurf"
 cf.root_node.get("game").append_attribute( node )
 
+#
+ATLAS_SURFACES = ["axe_surf", "balloon_surf", "copper_surf", "diamond_surf",
+                  "dynamite_surf", "ghost_surf", "key_surf", "lamp_surf",
+                  "oiler_surf", "rock_surf", "torch_surf", "sparkle_surf"] + \
+                 ["flag%d_surf" % i for i in range(1, 7)]
+nodes = [cf.root_node.get("game." + name) for name in ATLAS_SURFACES]
+build.generate_atlas( "data/gfx/pickups_atlas.png", nodes, "data/800x600" )
+
 
 cf.save( CONFIGFILE )
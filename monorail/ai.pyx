@@ -1,8 +1,10 @@
 import copy
+import pygame
 import tiles
 import pickups
 
 cdef class AiNode #forward declaration
+cdef class NodePool #forward declaration
 
 cdef class Node:
     """An abstract node used in PredictionTree.
@@ -20,24 +22,28 @@ cdef class Node:
     cdef float score
         
     def __init__( self, AiNode smartnode, Node parent = None ):
+        self._init( smartnode, parent )
+
+    cdef void _init( Node self, AiNode smartnode, Node parent ):
         self.smartnode = smartnode
         self.parent = parent
         self.childeren = None
         self._best_score = -999
+        self.score = 0
 
         if parent is not None:
             self.generation = parent.generation+1
         else:
             self.generation = 0
 
-    cdef object generate_childeren( Node self ):
+    cdef object generate_childeren( Node self, NodePool pool ):
         """Generate and return the list of childeren nodes of this node
         """
-        childeren = self.smartnode._generate_childeren()
+        childeren = self.smartnode._generate_childeren( pool )
 
         self.childeren = []
         for child in childeren:
-            self.childeren.append( Node(child, self) )
+            self.childeren.append( pool.take_node(child, self) )
         
         return self.childeren
 
@@ -152,12 +158,83 @@ cdef class Node:
     cdef char is_leaf( Node self ):
         return (self.childeren is None) or (len( self.childeren ) == 0)
 
+cdef class NodePool:
+    """Recycles the Node and AiNode objects of discarded subtrees.
+
+    At most max_free nodes are kept, the rest is left to the garbage collector.
+    """
+
+    cdef object free_nodes
+    cdef object free_smartnodes
+    cdef int max_free
+
+    def __init__( self, int max_free = 256*2 ):
+        self.free_nodes = []
+        self.free_smartnodes = []
+        self.max_free = max_free
+
+    cdef Node take_node( NodePool self, AiNode smartnode, Node parent ):
+        cdef Node node
+
+        if len( self.free_nodes ) > 0:
+            node = self.free_nodes.pop()
+            node._init( smartnode, parent )
+        else:
+            node = Node( smartnode, parent )
+        return node
+
+    cdef AiNode take_smartnode( NodePool self, AiNode parent ):
+        cdef AiNode smartnode
+
+        if len( self.free_smartnodes ) > 0:
+            smartnode = self.free_smartnodes.pop()
+            smartnode.parent = parent
+        else:
+            smartnode = AiNode( parent )
+        return smartnode
+
+    cdef void release( NodePool self, Node node ):
+        """Recycle node and all its descendants."""
+        cdef AiNode smartnode
+
+        stack = [node]
+        while len( stack ) > 0:
+            node = stack.pop()
+            if node.childeren is not None:
+                stack.extend( node.childeren )
+
+            smartnode = node.smartnode
+            if smartnode is not None and \
+               len( self.free_smartnodes ) < self.max_free:
+                smartnode.parent = None
+                smartnode.trailnode = None
+                smartnode.carstate = None
+                smartnode.playfieldstate = None
+                smartnode.other_trees = None
+                smartnode.score_table = None
+                self.free_smartnodes.append( smartnode )
+
+            if len( self.free_nodes ) < self.max_free:
+                node.smartnode = None
+                node.parent = None
+                node.childeren = None
+                self.free_nodes.append( node )
+
+    def get_free_count( self ):
+        return len( self.free_nodes )
+
+
 cdef enum:
-    CYCLES_PER_UPDATE = 256*4
-    
+    TIMED_CYCLES = 16 # cycles between two clock checks when using time_budget
+
 cdef class PredictionTree:
     """A tree structure that contains all possible future moves with scores.
 
+    The work done per update is limited by CYCLES_PER_UPDATE, or, when
+    time_budget (milliseconds) is set, by the time spent on the pygame
+    clock. Without an initialized pygame, the cycle budget is used.
+    max_generations limits the depth of the tree, 0 means unlimited.
+
     Public members:
     - root_node: the root node of this tree
     - total_generations: the total generations of this tree
@@ -168,26 +245,41 @@ cdef class PredictionTree:
     cdef readonly object generations
     cdef int MAX_NODES
     cdef int CYCLES_PER_UPDATE
+    cdef public int max_generations
+    cdef public float time_budget
     cdef readonly object nodes_calc
+    cdef readonly NodePool pool
+    cdef object occupancies
     cdef object leafs
     cdef int node_cnt
 
-    def __init__( self, int MAX_NODES = 256*2, int CYCLES_PER_UPDATE = 256 ):
+    def __init__( self, int MAX_NODES = 256*2, int CYCLES_PER_UPDATE = 256,
+                  int max_generations = 0, float time_budget = 0 ):
         self.root_node = None
         self.total_generations = 0
         self.generations = []
         self.MAX_NODES = MAX_NODES
         self.nodes_calc = None
         self.CYCLES_PER_UPDATE = CYCLES_PER_UPDATE
+        self.max_generations = max_generations
+        self.time_budget = time_budget
+        self.pool = NodePool( MAX_NODES )
+        self.occupancies = {}
+        self.leafs = []
         self.node_cnt = 0
 
         
     def update( self ):
-        """Update the tree as much as possible, using CYCLES_PER_UPDATE as upper limit.
+        """Update the tree as much as possible within the cycle or time budget.
         """
         cdef int cycles_left
         
-        if self.root_node is not None:
+        if self.root_node is None:
+            return
+
+        if self.time_budget > 0 and pygame.get_init():
+            self._update_timed()
+        else:
             cycles_left = self.CYCLES_PER_UPDATE*2/3 # We make sure we calculate all in limited time
             cycles_left = self._update_tree( cycles_left )
             
@@ -196,45 +288,77 @@ cdef class PredictionTree:
             
             self._update_tree( cycles_left )
 
+    cdef void _update_timed( PredictionTree self ):
+        """Same as the cycle limited update, but spends time_budget instead.
+        """
+        start = pygame.time.get_ticks()
+        budget = self.time_budget
+
+        # The cycle functions return the unused cycles, so any leftover
+        # means that there is nothing more to do.
+        while pygame.time.get_ticks() - start < budget * 2/3:
+            if self._update_tree( TIMED_CYCLES ) > 0:
+                break
+
+        while pygame.time.get_ticks() - start < budget:
+            if self._calc_nodes_scores( TIMED_CYCLES ) > 0:
+                break
+
+        while pygame.time.get_ticks() - start < budget:
+            if self._update_tree( TIMED_CYCLES ) > 0:
+                break
+
     def set_root( self, Node node ):        
         """Change the root node in an optimized way.
 
         If the node equals a child of the current root, then the current tree is
-        reused.
+        reused. The discarded nodes are recycled for new childeren.
         """
-        cdef char found
-        cdef Node child
+        cdef Node child, new_root
         
-        found = False
+        new_root = None
         # first try one of its childeren
-        if self.root_node is not None:
+        if self.root_node is not None and self.root_node.childeren is not None:
             for child in self.root_node.childeren:
                 if child.smartnode.equals(node.smartnode):
-                    found = True
-                    self.root_node = child
-                    self.root_node.parent = None
-                    self.total_generations = self.total_generations - 1
-                    self.nodes_calc = [self.root_node] # Recalculate scores of nodes
-                
-        if not found:
+                    new_root = child
+                    break
+
+        if new_root is not None:
+            for child in self.root_node.childeren:
+                if child is not new_root:
+                    self.pool.release( child )
+
+            # the old root only lives on as smartnode parent of the new root
+            self.root_node.smartnode.parent = None
+            self.root_node.childeren = None
+
+            self.root_node = new_root
+            self.root_node.parent = None
+            self.total_generations = self.total_generations - 1
+            self.nodes_calc = [self.root_node] # Recalculate scores of nodes
+        else:
 ##            print "recalc",
+            if self.root_node is not None and \
+               node.get_generation( self.root_node ) == -1:
+                self.pool.release( self.root_node )
+
             self.root_node = node
-            self.leafs = [self.root_node]
             self.total_generations = 0
             self.nodes_calc = [self.root_node] # Recalculate scores of nodes
-##        else:
-##            print "norecalc"
 
         self._update_generations()
 
     cdef void _update_generations( PredictionTree self ):
-        """Update our generation nodes
+        """Update our generation nodes and the leafs that still need childeren
         """
         assert self.root_node is not None, "Don't call this when root_node is None"
 
         cdef Node node
 
         self.generations = []
+        self.occupancies = {}
+        self.leafs = []
         self.node_cnt = 0
 
         generation = [self.root_node]
@@ -246,6 +370,8 @@ cdef class PredictionTree:
                 childeren = node.childeren
                 if childeren is not None:
                     next_generation.extend( childeren )
+                else:
+                    self.leafs.append( node )
                 
             self.generations.append( generation )
             generation = next_generation
@@ -265,9 +391,12 @@ cdef class PredictionTree:
             node = self.leafs.pop(0)
 ##            node.set_score( node.calc_score() )
             gen = node.get_generation( self.root_node )
+            if self.max_generations > 0 and gen >= self.max_generations:
+                continue # expanded again when the root moves on
+
             if gen <> -1: # else it's a leaf of old root_node
                 self.total_generations = gen - 1
-                nodes = node.generate_childeren()
+                nodes = node.generate_childeren( self.pool )
                 self.node_cnt = self.node_cnt + len(nodes)
                 self.leafs.extend( nodes )
 
@@ -301,6 +430,19 @@ cdef class PredictionTree:
                                 
         return cycles_left
         
+    def get_occupancy( self, gen ):
+        """Return the TileOccupancy of a generation, or None if it's empty.
+        """
+        nodes = self.get_nodes_of_generation( gen )
+        if len( nodes ) == 0:
+            return None
+
+        occupancy = self.occupancies.get( gen )
+        if occupancy is None or not occupancy.is_valid( nodes ):
+            occupancy = TileOccupancy( nodes, gen )
+            self.occupancies[ gen ] = occupancy
+        return occupancy
+
     def get_nodes_of_generation( self, gen ):
         """Return all the nodes of the generation.
         """
@@ -311,44 +453,146 @@ cdef class PredictionTree:
         
 
 class PlayfieldState:
-    
+    """Snapshot of the pickups on the playfield, used for looking ahead.
+
+    The snapshot pickups are shared between clones. Which of them are still
+    available is kept in a bitset on the level tile indices, so cloning and
+    removing a pickup don't copy any lists.
+    """
+
     def __init__( self, playfield ):
         self.playfield = playfield
-
-        self.pickups = []
-        for tile in self.playfield.level.tiles:
-            if tile.pickup is not None:
-                self.pickups.append( [tile, tile.pickup] )
+        self.reset()
 
     def reset( self ):
-        self.pickups = []
-        for tile in self.playfield.level.tiles:
-            if tile.pickup is not None:
-                self.pickups.append( [tile, tile.pickup] )
-        
+        self.pickups = {}
+        self.available = 0
+        tiles = self.playfield.level.tiles
+        for i in range( len( tiles ) ):
+            if tiles[i].pickup is not None:
+                self.pickups[ i ] = tiles[i].pickup
+                self.available = self.available | (1 << i)
+
     def get_pickup( self, tile ):
-#        self.reset() # FIXME: remove me and work with real playfieldstate
-        for (t, pickup) in self.pickups:
-            if tile is t:
-                return pickup
-            
+        index = self.playfield.level.get_tile_index( tile )
+        if index is not None and (self.available >> index) & 1:
+            return self.pickups[ index ]
+
         return None
 
     def remove_pickup( self, tile ):
-        remove_index = None
-        i = 0
-        for (t, pickup) in self.pickups:
-            if tile is t:
-                remove_index = i
-            i = i + 1
-
-        if remove_index is not None:
-            del self.pickups[remove_index]
+        index = self.playfield.level.get_tile_index( tile )
+        if index is not None:
+            self.available = self.available & ~(1 << index)
 
     def clone( self ):
-        clone = PlayfieldState( self.playfield )
-        clone.pickups = copy.copy( self.pickups )
-        return clone
+        return copy.copy( self )
+
+
+# Pickup kinds, in the order they used to be tested
+PICKUP_CLASSES = [pickups.CopperCoin, pickups.GoldBlock, pickups.RockBlock,
+                  pickups.Diamond, pickups.Dynamite, pickups.Lamp, pickups.Axe,
+                  pickups.Flag, pickups.Leprechaun, pickups.Torch, pickups.Key,
+                  pickups.Mirror, pickups.Oiler, pickups.Multiplier,
+                  pickups.Balloon, pickups.Ghost]
+COPPER_COIN, GOLD_BLOCK, ROCK_BLOCK, DIAMOND, DYNAMITE, LAMP, AXE, FLAG, \
+LEPRECHAUN, TORCH, KEY, MIRROR, OILER, MULTIPLIER, BALLOON, GHOST, \
+GOLD_BLOCK_AXE, DIAMOND_DROP, KIND_COUNT = range( 19 )
+
+_pickup_kinds = {}
+
+def get_pickup_kind( pickup ):
+    """Return the kind of the pickup, or None if it's not scored"""
+    cls = pickup.__class__
+    try:
+        return _pickup_kinds[ cls ]
+    except KeyError:
+        kind = None
+        for i in range( len( PICKUP_CLASSES ) ):
+            if issubclass( cls, PICKUP_CLASSES[i] ):
+                kind = i
+                break
+        _pickup_kinds[ cls ] = kind
+        return kind
+
+class ScoreTable:
+    """The scores an AI gives to the pickups on its path.
+
+    Scores are named after the pickup class, with two extras:
+    - GoldBlockAxe: GoldBlock when the car has an Axe
+    - DiamondDrop: bringing a Diamond to a portal
+    """
+    NAMES = [cls.__name__ for cls in PICKUP_CLASSES] + ["GoldBlockAxe", "DiamondDrop"]
+    DEFAULTS = [1, 0.1, -1, 1, -8, 5, 2, 1, -2, 0, 1, 1, 1, 1, 0, 1, 1, 2]
+
+    def __init__( self, scores = None ):
+        """scores is a dictionary name -> score, missing names get defaults"""
+        self.scores = list( ScoreTable.DEFAULTS )
+        if scores is not None:
+            for name, score in scores.items():
+                self.scores[ ScoreTable.NAMES.index( name ) ] = float( score )
+
+    def get_score( self, pickup, carstate ):
+        """Return the score of pickup for a car in carstate"""
+        kind = get_pickup_kind( pickup )
+        if kind is None:
+            return 0
+        elif kind == GOLD_BLOCK:
+            if isinstance( carstate.collectible, pickups.Axe ):
+                kind = GOLD_BLOCK_AXE
+        elif kind == DIAMOND:
+            if isinstance( carstate.collectible, pickups.Diamond ):
+                return 0
+        elif kind == FLAG:
+            if carstate.goldcar.nr <> pickup.goldcar.nr:
+                return 0
+        return self.scores[ kind ]
+
+DEFAULT_SCORE_TABLE = ScoreTable()
+
+
+class TileOccupancy:
+    """The chance that a car is on a tile, for one generation of its tree.
+
+    Each node counts for 5 / len(nodes) / max(generation, 1), which
+    is multiplied with the collectible value (1 good, -1 bad, 0 none).
+    """
+
+    def __init__( self, nodes, generation ):
+        goldcar = nodes[0].smartnode.carstate.goldcar
+        self.nodes = nodes
+        self.node_cnt = len( nodes )
+        self.collectible = goldcar.collectible
+        self.value = get_collectible_value( goldcar.collectible )
+
+        weight = 5.0 / len( nodes ) / max( generation, 1 )
+        self.tiles = {}
+        self.tile_dirs = {}
+        for node in nodes:
+            trailnode = node.smartnode.trailnode
+            key = (trailnode.tile, trailnode.in_dir)
+            self.tiles[ trailnode.tile ] = self.tiles.get( trailnode.tile, 0 ) + weight
+            self.tile_dirs[ key ] = self.tile_dirs.get( key, 0 ) + weight
+
+    def is_valid( self, nodes ):
+        """Return False when the nodes or the car collectible changed"""
+        return nodes is self.nodes and len( nodes ) == self.node_cnt and \
+               nodes[0].smartnode.carstate.goldcar.collectible is self.collectible
+
+    def get_weight( self, tile ):
+        return self.tiles.get( tile, 0 )
+
+    def get_crossing_weight( self, tile, in_dir ):
+        """Weight of the nodes on tile that don't come from in_dir"""
+        return self.tiles.get( tile, 0 ) - self.tile_dirs.get( (tile, in_dir), 0 )
+
+def get_collectible_value( collectible ):
+    if collectible is None:
+        return 0
+    elif collectible.is_good():
+        return 1
+    else:
+        return -1
 
 
 def AiNode_create( goldcarstate, trailnode = None ):
@@ -358,6 +602,7 @@ def AiNode_create( goldcarstate, trailnode = None ):
     self.carstate = goldcarstate
     self.playfieldstate = None
     self.other_trees = None
+    self.score_table = DEFAULT_SCORE_TABLE
 
     return self
 
@@ -370,6 +615,7 @@ cdef class AiNode:
     cdef public object carstate
     cdef public object playfieldstate
     cdef public object other_trees
+    cdef public object score_table
     
     def __init__( self, parent ):
         """Creates a new instance when a parent is known.
@@ -378,17 +624,24 @@ cdef class AiNode:
         """
         self.parent = parent
 
-    cdef object _generate_childeren( AiNode self ):
+    cdef object _generate_childeren( AiNode self, NodePool pool ):
         """Generate and return the list of childeren nodes of this node
         """
+        cdef AiNode node
+
         childeren = []
-        trailnodes = self.trailnode.get_out_nodes()
+        if self.playfieldstate is not None:
+            graph = self.playfieldstate.playfield.level.get_path_graph()
+            trailnodes = graph.get_out_nodes( self.trailnode )
+        else:
+            trailnodes = self.trailnode.get_out_nodes()
         for n in trailnodes:
-            node = AiNode( self )
+            node = pool.take_smartnode( self )
 
             node.carstate       = self.carstate
             node.playfieldstate = self.playfieldstate
             node.other_trees  = self.other_trees
+            node.score_table  = self.score_table
             
             node.trailnode = n
             childeren.append( node )
@@ -398,6 +651,9 @@ cdef class AiNode:
     def set_playfield( self, playfield ):
         self.playfieldstate = PlayfieldState( playfield )
         
+    def set_score_table( self, score_table ):
+        self.score_table = score_table
+
     def set_other_trees( self, other_trees ):
         self.other_trees = other_trees
 
@@ -426,7 +682,7 @@ cdef class AiNode:
             if isinstance( node.carstate.collectible, pickups.Diamond ):                
                 node.carstate = copy.copy( node.carstate )
                 node.carstate.collectible = None
-                score = score + 2
+                score = score + self.score_table.scores[ DIAMOND_DROP ]
 
         score = score + self._calc_tile_pickups( node )
         score = score + self._calc_other_cars( node, distance )
@@ -439,43 +695,8 @@ cdef class AiNode:
         score = 0
         
         if node.playfieldstate.get_pickup( node.trailnode.tile ) <> None:
-            if isinstance(node.trailnode.tile.pickup, pickups.CopperCoin):
-                score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.GoldBlock):
-                if isinstance( node.carstate.collectible, pickups.Axe ):
-                    score = 1
-                else:
-                    score = 0.1
-            elif isinstance(node.trailnode.tile.pickup, pickups.RockBlock):
-                 score = -1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Diamond):
-                if not isinstance( node.carstate.collectible, pickups.Diamond ):
-                    score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Dynamite):
-                 score = -8
-            elif isinstance(node.trailnode.tile.pickup, pickups.Lamp):
-                 score = 5
-            elif isinstance(node.trailnode.tile.pickup, pickups.Axe):
-                 score = 2
-            elif isinstance(node.trailnode.tile.pickup, pickups.Flag):
-                 if self.carstate.goldcar.nr == node.trailnode.tile.pickup.goldcar.nr:
-                     score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Leprechaun):
-                 score = -2
-            elif isinstance(node.trailnode.tile.pickup, pickups.Torch):
-                 score = 0
-            elif isinstance(node.trailnode.tile.pickup, pickups.Key):
-                 score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Mirror):
-                 score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Oiler):
-                 score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Multiplier):
-                 score = 1
-            elif isinstance(node.trailnode.tile.pickup, pickups.Balloon):
-                 score = 0
-            elif isinstance(node.trailnode.tile.pickup, pickups.Ghost):
-                 score = 1
+            if node.trailnode.tile.pickup is not None:
+                score = self.score_table.get_score( node.trailnode.tile.pickup, node.carstate )
             
             if isinstance( node.trailnode.tile.pickup, pickups.Collectible ):
                 node.carstate = copy.copy( node.carstate )
@@ -490,42 +711,24 @@ cdef class AiNode:
         return score
 
     cdef float _calc_other_cars( AiNode self, AiNode node, int distance ):
-        cdef float score
-        cdef Node ai_node
-        cdef AiNode othernode
+        cdef float score, own_value
         
         score = 0
+        own_value = get_collectible_value( node.carstate.goldcar.collectible )
 
         for tree in self.other_trees:
-            gen_nodes = tree.get_nodes_of_generation( distance )
-            for ai_node in gen_nodes:
-                othernode = ai_node.smartnode
-                if node.trailnode.tile is othernode.trailnode.tile:
-                    if othernode.carstate.goldcar.collectible is not None:
-                        if othernode.carstate.goldcar.collectible.is_good():
-                            score = score + 5.0 / len( gen_nodes ) /  max(distance, 1)
-                        elif othernode.carstate.goldcar.collectible.is_bad():
-                            score = score - 5.0 / len( gen_nodes ) /  max(distance, 1)
-                    if node.carstate.goldcar.collectible is not None:
-                        if node.carstate.goldcar.collectible.is_good():
-                            score = score - 5.0 / len( gen_nodes ) /  max(distance, 1)
-                        elif node.carstate.goldcar.collectible.is_bad():
-                            score = score + 5.0 / len( gen_nodes ) /  max(distance, 1)
-
-                # Calc parent node when crossing (can pass by)
-                if node.parent is not None and\
-                   node.parent.trailnode.tile is othernode.trailnode.tile and\
-                   node.parent.trailnode.in_dir != othernode.trailnode.in_dir:
-                    if othernode.carstate.goldcar.collectible is not None:
-                        if othernode.carstate.goldcar.collectible.is_good():
-                            score = score + 5.0 / len( gen_nodes ) /  max(distance, 1)
-                        elif othernode.carstate.goldcar.collectible.is_bad():
-                            score = score - 5.0 / len( gen_nodes ) /  max(distance, 1)
-                    if node.parent.carstate.goldcar.collectible is not None:
-                        if node.parent.carstate.goldcar.collectible.is_good():
-                            score = score - 5.0 / len( gen_nodes ) /  max(distance, 1)
-                        elif node.parent.carstate.goldcar.collectible.is_bad():
-                            score = score + 5.0 / len( gen_nodes ) /  max(distance, 1)
+            occupancy = tree.get_occupancy( distance )
+            if occupancy is None:
+                continue
+
+            score = score + (occupancy.value - own_value) * \
+                            occupancy.get_weight( node.trailnode.tile )
+
+            # Calc parent node when crossing (can pass by)
+            if node.parent is not None:
+                score = score + (occupancy.value - own_value) * \
+                                occupancy.get_crossing_weight( node.parent.trailnode.tile,
+                                                               node.parent.trailnode.in_dir )
                         
         return score
 
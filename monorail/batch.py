@@ -0,0 +1,236 @@
+"""Plays many headless matches across a process pool.
+
+Every combination of level, AI iq and seed is played as a Simulation, and
+the result of each match is written as a row to a CSV or JSON file.
+
+Usage: batch.py [options] output.csv|output.json
+"""
+
+import sys
+import csv
+import json
+import time
+import gettext
+import multiprocessing
+from collections import OrderedDict
+from optparse import OptionParser
+
+import scenarios
+from scenarios import *
+import control as ctrl
+from simulation import Simulation
+
+RANDOM_TIMEOUT = 120
+MAX_TICKS = 25 * 60 * 10
+
+RESULT_FIELDS = ["quest", "index", "level_nr", "scenario", "player_iq",
+                 "opponent_iqs", "seed", "finished", "won", "scores",
+                 "completed_time", "ticks", "wall_time", "ticks_per_second"]
+
+def parse_range( text ):
+    """Return the list of numbers in a text like "0-10,15"."""
+    numbers = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            numbers.extend( range( int(first), int(last) + 1 ) )
+        else:
+            numbers.append( int(part) )
+    return numbers
+
+def create_random_scenario( scenario_class ):
+    """Return a scenario like RandomQuest would create it."""
+    if scenario_class in [ScenarioCoinCollect, ScenarioDiamondCollect]:
+        return scenario_class( RANDOM_TIMEOUT, None, 1, [] )
+    else:
+        return scenario_class( RANDOM_TIMEOUT, None, [] )
+
+def create_jobs( options ):
+    """Return a job for each match that should be played."""
+    levels = []
+    if options.quest == "main":
+        quest = QuestManager.get_instance().get_quest( QuestManager.MAIN_QUEST )
+
+        indices = range( quest.get_level_count() )
+        if options.levels is not None:
+            indices = parse_range( options.levels )
+
+        for i in indices:
+            opponent_iqs = quest.opponent_iqs_list[i]
+            levels.append( (i, quest.level_nrs[i], quest.scenarios[i], opponent_iqs) )
+    else:
+        level_nrs = range( RandomQuest.MIN_LEVEL, RandomQuest.MAX_LEVEL + 1 )
+        if options.levels is not None:
+            level_nrs = parse_range( options.levels )
+
+        scenario_names = options.scenarios.split(",")
+        for level_nr in level_nrs:
+            for name in scenario_names:
+                scenario_class = getattr( scenarios, "Scenario" + name )
+                opponent_iqs = [1.0 for i in range( options.opponents )]
+                levels.append( (level_nr, level_nr, create_random_scenario( scenario_class ),
+                                opponent_iqs) )
+
+    iqs = [None]
+    if options.iqs is not None:
+        iqs = [float(iq) for iq in options.iqs.split(",")]
+
+    jobs = []
+    for index, level_nr, scenario, opponent_iqs in levels:
+        for iq in iqs:
+            iq_list = opponent_iqs
+            if iq is not None:
+                iq_list = [iq for i in opponent_iqs]
+            for seed in range( options.matches ):
+                jobs.append( {"quest": options.quest,
+                              "index": index,
+                              "level_nr": level_nr,
+                              "scenario": scenario,
+                              "player_iq": options.player_iq,
+                              "opponent_iqs": iq_list,
+                              "seed": seed,
+                              "max_ticks": options.max_ticks} )
+    return jobs
+
+def init_worker():
+    # The scenario texts are not shown, so no translation is needed
+    gettext.install( "monorail" )
+
+def run_job( job ):
+    """Play the match of job and return its result row."""
+    controllers = [ctrl.AiController( None, job["player_iq"] )]
+    for iq in job["opponent_iqs"]:
+        controllers.append( ctrl.AiController( None, iq ) )
+
+    sim = Simulation( job["level_nr"], job["scenario"], controllers, job["seed"] )
+    sim.run( job["max_ticks"] )
+
+    result = sim.get_results()
+    result["quest"] = job["quest"]
+    result["index"] = job["index"]
+    result["player_iq"] = job["player_iq"]
+    result["opponent_iqs"] = job["opponent_iqs"]
+    return result
+
+class CsvWriter:
+    """Writes result rows to a CSV file, one line per result."""
+
+    def __init__( self, out_file ):
+        self.out_file = out_file
+        self.writer = csv.writer( out_file )
+        self.writer.writerow( RESULT_FIELDS )
+
+    def write( self, result ):
+        row = []
+        for field in RESULT_FIELDS:
+            value = result[field]
+            if isinstance( value, list ):
+                value = ";".join( [str(v) for v in value] )
+            row.append( value )
+        self.writer.writerow( row )
+        self.out_file.flush()
+
+    def close( self ):
+        pass
+
+class JsonWriter:
+    """Writes result rows to a JSON list, one line per result."""
+
+    def __init__( self, out_file ):
+        self.out_file = out_file
+        self.row_count = 0
+        self.out_file.write( "[" )
+
+    def write( self, result ):
+        if self.row_count > 0:
+            self.out_file.write( "," )
+        self.out_file.write( "\n" )
+        json.dump( OrderedDict([(field, result[field]) for field in RESULT_FIELDS]),
+                   self.out_file )
+        self.out_file.flush()
+        self.row_count += 1
+
+    def close( self ):
+        self.out_file.write( "\n]\n" )
+
+def write_csv( results, out_file ):
+    writer = CsvWriter( out_file )
+    for result in results:
+        writer.write( result )
+    writer.close()
+
+def write_json( results, out_file ):
+    writer = JsonWriter( out_file )
+    for result in results:
+        writer.write( result )
+    writer.close()
+
+def run_batch( jobs, writer, processes = None ):
+    """Play all jobs across a pool with a process for each core.
+
+    Each result is handed to writer as soon as its match is done, so the
+    rows of finished matches are kept when the batch is interrupted.
+    Return the number of played matches.
+    """
+    pool = multiprocessing.Pool( processes, init_worker )
+    count = 0
+    try:
+        for result in pool.imap( run_job, jobs ):
+            writer.write( result )
+            count += 1
+            print >> sys.stderr, "%d/%d level %d: %s" % \
+                  (count, len(jobs), result["level_nr"], result["scores"])
+    except:
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+    return count
+
+def create_parser():
+    parser = OptionParser( usage = "%prog [options] output.csv|output.json" )
+    parser.add_option( "-q", "--quest", choices = ["main", "random"], default = "main",
+                       help = "main quest levels, or random levels like RandomQuest" )
+    parser.add_option( "-l", "--levels", default = None,
+                       help = "quest indices (main) or level numbers (random), like 0-10,15" )
+    parser.add_option( "-s", "--scenarios", default = "CoinCollect",
+                       help = "scenarios for random levels, like CoinCollect,Race" )
+    parser.add_option( "-o", "--opponents", type = "int", default = 2,
+                       help = "number of opponents on random levels" )
+    parser.add_option( "-i", "--iqs", default = None,
+                       help = "opponent iqs to sweep, like 0.1,0.5,1.0" )
+    parser.add_option( "-p", "--player-iq", type = "float", default = 1.0,
+                       help = "iq of the AI that plays the player goldcar" )
+    parser.add_option( "-n", "--matches", type = "int", default = 1,
+                       help = "number of matches (seeds) per combination" )
+    parser.add_option( "-t", "--max-ticks", type = "int", default = MAX_TICKS,
+                       help = "stop matches that take longer" )
+    parser.add_option( "-j", "--processes", type = "int", default = None,
+                       help = "number of processes, default one per core" )
+    return parser
+
+def main():
+    parser = create_parser()
+    options, args = parser.parse_args()
+    if len( args ) != 1:
+        parser.error( "no output file given" )
+
+    init_worker()
+    jobs = create_jobs( options )
+
+    out_file = open( args[0], "wb" )
+    if args[0].endswith(".json"):
+        writer = JsonWriter( out_file )
+    else:
+        writer = CsvWriter( out_file )
+
+    start = time.time()
+    try:
+        count = run_batch( jobs, writer, options.processes )
+        print >> sys.stderr, "%d matches in %.1f sec" % (count, time.time() - start)
+    finally:
+        writer.close()
+        out_file.close()
+
+if __name__ == "__main__":
+    main()
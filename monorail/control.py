@@ -12,6 +12,14 @@ class GroundControl:
     """The main control center that interacts with the model
     """
 
+    # Budgets of the prediction trees, see ai.PredictionTree
+    MAX_NODES = 256*2
+    CYCLES_PER_UPDATE = 256/4
+    MAX_GENERATIONS = 0 # unlimited
+    TIME_BUDGET = 0 # milliseconds per tick, 0 uses CYCLES_PER_UPDATE instead
+
+    views = None
+
     def __init__( self, playfield ):
         self.playfield = playfield
         self.controllers = []
@@ -21,7 +29,7 @@ class GroundControl:
 
     def game_tick( self, indev ):
         # for debugging
-        if hasattr(self, "views"):
+        if self.views is not None:
             self.views[0].game_tick( indev )
 
         # check each goldcar's keys
@@ -30,7 +38,7 @@ class GroundControl:
 
         # check mouse switching
         if indev.mouse.went_down( Mouse.LEFT ):
-            mouse_x, mouse_y = pygame.mouse.get_pos()
+            mouse_x, mouse_y = indev.mouse.pos.x, indev.mouse.pos.y
 
             X_OFFSET, Y_OFFSET = 20, 300
 
@@ -70,7 +78,8 @@ class GroundControl:
             controller.set_ground_control( self )
             self.controllers.append( controller )
 
-            prediction_tree = ai.PredictionTree(256*2, 256/4)
+            prediction_tree = ai.PredictionTree( self.MAX_NODES, self.CYCLES_PER_UPDATE,
+                                                 self.MAX_GENERATIONS, self.TIME_BUDGET )
             self.prediction_trees.append( prediction_tree )
 
             controller.prediction_tree = prediction_tree
@@ -86,9 +95,11 @@ class GroundControl:
             car = self.playfield.goldcars[i]
 
             if car.pos is not None:
-                car_node = ai.AiNode_create( GoldcarNodeState(car), TrailNode(car.pos.tile, car.pos.get_in_direction()) )
+                trailnode = self.playfield.level.get_path_graph().get_trailnode( car.pos.tile, car.pos.get_in_direction() )
+                car_node = ai.AiNode_create( GoldcarNodeState(car), trailnode )
                 car_node.set_playfield( self.playfield )
                 car_node.set_other_trees( self._get_other_prediction_trees(car) )
+                car_node.set_score_table( self.controllers[i].score_table )
 
                 if prediction_tree.root_node is None:
                     prediction_tree.set_root( ai.Node(car_node) )
@@ -133,12 +144,14 @@ class Controller:
 
     public members:
     - prediction_tree: the prediction tree of the goldcar
+    - score_table: the ai.ScoreTable used to predict the goldcar
     """
 
     def __init__( self, goldcar ):
         """goldcar can be None"""
         self.goldcar = goldcar
         self.prediction_tree = None
+        self.score_table = ai.DEFAULT_SCORE_TABLE
 
     def set_goldcar( self, goldcar ):
         self.goldcar = goldcar
@@ -168,12 +181,14 @@ class GoldcarNodeState:
 
 
 class AiController( Controller ):
-    def __init__( self, goldcar, iq = 1.0 ):
-        """goldcar can be None"""
+    def __init__( self, goldcar, iq = 1.0, score_table = None ):
+        """goldcar can be None, score_table None uses the default scores"""
         Controller.__init__( self, goldcar )
         self.prev_switch = None
         self.best_dir = None
         self.iq = iq
+        if score_table is not None:
+            self.score_table = score_table
 
     def do_tick( self, indev ):
         if self.goldcar.switch is not None:
@@ -193,9 +208,10 @@ class AiController( Controller ):
 
     # TODO: improve algorithm here!
     def find_switch_node( self ):
+        switch_node = ai.AiNode_create( None, TrailNode(self.goldcar.switch, self.goldcar.switch_dir) )
         node_it = self.prediction_tree.root_node
         while node_it is not None and \
-              node_it.smartnode.nequals(ai.AiNode_create( None, TrailNode(self.goldcar.switch, self.goldcar.switch_dir) ) ):
+              node_it.smartnode.nequals( switch_node ):
             childeren = node_it.get_childeren()
             if childeren is not None and len( childeren ) > 0:
                 best_childs = node_it.get_best_childs()
@@ -36,10 +36,30 @@ class Point (object):
         return self.life >= 0
 
 class Event (object):
+    views = None
 
     def __init__( self ):
         self.points = []
         self.play_fuse = False
+        self.is_headless = False
+
+    @staticmethod
+    def set_headless( is_headless ):
+        """When headless, no sounds are played and no score points are made.
+
+        This allows the model to run without pygame display or mixer.
+        """
+        Event.instance.is_headless = is_headless
+
+    @staticmethod
+    def play_sound( name ):
+        if not Event.instance.is_headless:
+            resman.get( name ).play()
+
+    @staticmethod
+    def add_point( score, carpos ):
+        if not Event.instance.is_headless:
+            Event.instance.points.append( Point( score, carpos.get_screen_position() ) )
 
     @staticmethod
     def update():
@@ -50,7 +70,9 @@ class Event (object):
                 new_points.append( point )
         Event.instance.points = new_points
 
-        if Event.instance.play_fuse and \
+        if Event.instance.is_headless:
+            pass
+        elif Event.instance.play_fuse and \
            not resman.get("game.fuse_sound").is_playing():
             resman.get("game.fuse_sound").play(-1)
         elif not Event.instance.play_fuse and \
@@ -64,93 +86,93 @@ class Event (object):
 
     @staticmethod
     def dynamite_tick():
-        resman.get("game.dynamite_tick_sound").play()
+        Event.play_sound( "game.dynamite_tick_sound" )
 
     @staticmethod
     def coin_pickup( score, carpos ):
-        resman.get("game.coin_sound").play()
+        Event.play_sound( "game.coin_sound" )
 
-        Event.instance.points.append( Point( score, carpos.get_screen_position() ) )
+        Event.add_point( score, carpos )
 
     @staticmethod
     def flag_pickup( score, carpos ):
-        resman.get("game.collect_sound").play()
+        Event.play_sound( "game.collect_sound" )
 
-        Event.instance.points.append( Point( score, carpos.get_screen_position() ) )
+        Event.add_point( score, carpos )
 
     @staticmethod
     def carhit():
-        resman.get("game.carhit_sound").play()
+        Event.play_sound( "game.carhit_sound" )
 
     @staticmethod
     def clock_ring():
-        resman.get("game.clockring_sound").play()
+        Event.play_sound( "game.clockring_sound" )
 
     @staticmethod
     def clock():
-        resman.get("game.clock_sound").play()
+        Event.play_sound( "game.clock_sound" )
 
     @staticmethod
     def diamond():
-        resman.get("game.diamond_sound").play()
+        Event.play_sound( "game.diamond_sound" )
 
     @staticmethod
     def collect( score, carpos ):
-        resman.get("game.collect_sound").play()
+        Event.play_sound( "game.collect_sound" )
 
-        Event.instance.points.append( Point( score, carpos.get_screen_position() ) )
+        Event.add_point( score, carpos )
 
     @staticmethod
     def fireworks_start():
-        resman.get("gui.fireworks0_sound").play()
+        Event.play_sound( "gui.fireworks0_sound" )
 
     @staticmethod
     def fireworks_explode():
-        resman.get("gui.fireworks%d_sound" % random.randint(1,3)).play()
+        Event.play_sound( "gui.fireworks%d_sound" % random.randint(1,3) )
 
     @staticmethod
     def explosion():
-        resman.get("game.explosion_sound").play()
+        Event.play_sound( "game.explosion_sound" )
 
     @staticmethod
     def pickaxe():
-        resman.get("game.pickaxe_sound").play()
+        Event.play_sound( "game.pickaxe_sound" )
 
     @staticmethod
     def pickaxe_pickup():
-        resman.get("game.pickaxe_pickup_sound").play()
+        Event.play_sound( "game.pickaxe_pickup_sound" )
 
     @staticmethod
     def pickup():
-        resman.get("game.pickup_sound").play()
+        Event.play_sound( "game.pickup_sound" )
 
     @staticmethod
     def lamp():
-        resman.get("game.pickaxe_pickup_sound").play()
+        Event.play_sound( "game.pickaxe_pickup_sound" )
 
     @staticmethod
     def rock():
-        resman.get("game.pickaxe_pickup_sound").play()
+        Event.play_sound( "game.pickaxe_pickup_sound" )
 
     @staticmethod
     def rock_drop():
-        resman.get("game.rock_sound").play()
+        Event.play_sound( "game.rock_sound" )
 
     @staticmethod
     def button():
-        resman.get("gui.button_sound").play()
+        Event.play_sound( "gui.button_sound" )
 
     @staticmethod
     def playerkey():
-        resman.get("gui.button_sound").play()
+        Event.play_sound( "gui.button_sound" )
 
     @staticmethod
     def sound_test():
-        resman.get("game.coin_sound").play()
+        Event.play_sound( "game.coin_sound" )
 
     @staticmethod
     def switch_trail():
-        resman.get("game.railswitch_sound").play()
+        Event.play_sound( "game.railswitch_sound" )
 
 Event.instance = Event()
 
@@ -195,7 +217,10 @@ class Explosion:
 
         self.pos = pos
 
-        self.sprite = resman.get("game.explosion_sprite").clone()
+        if not Event.instance.is_headless:
+            self.sprite = resman.get("game.explosion_sprite").clone()
+        else:
+            self.sprite = None
         self.animTimer = None
 
         Event.explosion()
@@ -1,4 +1,12 @@
 
+import bisect
+import inspect
+
+import pygame
+
+import koon.gfx as gfx
+from koon.timing import timings
+
 from world import *
 from player import *
 from pickups import *
@@ -27,87 +35,276 @@ class Frame:
         self.X_OFFSET = 0
         self.Y_OFFSET = 0
 
+        self.dirty_screen = None
+
     def get_views( self, model ):
-        if hasattr( model, 'views' ) and model.views is not None:
-            return model.views
-        else:
-            if isinstance( model, Level):
-                views = [LevelView( model )]
-            elif isinstance( model, Playfield ):
-                views = [PlayfieldView( model )]
-            elif isinstance( model, GoldCar ):
-                views = [GoldCarView( model )]
-
-            elif isinstance( model, Torch ):
-                views = [TorchView( model )]
-            elif isinstance( model, Diamond ):
-                views = [DiamondView( model )]
-            elif isinstance( model, Key ):
-                views = [KeyView( model )]
-            elif isinstance( model, Mirror ):
-                views = [MirrorView( model )]
-            elif isinstance( model, Oiler ):
-                views = [OilerView( model )]
-            elif isinstance( model, Multiplier ):
-                views = [MultiplierView( model )]
-            elif isinstance( model, Balloon ):
-                views = [BalloonView( model )]
-            elif isinstance( model, Ghost ):
-                views = [GhostView( model )]
-            elif isinstance( model, CopperCoin ):
-                views = [CopperCoinView( model )]
-            elif isinstance( model, GoldBlock ):
-                views = [GoldBlockView( model )]
-            elif isinstance( model, RockBlock ):
-                views = [RockBlockView( model )]
-            elif isinstance( model, Dynamite ):
-                views = [DynamiteView( model )]
-            elif isinstance( model, Lamp ):
-                views = [LampView( model )]
-            elif isinstance( model, Axe ):
-                views = [AxeView( model )]
-            elif isinstance( model, Flag ):
-                views = [FlagView( model )]
-            elif isinstance( model, Leprechaun):
-                views = [LeprechaunView( model )]
-
-            elif isinstance( model, Enterance ):
-                views = [EnteranceView( model ), EnteranceTopView( model )]
-            elif isinstance( model, RailGate ):
-                views = [RailGateView( model )]
-            elif isinstance( model, Tile ):
-                views = [TileView( model )]
-            elif isinstance( model, GroundControl ):
-                views = [GroundControlView( model )]
-            elif isinstance( model, Event ):
-                views = [EventView( model )]
-            else:
+        """Return the views of model, or None when it has no views.
+
+        The views are created once through the view registry, and kept in
+        the views member of the model.
+        """
+        views = model.views
+        if views is None:
+            view_classes = get_view_classes( model.__class__ )
+            if view_classes is None:
                 return None
 
+            views = [view_class( model ) for view_class in view_classes]
             model.views = views
 
-            return views
-
+        return views
 
     def draw( self, model ):
         if model is None: return
 
         for view in self.get_views( model ):
+            self.draw_view( view )
+
+    def draw_view( self, view ):
+        """Draw view, timed per view class when timings are enabled."""
+        if timings.is_enabled:
+            start = timings.begin()
+            view.draw( self )
+            timings.end_in_frame( "draw." + view.__class__.__name__, start )
+        else:
             view.draw( self )
 
+    def get_static_views( self, view ):
+        """Return the z sorted views and z keys of view and its submodels.
+
+        The result is kept on the view until the revision of its model changes.
+        """
+        revision = view.model.revision
+        if getattr( view, "static_views", None ) is None or \
+           view.static_views[0] != revision:
+            views = [view]
+            for submodel in view.submodels:
+                views.extend( self.get_views( submodel ) )
+            views.sort( key = lambda v: v.z )
+
+            view.static_views = (revision, views, [v.z for v in views])
+
+        return view.static_views[1], view.static_views[2]
+
     def draw_z( self, models ):
+        """Draw the views of models and their submodels, sorted on z.
+
+        The first view with static_submodels has a pre sorted list, in which
+        the other views get inserted.
+        """
         views = []
+        keys = []
+        dynamic_views = []
         for model in models:
             for view in self.get_views( model ):
-                views.append( view )
+                if getattr( view, "static_submodels", False ) and \
+                   len( views ) == 0 and len( dynamic_views ) == 0:
+                    views, keys = self.get_static_views( view )
+                    views = list( views )
+                    keys = list( keys )
+                    continue
+
+                dynamic_views.append( view )
 
                 if hasattr(view, "submodels"):
                     for submodel in view.submodels:
                         for subview in self.get_views( submodel ):
-                            views.append( subview )
+                            dynamic_views.append( subview )
+
+        for view in dynamic_views:
+            z = view.z
+            i = bisect.bisect_right( keys, z )
+            keys.insert( i, z )
+            views.insert( i, view )
+
+        if self.dirty_screen is not None:
+            self.dirty_screen.draw_views( self, views )
+        else:
+            for view in views:
+                self.draw_view( view )
+
+
+_view_registry = {}
+_view_cache = {}
+
+def register_view( model_class, *view_classes ):
+    """Let models of model_class, and its subclasses, be drawn by view_classes.
+
+    Each view class is created with the model as parameter. The views are
+    kept in the views member of the model, which is declared on model_class
+    when it doesn't have one.
+    """
+    if not hasattr( model_class, "views" ):
+        model_class.views = None
+    _view_registry[ model_class ] = view_classes
+    _view_cache.clear()
+
+def get_view_classes( model_class ):
+    """Return the view classes of the nearest registered class of model_class."""
+    if model_class not in _view_cache:
+        view_classes = None
+        for cls in inspect.getmro( model_class ):
+            if cls in _view_registry:
+                view_classes = _view_registry[ cls ]
+                break
+        _view_cache[ model_class ] = view_classes
+
+    return _view_cache[ model_class ]
 
-        views.sort( key = lambda v: v.z )
+register_view( Level, LevelView )
+register_view( Playfield, PlayfieldView )
+register_view( GoldCar, GoldCarView )
 
+register_view( Torch, TorchView )
+register_view( Diamond, DiamondView )
+register_view( Key, KeyView )
+register_view( Mirror, MirrorView )
+register_view( Oiler, OilerView )
+register_view( Multiplier, MultiplierView )
+register_view( Balloon, BalloonView )
+register_view( Ghost, GhostView )
+register_view( CopperCoin, CopperCoinView )
+register_view( GoldBlock, GoldBlockView )
+register_view( RockBlock, RockBlockView )
+register_view( Dynamite, DynamiteView )
+register_view( Lamp, LampView )
+register_view( Axe, AxeView )
+register_view( Flag, FlagView )
+register_view( Leprechaun, LeprechaunView )
+
+register_view( Enterance, EnteranceView, EnteranceTopView )
+register_view( RailGate, RailGateView )
+register_view( Tile, TileView )
+register_view( GroundControl, GroundControlView )
+register_view( Event, EventView )
+
+
+class DirtyScreen:
+    """Draws a frame by only redrawing the screen areas that changed.
+
+    The views of draw_z are drawn once on a surface that only records their
+    draws. Views whose area or draws differ from the previous frame mark
+    their old and new area as dirty. Only in the dirty areas, the recorded
+    draws that overlap are repeated in z order. Everything else drawn on the
+    frame is an overlay, whose area is redrawn the next frame.
+
+    When a view draws in a way that can't be recorded, the complete screen
+    is drawn instead, this frame and the next.
+
+    Use it for one draw_z per frame, between begin_frame and end_frame.
+    """
+    MAX_COVERAGE = 0.6
+
+    def __init__( self ):
+        self.screen = None
+        self.surface = None
+        self.rects = []
+        self.invalidate()
+
+    def invalidate( self ):
+        """Redraw the complete screen next frame."""
+        self.view_draws = {}
+        self.overlay_rects = []
+        self.is_valid = False
+
+    def begin_frame( self, frame ):
+        """Let frame draw on a DirtySurface of the screen."""
+        if frame.surface is not self.screen:
+            self.invalidate()
+        self.screen = frame.surface
+        self.rects = []
+        self.is_recorded = True
+        self.surface = gfx.DirtySurface( self.screen )
+
+        frame.surface = self.surface
+        frame.dirty_screen = self
+
+    def end_frame( self ):
+        """Return the screen areas that changed this frame."""
+        self.overlay_rects = self.surface.rects
+        self.is_valid = self.is_recorded
+        return self.rects + self.overlay_rects
+
+    def draw_views( self, frame, views ):
+        """Redraw the z sorted views where they differ from last frame."""
+        measure_surface = gfx.DirtySurface( self.screen, True )
+        overlay_surface = frame.surface
+        frame.surface = measure_surface
+
+        dirty_rects = list( self.overlay_rects )
+        view_draws = {}
+        draws = []
+        try:
+            for view in views:
+                measure_surface.reset()
+                frame.draw_view( view )
+                rect = measure_surface.get_rect()
+                view_draws[ view ] = (rect, measure_surface.draws)
+                draws.extend( zip( measure_surface.rects, measure_surface.draws ) )
+
+                if not self.is_valid:
+                    continue
+                prev = self.view_draws.get( view )
+                if prev is None:
+                    if rect is not None: dirty_rects.append( rect )
+                elif prev != view_draws[ view ]:
+                    if prev[0] is not None: dirty_rects.append( prev[0] )
+                    if rect is not None: dirty_rects.append( rect )
+        except gfx.UnsupportedDraw:
+            self._draw_all( frame, views )
+            frame.surface = overlay_surface
+            return
+
+        for view, prev in self.view_draws.items():
+            if not view_draws.has_key( view ) and prev[0] is not None:
+                dirty_rects.append( prev[0] )
+        self.view_draws = view_draws
+
+        screen_rect = self.screen.get_rect()
+        if not self.is_valid:
+            dirty_rects = [screen_rect]
+        dirty_rects = merge_rects( dirty_rects, screen_rect,
+                                   DirtyScreen.MAX_COVERAGE )
+
+        for dirty_rect in dirty_rects:
+            self.screen.set_clip( dirty_rect )
+            for rect, (name, args) in draws:
+                if rect.colliderect( dirty_rect ):
+                    getattr( self.screen, name )( *args )
+        self.screen.set_clip( None )
+        frame.surface = overlay_surface
+
+        self.rects.extend( dirty_rects )
+
+    def _draw_all( self, frame, views ):
+        frame.surface = self.screen
         for view in views:
-            view.draw( self )
+            frame.draw_view( view )
+
+        self.view_draws = {}
+        self.is_recorded = False
+        self.rects.append( self.screen.get_rect() )
+
+def merge_rects( rects, bounds, max_coverage = 1.0 ):
+    """Return non overlapping rects, clipped to bounds, that cover rects.
+
+    When they cover more than max_coverage of bounds, bounds is returned.
+    """
+    merged = []
+    for rect in rects:
+        rect = rect.clip( bounds )
+        if rect.width == 0 or rect.height == 0:
+            continue
+        i = rect.collidelist( merged )
+        while i >= 0:
+            rect = rect.union( merged.pop( i ) )
+            i = rect.collidelist( merged )
+        merged.append( rect )
+
+    area = 0
+    for rect in merged:
+        area += rect.width * rect.height
+    if area > bounds.width * bounds.height * max_coverage:
+        return [bounds]
+    return merged
 
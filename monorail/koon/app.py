@@ -1,12 +1,16 @@
 
 import sys
 import gc
+import time
 
 import pygame
 from pygame.locals import *
 
 from input import *
 import snd
+from timing import timings, Phases
+from display import display
+from res import resman
 
 TICKS_PER_SECOND = 25
 GAMETICKS = 1000 / TICKS_PER_SECOND
@@ -18,11 +22,88 @@ def set_game_speed( slowdown ):
     TICKS_PER_SECOND = int( 25 * slowdown )
     GAMETICKS = 1000 / TICKS_PER_SECOND
 
+class FrameScheduler:
+    """Paces the main loop: when to tick, when to render and how long to sleep
+
+    Members:
+    - max_fps: the most frames rendered per second, None for no limit
+    - idle_fps: the frames per second when is_idle, like in menus
+    - is_idle: when set, idle_fps is used instead of max_fps
+    - jitter: the average milliseconds that frames started off schedule
+    """
+    MAX_TICKS = 4       # game ticks before rendering, when behind
+    MAX_FRAME_SKIP = 2  # frames skipped in a row, when still behind
+    SPIN_MS = 2         # the last milliseconds are waited without sleeping
+
+    def __init__( self, max_fps = 60, idle_fps = 30 ):
+        self.max_fps = max_fps
+        self.idle_fps = idle_fps
+        self.is_idle = False
+        self.start()
+
+    def start( self ):
+        self.next_game_tick = pygame.time.get_ticks()
+        self.next_frame = float( self.next_game_tick )
+        self.frame_skip = 0
+        self.jitter = 0.0
+
+    def get_tick_count( self ):
+        """Return the number of game ticks to do now."""
+        now = pygame.time.get_ticks()
+        count = 0
+        while now > self.next_game_tick and count < self.MAX_TICKS:
+            self.next_game_tick += GAMETICKS
+            count += 1
+
+        if count >= self.MAX_TICKS: # don't overdo the ticks
+            self.next_game_tick = now
+        return count
+
+    def should_render( self ):
+        """Return False when rendering is skipped to catch up with the ticks."""
+        if pygame.time.get_ticks() > self.next_game_tick + GAMETICKS and \
+           self.frame_skip < self.MAX_FRAME_SKIP:
+            self.frame_skip += 1
+            return False
+        self.frame_skip = 0
+        return True
+
+    def get_interpol( self ):
+        return 1 - ((self.next_game_tick - pygame.time.get_ticks()) / float(GAMETICKS))
+
+    def get_fps( self ):
+        if self.is_idle:
+            return self.idle_fps
+        else:
+            return self.max_fps
+
+    def wait( self ):
+        """Sleep until the next frame should be rendered."""
+        fps = self.get_fps()
+        if fps is None:
+            return
+
+        now = pygame.time.get_ticks()
+        self.next_frame += 1000.0 / fps
+        if self.next_frame < now - 1000.0 / fps: # don't catch up on frames
+            self.next_frame = float( now )
+
+        delay = self.next_frame - now
+        if delay > self.SPIN_MS:
+            time.sleep( (delay - self.SPIN_MS) * 0.001 )
+        while pygame.time.get_ticks() < self.next_frame:
+            pass
+
+        late = pygame.time.get_ticks() - self.next_frame
+        self.jitter = 0.9 * self.jitter + 0.1 * abs( late )
+
 class Game:
 
     def __init__( self, name, configuration ):
         self.config = configuration
         self.name = name
+        self.scheduler = FrameScheduler()
+        self.startup = None # Phases of the startup, when measured
 
     def init_pygame( self ):
         snd.pre_init()
@@ -32,10 +113,7 @@ class Game:
 
         self.userinput = UserInput()
 
-        if not self.config.is_fullscreen:
-            pygame.display.set_mode( self.config.resolution )
-        else:
-            pygame.display.set_mode( self.config.resolution, pygame.FULLSCREEN )
+        display.set_mode( self.config.resolution, self.config.is_fullscreen )
         pygame.display.set_caption( self.name )
 
         # Init the input
@@ -45,60 +123,86 @@ class Game:
         snd.init()
 
     def deinit_pygame( self ):
+        resman.stop_prefetch()
         snd.deinit()
         pygame.quit()
 
     def before_gameloop( self ):
         pass
 
+    def end_startup_phase( self, name ):
+        """End phase name of the startup, when the startup is measured."""
+        if self.startup is not None:
+            self.startup.end( name )
+
     def after_gameloop( self ):
         pass
 
     def run( self ):
         try:
             self.init_pygame()
+            self.end_startup_phase( "init pygame" )
 
             self.before_gameloop()
+            self.end_startup_phase( "before gameloop" )
 
             self.fps = 0
             frame_count = 0
 
-            next_game_tick = pygame.time.get_ticks()
+            self.scheduler.start()
             next_half_second = pygame.time.get_ticks()
 
             # main loop
             self.game_is_done = False
             while not self.game_is_done:
                 # events
+                start = timings.begin()
                 self.handle_events()
+                timings.end( "events", start )
 
                 # game tick
-                loop_count = 0
-                while pygame.time.get_ticks() > next_game_tick and loop_count < 4:
-                    x, y = pygame.mouse.get_pos()
+                for i in range( self.scheduler.get_tick_count() ):
+                    x, y = display.get_mouse_pos()
                     self.userinput.mouse.feed_pos( Vec2D(x, y) )
 
+                    start = timings.begin()
                     self.do_tick( self.userinput )
                     self.userinput.update()
-                    next_game_tick += GAMETICKS
-                    loop_count += 1
+                    timings.end( "tick", start )
 
 ##                    gc.collect()
 
-                if loop_count >= 4: # don't overdo the ticks
-                    next_game_tick = pygame.time.get_ticks()
-
                 # render
-                time_sec = pygame.time.get_ticks() * 0.001
-                interpol = 1 - ((next_game_tick - pygame.time.get_ticks()) / float(GAMETICKS))
-                self.render(pygame.display.get_surface(), interpol, time_sec )
-                pygame.display.flip()
-
-                frame_count += 1
-                if pygame.time.get_ticks() > next_half_second:
-                    self.fps = 2 * frame_count
-                    frame_count = 0
-                    next_half_second += 500
+                if self.scheduler.should_render():
+                    time_sec = pygame.time.get_ticks() * 0.001
+                    interpol = self.scheduler.get_interpol()
+                    start = timings.begin()
+                    rects = self.render( display.surface, interpol, time_sec )
+                    timings.end( "render", start )
+
+                    start = timings.begin()
+                    display.present( rects )
+                    timings.end( "display.flip", start )
+                    timings.end_frame()
+
+                    if self.startup is not None:
+                        self.startup.end( "first frame" )
+                        print self.startup.get_report( "time to first frame" )
+                        self.startup = None
+
+                    frame_count += 1
+                    if pygame.time.get_ticks() > next_half_second:
+                        self.fps = 2 * frame_count
+                        frame_count = 0
+                        next_half_second += 500
+
+                # finish prefetched resources in small parts
+                if resman.is_prefetching():
+                    start = timings.begin()
+                    resman.prefetch_tick()
+                    timings.end( "prefetch", start )
+
+                self.scheduler.wait()
 
             self.after_gameloop()
 
@@ -74,6 +74,62 @@ def pack_images( images ):
             x = 0
     return out_image
 
+def pack_atlas( images, max_width = 1024, spacing = 1 ):
+    """Returns the atlas image and the (x, y, width, height) box of each image
+
+    The images are placed on shelves, highest first. The spacing between
+    the images prevents bleeding of pixels at the edges.
+    """
+    order = range( len(images) )
+    order.sort( key = lambda i: -images[i].size[1] )
+
+    boxes = [None] * len(images)
+    x, y, shelf_height = 0, 0, 0
+    out_width = 0
+    for i in order:
+        width, height = images[i].size
+        if x > 0 and x + width > max_width:
+            x = 0
+            y += shelf_height + spacing
+            shelf_height = 0
+        boxes[i] = (x, y, width, height)
+        out_width = max( out_width, x + width )
+        shelf_height = max( shelf_height, height )
+        x += width + spacing
+
+    out_image = Image.new("RGBA", (out_width, y + shelf_height))
+    for im, box in zip( images, boxes ):
+        out_image.paste( im, (box[0], box[1]) )
+    return out_image, boxes
+
+def generate_atlas( atlasfilename, nodes, datadir = "data" ):
+    """Packs the images of the Surface nodes into one atlas image
+
+    The nodes get the atlas file and their rect in it, so they are loaded as
+    a part of the atlas. The files in the nodes start with "data", which is
+    replaced by datadir to find them.
+    """
+    def get_path( filename ):
+        return datadir + filename[len("data"):]
+
+    filenames = [get_path( node.get("file").value ) for node in nodes]
+
+    # the boxes are needed even when the atlas is up to date
+    images = [Image.open(filename) for filename in filenames]
+    out_image, boxes = pack_atlas( images )
+
+    if should_update( get_path( atlasfilename ), filenames ):
+        print "generating atlas", atlasfilename
+        out_image.save( get_path( atlasfilename ) )
+
+    for node, box in zip( nodes, boxes ):
+        node.set("atlas", atlasfilename)
+        node.set("rect", "Rectangle")
+        node.set("rect.x", box[0])
+        node.set("rect.y", box[1])
+        node.set("rect.width", box[2])
+        node.set("rect.height", box[3])
+
 
 def generate_sprite( configname, spritefilename, blenderfilename, scale, count,
                      scene = None, center = None ):
@@ -139,6 +139,26 @@ class ConfigNode:
 
         return node
 
+    def flatten( self ):
+        """Return the values and the child names of all subnodes by their
+        "sub1.sub2.name", as two dicts. This node itself has name "".
+        """
+        values = {}
+        children = {}
+        nodes = [("", self)]
+        while len( nodes ) > 0:
+            name, node = nodes.pop()
+            children[ name ] = node.attribs.keys()
+            for child in node.attribs.values():
+                if name == "":
+                    child_name = child.name
+                else:
+                    child_name = name + "." + child.name
+                values[ child_name ] = child.value
+                nodes.append( (child_name, child) )
+
+        return values, children
+
     def set( self, name, value ):
         """Set value of "sub1.sub2.name"
         """
@@ -0,0 +1,69 @@
+"""A directory of cached files with a bounded total size.
+
+"""
+import os
+
+class DiskCache:
+    """Stores files by key in a directory.
+
+    When the total size of the files exceeds max_size, the least recently
+    used files are removed. Use is tracked with the modification time of the
+    files.
+    """
+    def __init__( self, directory, max_size ):
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_filename( self, key, extension = "" ):
+        return os.path.join( self.directory, key + extension )
+
+    def get( self, key, extension = "" ):
+        """Return the filename of the cached file, or None when not cached."""
+        filename = self.get_filename( key, extension )
+        try:
+            os.utime( filename, None )
+            return filename
+        except OSError:
+            return None
+
+    def get_tmp_filename( self, key, extension = "" ):
+        """Return a filename to write a new file to, before calling add."""
+        if not os.path.isdir( self.directory ):
+            os.makedirs( self.directory )
+        return os.path.join( self.directory,
+                             "%s.%d.tmp%s" % (key, os.getpid(), extension) )
+
+    def add( self, key, extension = "" ):
+        """Add the file written to get_tmp_filename to the cache."""
+        filename = self.get_filename( key, extension )
+        if os.path.exists( filename ):
+            os.remove( filename )
+        os.rename( self.get_tmp_filename( key, extension ), filename )
+
+        self.evict()
+        return filename
+
+    def evict( self ):
+        """Remove least recently used files until max_size is reached."""
+        files = []
+        total_size = 0
+        for name in os.listdir( self.directory ):
+            filename = os.path.join( self.directory, name )
+            stat = os.stat( filename )
+            files.append( (stat.st_mtime, stat.st_size, filename) )
+            total_size += stat.st_size
+
+        files.sort()
+        for mtime, size, filename in files:
+            if total_size <= self.max_size:
+                break
+            os.remove( filename )
+            total_size -= size
+
+    def get_size( self ):
+        if not os.path.isdir( self.directory ):
+            return 0
+        total_size = 0
+        for name in os.listdir( self.directory ):
+            total_size += os.path.getsize( os.path.join( self.directory, name ) )
+        return total_size
@@ -0,0 +1,155 @@
+"""use 'display' as the main ScaledDisplay in this module
+"""
+import pygame
+
+class ScaledDisplay:
+    """Renders on a surface of a fixed size, shown scaled on the screen
+
+    When the screen has another size than the surface, the surface is an
+    offscreen buffer. Presenting scales it to fit the screen, centered. An
+    integer scale is used when it fills most of the screen. Otherwise the
+    surface is smoothscaled, and the presented areas are padded, since
+    smoothscale blends the pixels at the edges of a part.
+
+    Members:
+    - size: the size that is rendered
+    - surface: the pygame.Surface to render on
+    - scale: the scale factor from surface to screen
+    - offset: the screen position of the scaled surface
+    """
+    MIN_INTEGER_FILL = 0.9 # part of the possible scale an integer scale must reach
+    SMOOTH_PADDING = 2 # surface pixels around a smoothscaled area
+
+    def __init__( self, size = (800, 600) ):
+        self.size = size
+        self.surface = None
+        self.buffer = None
+        self.desktop_size = None
+        self.scale = 1
+        self.offset = (0, 0)
+
+    def set_mode( self, size, is_fullscreen = False ):
+        """Open a window of size, or go full screen at the desktop resolution."""
+        self.size = size
+        if self.desktop_size is None:
+            info = pygame.display.Info()
+            self.desktop_size = (info.current_w, info.current_h)
+
+        if is_fullscreen:
+            if self.desktop_size[0] > 0 and self.desktop_size[1] > 0:
+                screen = pygame.display.set_mode( self.desktop_size, pygame.FULLSCREEN )
+            else:
+                screen = pygame.display.set_mode( size, pygame.FULLSCREEN )
+        else:
+            screen = pygame.display.set_mode( size )
+
+        self.init_scaling( screen )
+        return screen
+
+    def init_scaling( self, screen ):
+        """Calculate how the surface is scaled onto the screen."""
+        self.screen = screen
+        width, height = self.size
+        screen_width, screen_height = screen.get_size()
+
+        if (screen_width, screen_height) == (width, height):
+            self.scale = 1
+            self.offset = (0, 0)
+            self.surface = screen
+            self.scaled_rect = screen.get_rect()
+            return
+
+        scale = min( screen_width / float(width), screen_height / float(height) )
+        if int( scale ) >= ScaledDisplay.MIN_INTEGER_FILL * scale:
+            scale = int( scale )
+        self.scale = scale
+
+        scaled_size = (int( width * scale ), int( height * scale ))
+        self.offset = ((screen_width - scaled_size[0]) / 2,
+                       (screen_height - scaled_size[1]) / 2)
+        self.scaled_rect = pygame.Rect( self.offset, scaled_size )
+        self.scaled_surface = screen.subsurface( self.scaled_rect )
+
+        # keep the buffer content over mode changes
+        if self.buffer is None or self.buffer.get_size() != self.size:
+            self.buffer = pygame.Surface( self.size ).convert()
+        else:
+            self.buffer = self.buffer.convert()
+        self.surface = self.buffer
+        screen.fill( (0, 0, 0) )
+        self.is_complete = False
+
+    def is_scaled( self ):
+        return self.surface is not self.screen
+
+    def is_smooth( self ):
+        return self.is_scaled() and not isinstance( self.scale, int ) and \
+               self.screen.get_bitsize() >= 24
+
+    def _scale( self, source, size, dest ):
+        if self.is_smooth():
+            pygame.transform.smoothscale( source, size, dest )
+        else:
+            pygame.transform.scale( source, size, dest )
+
+    def to_screen_rect( self, rect ):
+        """Return the screen area of rect on the surface."""
+        left = int( rect.left * self.scale )
+        top = int( rect.top * self.scale )
+        right = int( rect.right * self.scale )
+        bottom = int( rect.bottom * self.scale )
+        return pygame.Rect( left + self.offset[0], top + self.offset[1],
+                            right - left, bottom - top )
+
+    def to_surface_pos( self, (x, y) ):
+        """Return the surface position of screen position (x, y)."""
+        x = int( (x - self.offset[0]) / self.scale )
+        y = int( (y - self.offset[1]) / self.scale )
+        return (min( max( x, 0 ), self.size[0] - 1 ),
+                min( max( y, 0 ), self.size[1] - 1 ))
+
+    def get_mouse_pos( self ):
+        return self.to_surface_pos( pygame.mouse.get_pos() )
+
+    def present( self, rects = None ):
+        """Show the rects of the surface on the screen, or all when None."""
+        if not self.is_scaled():
+            if rects is not None:
+                pygame.display.update( rects )
+            else:
+                pygame.display.flip()
+            return
+
+        if rects is None or not self.is_complete:
+            self._scale( self.surface, self.scaled_rect.size, self.scaled_surface )
+            self.is_complete = True
+            pygame.display.flip()
+            return
+
+        if len( rects ) == 0:
+            return
+
+        padding = 0
+        if self.is_smooth():
+            padding = ScaledDisplay.SMOOTH_PADDING
+
+        surface_rect = self.surface.get_rect()
+        screen_rects = []
+        for rect in rects:
+            rect = pygame.Rect( rect ).inflate( padding * 2, padding * 2 ).clip( surface_rect )
+            if rect.width > 0 and rect.height > 0:
+                screen_rect = self.to_screen_rect( rect )
+                if self.is_smooth():
+                    # smoothscale draws nothing in a subsurface that starts
+                    # right of the screen edge, so a scaled copy is blitted
+                    self.screen.blit( pygame.transform.smoothscale( self.surface.subsurface( rect ),
+                                                                    screen_rect.size ),
+                                      screen_rect )
+                else:
+                    self._scale( self.surface.subsurface( rect ), screen_rect.size,
+                                 self.screen.subsurface( screen_rect ) )
+                screen_rects.append( screen_rect )
+
+        pygame.display.update( screen_rects )
+
+display = ScaledDisplay()
@@ -1,10 +1,43 @@
 import copy
+from collections import OrderedDict
 from numpy import array
 
 import pygame
 
 from geo import Vec2D, Rectangle
 
+def load_image( filename, use_rle = True ):
+    """Return the image file as a pygame.Surface in the display format.
+
+    Images without translucent pixels are converted without alpha, which
+    blits faster. The others keep their alpha and, when use_rle is set, get
+    RLE acceleration. Don't use RLE on surfaces that subsurfaces are taken
+    from, SDL releases their pixels when encoding.
+    """
+    return convert_image( pygame.image.load( filename ), use_rle )
+
+def is_opaque( image ):
+    """Return True when the image has no translucent pixels."""
+    return not image.get_flags() & pygame.SRCALPHA or \
+           pygame.surfarray.array_alpha( image ).min() == 255
+
+def convert_image( image, use_rle = True, opaque = None ):
+    """Return the loaded image in the display format, like load_image.
+
+    opaque is the result of is_opaque( image ), when already known.
+    """
+    if opaque is None:
+        opaque = is_opaque( image )
+    if opaque:
+        image = image.convert()
+        image.set_alpha( None )
+        return image
+
+    image = image.convert_alpha()
+    if use_rle:
+        image.set_alpha( 255, pygame.RLEACCEL )
+    return image
+
 class Surface:
     def __init__( self, param ):
         """Return a new Surface instance.
@@ -17,7 +50,7 @@ class Surface:
 
         # param is filename
         if isinstance( param, str ):
-            self.pysurf = pygame.image.load( param ).convert_alpha()
+            self.pysurf = load_image( param )
 
         # param is pygame.Surface
         elif isinstance( param, pygame.Surface ):
@@ -70,6 +103,136 @@ class Surface:
         return result
 
 
+class BlendCache:
+    """Blended copies of surfaces, shared by everything that draws them
+
+    The alpha is rounded to one of steps levels, so only a few copies of a
+    surface are made. When the copies take more than max_bytes, the least
+    recently used are dropped.
+    """
+    def __init__( self, max_bytes = 32 * 1024 * 1024, steps = 16 ):
+        self.max_bytes = max_bytes
+        self.steps = steps
+        self.clear()
+
+    def clear( self ):
+        self.surfaces = OrderedDict()
+        self.size = 0
+
+    def get_level( self, alpha ):
+        return int( round( alpha * self.steps ) )
+
+    def get( self, surface, alpha ):
+        """Return surface blended with alpha, which is between 0.0 and 1.0."""
+        level = self.get_level( alpha )
+        if level >= self.steps:
+            return surface
+
+        key = (surface, level)
+        blended = self.surfaces.pop( key, None )
+        if blended is None:
+            blended = surface.get_blended( float(level) / self.steps )
+            self.size += self._get_bytes( blended )
+        self.surfaces[ key ] = blended
+
+        while self.size > self.max_bytes and len( self.surfaces ) > 1:
+            key, old = self.surfaces.popitem( last = False )
+            self.size -= self._get_bytes( old )
+
+        return blended
+
+    def prewarm( self, surface, alphas ):
+        """Blend surface with alphas now, instead of when first drawn."""
+        for alpha in alphas:
+            self.get( surface, alpha )
+
+    @staticmethod
+    def _get_bytes( surface ):
+        return surface.get_width() * surface.get_height() * \
+               surface.pysurf.get_bytesize()
+
+blend_cache = BlendCache()
+
+
+class UnsupportedDraw (Exception):
+    """A drawing call that a measuring DirtySurface can't remember."""
+    pass
+
+class DirtySurface:
+    """Draw target that remembers where is drawn on a pygame.Surface
+
+    It can be used everywhere a Surface is drawn on. When measure_only is
+    set, nothing is drawn, only the draws and their areas are remembered.
+    blit, fill and set_at can be remembered, other drawing raises
+    UnsupportedDraw. Without measure_only, other drawing marks the whole
+    target as drawn on.
+
+    Members:
+    - rects: the pygame.Rect areas that were drawn on
+    - draws: the (method name, arguments) of each draw, when measure_only
+    """
+    def __init__( self, target, measure_only = False ):
+        self.target = target
+        self.measure_only = measure_only
+        self.reset()
+
+    def reset( self ):
+        self.rects = []
+        self.draws = []
+
+    def _get_pysurf( self ):
+        return self
+    pysurf = property( _get_pysurf )
+
+    def blit( self, source, dest, area = None, special_flags = 0 ):
+        if self.measure_only:
+            if area is not None:
+                area = tuple( area )
+                size = (area[2], area[3])
+            else:
+                size = source.get_size()
+            # +1 for the rounding of float positions
+            rect = pygame.Rect( int(dest[0]) - 1, int(dest[1]) - 1, size[0] + 2, size[1] + 2 )
+            self.draws.append( ("blit", (source, tuple(dest), area, special_flags)) )
+        else:
+            rect = self.target.blit( source, dest, area, special_flags )
+        self.rects.append( rect )
+        return rect
+
+    def fill( self, color, rect = None, special_flags = 0 ):
+        if rect is None:
+            rect = self.target.get_rect()
+        if self.measure_only:
+            rect = pygame.Rect( rect )
+            self.draws.append( ("fill", (tuple(color), tuple(rect), special_flags)) )
+        else:
+            rect = self.target.fill( color, rect, special_flags )
+        self.rects.append( rect )
+        return rect
+
+    def set_at( self, pos, color ):
+        if self.measure_only:
+            self.draws.append( ("set_at", (tuple(pos), tuple(color))) )
+        else:
+            self.target.set_at( pos, color )
+        self.rects.append( pygame.Rect( pos, (1, 1) ) )
+
+    def get_rect( self ):
+        """Return the area of all draws, or None when nothing is drawn."""
+        if len( self.rects ) == 0:
+            return None
+        return self.rects[0].unionall( self.rects[1:] )
+
+    def _untracked( self, name ):
+        if self.measure_only:
+            raise UnsupportedDraw( "%s can't be measured" % name )
+        self.rects.append( self.target.get_rect() )
+
+    def __getattr__( self, name ):
+        if not name.startswith( "get_" ):
+            self._untracked( name )
+        return getattr( self.target, name )
+
 class SubSurf:
     """Part of a surface that can be drawn
 
@@ -130,26 +293,41 @@ class SpriteFilm (Sprite):
         self.width = width
         self.height = height
         self.max_x = self.surface.get_width() / width
+        self._init_frame_rects( self.surface.get_height() / height )
 
     def set_div( self, x_sprites, y_sprites ):
         self.width = self.surface.get_width() / x_sprites
         self.height = self.surface.get_height() / y_sprites
         self.max_x = x_sprites
         self.center = Vec2D(self.width, self.height) / 2
+        self._init_frame_rects( y_sprites )
+
+    def _init_frame_rects( self, y_sprites ):
+        """Precalculate the source rect of each frame."""
+        self.frame_rects = []
+        for y in range( y_sprites ):
+            for x in range( self.max_x ):
+                self.frame_rects.append( (x * self.width, y * self.height,
+                                          self.width, self.height) )
+
+    def get_frame_rect( self, nr ):
+        """Return the (x, y, width, height) source rect of frame nr."""
+        if nr < len( self.frame_rects ):
+            return self.frame_rects[ nr ]
+        else:
+            return ((nr % self.max_x) * self.width, (nr / self.max_x) * self.height,
+                    self.width, self.height)
 
     def draw( self, surface, pos, rect = None ):
         """Draw the sprite on the surface at pos
 
         pos is a Vec2D
         """
-        sp_x = (self.nr % self.max_x) * self.width
-        sp_y = (self.nr / self.max_x) * self.height
-
-        sprite_rect = [sp_x, sp_y, self.width, self.height]
+        sprite_rect = self.get_frame_rect( self.nr )
 
         if rect is not None:
             r = copy.copy(rect)
-            r.pos = r.pos + Vec2D(sp_x, sp_y)
+            r.pos = r.pos + Vec2D(sprite_rect[0], sprite_rect[1])
             sprite_rect = (Rectangle.from_tuple(sprite_rect) & r).get_tuple()
 
         self.surface.draw( surface, pos - self.center, sprite_rect)
@@ -161,10 +339,49 @@ class SpriteFilm (Sprite):
         cl = copy.copy( self )
         return cl
 
+class TextCache:
+    """Rendered texts, bounded to max_size by dropping the least recently used
+
+    Members:
+    - hits: the number of texts that were found in the cache
+    - misses: the number of texts that had to be rendered
+    """
+    def __init__( self, max_size = 512 ):
+        self.max_size = max_size
+        self.clear()
+
+    def clear( self ):
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get( self, key ):
+        """Return the cached surface of key, or None."""
+        surface = self.surfaces.pop( key, None )
+        if surface is not None:
+            self.surfaces[ key ] = surface
+            self.hits += 1
+        else:
+            self.misses += 1
+        return surface
+
+    def add( self, key, surface ):
+        self.surfaces[ key ] = surface
+        if len( self.surfaces ) > self.max_size:
+            self.surfaces.popitem( last = False )
+
 class Font:
+    """Draws text with a TrueType font
+
+    The loaded pygame fonts and the rendered texts are shared by all Font
+    instances. They are cleared when pygame quits.
+    """
     LEFT, RIGHT, CENTER = range(3)
     TOP, BOTTOM, MIDDLE = range(3)
 
+    pygame_fonts = {}
+    text_cache = TextCache()
+
     def __init__( self, filename = None, size = 16, color = (0,0,0), \
                   use_antialias = False ):
         if filename is None:
@@ -172,10 +389,27 @@ class Font:
         self.filename = filename
         self.color = color
         self._use_antialias = use_antialias
-        self.pygame_font = pygame.font.Font( filename, size )
+        self.set_size( size )
+
+    @staticmethod
+    def get_pygame_font( filename, size ):
+        """Return the shared pygame.font.Font of filename and size."""
+        if len( Font.pygame_fonts ) == 0:
+            pygame.register_quit( Font.clear_cache )
+
+        key = (filename, size)
+        if key not in Font.pygame_fonts:
+            Font.pygame_fonts[ key ] = pygame.font.Font( filename, size )
+        return Font.pygame_fonts[ key ]
+
+    @staticmethod
+    def clear_cache():
+        Font.pygame_fonts.clear()
+        Font.text_cache.clear()
 
     def set_size( self, size ):
-        self.pygame_font = pygame.font.Font( self.filename, size )
+        self.size = size
+        self.pygame_font = Font.get_pygame_font( self.filename, size )
 
     def set_color( self, color ):
         self.color = color
@@ -186,10 +420,18 @@ class Font:
     def use_antialias( self ):
         return self._use_antialias
 
+    def render( self, text ):
+        """Return the text as a Surface, from the cache when rendered before."""
+        key = (self.filename, self.size, text, tuple(self.color), self._use_antialias)
+        textsurf = Font.text_cache.get( key )
+        if textsurf is None:
+            textsurf = Surface( self.pygame_font.render( text, self._use_antialias,
+                                                         self.color ) )
+            Font.text_cache.add( key, textsurf )
+        return textsurf
+
     def draw( self, text, surface, (x, y), align = LEFT, valign = TOP ):
-        textsurf = self.pygame_font.render( text, self._use_antialias,
-                                            self.color )
-        textsurf = Surface( textsurf )
+        textsurf = self.render( text )
 
         if   align == Font.TOP:     pass
         elif align == Font.CENTER:  x -= textsurf.get_width() / 2
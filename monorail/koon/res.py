@@ -1,5 +1,12 @@
 """use 'resman' as the main ResourceManager in this module
 """
+import hashlib
+import marshal
+import time
+import threading
+from fnmatch import fnmatch
+from cStringIO import StringIO
+
 import pygame
 
 import geo
@@ -8,14 +15,70 @@ import gfx
 import snd
 
 class ResourceManager:
+    """Creates the resources of a resource file when they're first used
+
+    The resource file is kept as two dicts by full resource name, values
+    with the value of each node and children with the names of its child
+    nodes.
+
+    Resources can be prefetched: their files are decoded on a worker
+    thread, and prefetch_tick() creates them on the main thread a few at
+    a time.
+    """
+    PREFETCH_TYPES = ["Surface", "SpriteFilm", "SubSurf", "Sound"] # music is loaded when played
+    tree_cache = None # DiskCache of the parsed resource files, set by the game
+
     def __init__( self ):
         self.loaded_files = {}
         self.loaded_resources = {}
+        self.revision = None
+        self.values = {}
+        self.children = { "": [] }
+
+        self.prefetch_names = [] # [(res_name, filenames)]
+        self.decoded_files = {}
+        self.pending_files = set()
+        self.lock = threading.Lock()
+        self.queued_files = []
+        self.worker = None
 
     def read( self, filename ):
-        """Read in the resource file."""
-        conf_file = cfg.ConfigFile(filename)
-        self.root_node = conf_file.root_node
+        """Read in the resource file.
+
+        The revision becomes a hash of its contents. The parsed file is
+        kept in tree_cache by revision, so it's only parsed once.
+        """
+        res_file = open( filename, "rb" )
+        content = res_file.read()
+        res_file.close()
+        self.revision = hashlib.md5( content ).hexdigest()
+
+        tree = None
+        if ResourceManager.tree_cache is not None:
+            cache_filename = ResourceManager.tree_cache.get( self.revision, ".marshal" )
+            if cache_filename is not None:
+                try:
+                    cache_file = open( cache_filename, "rb" )
+                    tree = marshal.load( cache_file )
+                    cache_file.close()
+                except (IOError, EOFError, ValueError, TypeError):
+                    tree = None
+
+        if tree is None:
+            root_node = cfg.ConfigNode.from_file( StringIO( content.replace("\r\n", "\n") ) )
+            tree = root_node.flatten()
+
+            if ResourceManager.tree_cache is not None:
+                try:
+                    tmp_filename = ResourceManager.tree_cache.get_tmp_filename( self.revision, ".marshal" )
+                    cache_file = open( tmp_filename, "wb" )
+                    marshal.dump( tree, cache_file )
+                    cache_file.close()
+                    ResourceManager.tree_cache.add( self.revision, ".marshal" )
+                except (IOError, OSError):
+                    pass
+
+        self.values, self.children = tree
 
     def get( self, res_name, typ = str ):
         """Returns the resource
@@ -23,62 +86,78 @@ class ResourceManager:
         Supports following types: str, int, pygame.Rect
         """
         if res_name not in self.loaded_resources:
-            node = self.root_node.get(res_name)
-            self.loaded_resources[ res_name ] = self.get_from_node( node, typ )
+            self.loaded_resources[ res_name ] = self.get_from_name( res_name, typ )
 
         return self.loaded_resources[ res_name ]
 
-    def get_from_node( self, node, typ = str ):
+    def get_value( self, res_name, attrib ):
+        """Return the value of attribute attrib of resource res_name."""
+        return self.values[ res_name + "." + attrib ]
+
+    def get_from_name( self, res_name, typ = str ):
+        value = self.values[ res_name ]
+        attribs = self.children[ res_name ]
+
         # Simple type
-        if len(node.attribs) == 0:
+        if len(attribs) == 0:
             if typ is None or typ is str:
-                return node.value
+                return value
             elif typ is int:
-                return int(node.value)
+                return int(value)
 
         # Complex type
         else:
-            if node.value == "Rectangle":
+            if value == "Rectangle":
                 return pygame.Rect(
-                    int( node.get("x").value ),
-                    int( node.get("y").value ),
-                    int( node.get("width").value ),
-                    int( node.get("height").value ) )
+                    int( self.get_value( res_name, "x" ) ),
+                    int( self.get_value( res_name, "y" ) ),
+                    int( self.get_value( res_name, "width" ) ),
+                    int( self.get_value( res_name, "height" ) ) )
 
-            elif node.value == "Vec2D":
+            elif value == "Vec2D":
                 return geo.Vec2D(
-                    typ( node.get("x").value ),
-                    typ( node.get("y").value ) )
-
-            elif node.value == "Surface":
-                return gfx.Surface( node.get("file").value )
-
-            elif node.value == "SpriteFilm":
-                sprite = gfx.SpriteFilm( self.get( node.get("surface").value ) )
-                sprite.set_div( int( node.get("div_x").value ),
-                                int( node.get("div_y").value ) )
-                sprite.center = geo.Vec2D( int( node.get("center_x").value ),
-                                           int( node.get("center_y").value ) )
+                    typ( self.get_value( res_name, "x" ) ),
+                    typ( self.get_value( res_name, "y" ) ) )
+
+            elif value == "Surface":
+                # Part of an atlas image, sharing its pixels
+                if "atlas" in attribs:
+                    atlas = self.load( self.get_value( res_name, "atlas" ) )
+                    return gfx.Surface( atlas.subsurface(
+                                            self.get_from_name( res_name + ".rect" ) ) )
+                else:
+                    return gfx.Surface( self.load_image( self.get_value( res_name, "file" ) ) )
+
+            elif value == "SpriteFilm":
+                sprite = gfx.SpriteFilm( self.get( self.get_value( res_name, "surface" ) ) )
+                sprite.set_div( int( self.get_value( res_name, "div_x" ) ),
+                                int( self.get_value( res_name, "div_y" ) ) )
+                sprite.center = geo.Vec2D( int( self.get_value( res_name, "center_x" ) ),
+                                           int( self.get_value( res_name, "center_y" ) ) )
                 return sprite
 
-            elif node.value == "SubSurf":
-                if "surface" in node.attribs.keys():
-                    subsurf = gfx.SubSurf( self.get( node.get("surface").value ) )
-                    subsurf.rect = self.get_from_node( node.get("rect") )
+            elif value == "SubSurf":
+                if "surface" in attribs:
+                    subsurf = gfx.SubSurf( self.get( self.get_value( res_name, "surface" ) ) )
+                    subsurf.rect = self.get_from_name( res_name + ".rect" )
                 else:
-                    subsurf = gfx.SubSurf( gfx.Surface( node.get("file").value ) )
+                    subsurf = gfx.SubSurf( gfx.Surface( self.load_image( self.get_value( res_name, "file" ) ) ) )
 
-                if "offset_x" in node.attribs.keys():
+                if "offset_x" in attribs:
                     subsurf.offset = geo.Vec2D(
-                            int( node.get("offset_x").value),
-                            int( node.get("offset_y").value) )
+                            int( self.get_value( res_name, "offset_x" ) ),
+                            int( self.get_value( res_name, "offset_y" ) ) )
                 return subsurf
 
-            elif node.value == "Music":
-                return snd.Music( node.get("file").value )
+            elif value == "Music":
+                music = snd.Music()
+                music.sound = self.load_sound( self.get_value( res_name, "file" ) )
+                return music
 
-            elif node.value == "Sound":
-                return snd.Sound( node.get("file").value )
+            elif value == "Sound":
+                sound = snd.Sound()
+                sound.sound = self.load_sound( self.get_value( res_name, "file" ) )
+                return sound
 
             else:
                 raise Exception("unknown type in resource file")
@@ -88,9 +167,163 @@ class ResourceManager:
         """Load a file, or get it from memory."""
         if filename not in self.loaded_files:
             if filename.lower().endswith(".png") or filename.lower().endswith(".jpg"):
-                self.loaded_files[ filename ] = pygame.image.load( filename ).convert_alpha()
+                self.loaded_files[ filename ] = self.load_image( filename, use_rle = False )
 
         return self.loaded_files[ filename ]
 
+    def load_image( self, filename, use_rle = True ):
+        """Return the image file in the display format, see gfx.load_image."""
+        decoded = self.pop_decoded( filename )
+        if decoded is None:
+            return gfx.load_image( filename, use_rle )
+        image, opaque = decoded
+        return gfx.convert_image( image, use_rle, opaque )
+
+    def load_sound( self, filename ):
+        """Return the sound file as a pygame.mixer.Sound."""
+        sound = self.pop_decoded( filename )
+        if sound is None:
+            sound = pygame.mixer.Sound( filename )
+        return sound
+
+    def pop_decoded( self, filename ):
+        self.lock.acquire()
+        try:
+            return self.decoded_files.pop( filename, None )
+        finally:
+            self.lock.release()
+
+    def get_names( self, patterns ):
+        """Return the names of the prefetchable resources that match one of
+        the patterns, like "game.*"."""
+        names = []
+        sections = [""]
+        while len( sections ) > 0:
+            section = sections.pop()
+            for child in self.children[ section ]:
+                if section == "":
+                    name = child
+                else:
+                    name = section + "." + child
+                if self.values[ name ] == "Section":
+                    sections.append( name )
+                elif self.values[ name ] in ResourceManager.PREFETCH_TYPES:
+                    for pattern in patterns:
+                        if fnmatch( name, pattern ):
+                            names.append( name )
+                            break
+        names.sort()
+        return names
+
+    def get_files( self, res_name ):
+        """Return the files that resource res_name is created from."""
+        files = []
+        for attrib in ["file", "atlas"]:
+            if attrib in self.children[ res_name ]:
+                files.append( self.get_value( res_name, attrib ) )
+        if "surface" in self.children[ res_name ]:
+            files += self.get_files( self.get_value( res_name, "surface" ) )
+        return files
+
+    def prefetch( self, patterns ):
+        """Decode the files of the resources that match patterns on the
+        worker thread.
+
+        patterns is a list of resource names, which may contain wildcards.
+        The resources are created by prefetch_tick(), or by get() when
+        they're needed sooner.
+        """
+        for res_name in self.get_names( patterns ):
+            if res_name in self.loaded_resources:
+                continue
+
+            filenames = []
+            for filename in self.get_files( res_name ):
+                if filename not in self.loaded_files:
+                    filenames.append( filename )
+                    self.lock.acquire()
+                    if filename not in self.pending_files and \
+                           filename not in self.decoded_files:
+                        self.pending_files.add( filename )
+                        self.queued_files.append( filename )
+                    self.lock.release()
+            self.prefetch_names.append( (res_name, filenames) )
+
+        # the worker stops when it's done, so it never blocks exiting
+        self.lock.acquire()
+        if self.worker is None and len( self.queued_files ) > 0:
+            self.worker = threading.Thread( target = self._decode_files )
+            self.worker.daemon = True
+            self.worker.start()
+        self.lock.release()
+
+    def prefetch_tick( self, max_msec = 2.0 ):
+        """Create prefetched resources whose files are decoded, until
+        max_msec has passed. Call it once each frame."""
+        end_time = time.time() + max_msec / 1000.0
+        while len( self.prefetch_names ) > 0 and time.time() < end_time:
+            res_name, filenames = self.prefetch_names[0]
+            self.lock.acquire()
+            is_decoded = len( self.pending_files.intersection( filenames ) ) == 0
+            self.lock.release()
+            if not is_decoded:
+                break
+
+            del self.prefetch_names[0]
+            if res_name in self.loaded_resources:
+                # get() was sooner, the decoded files aren't needed anymore
+                for filename in filenames:
+                    self.pop_decoded( filename )
+                continue
+
+            try:
+                self.get( res_name )
+            except KeyError:
+                # Resources like game.mirror_sprite miss attributes that are
+                # never used, get() reports it when such a resource is used
+                for filename in filenames:
+                    self.pop_decoded( filename )
+
+    def stop_prefetch( self ):
+        """Drop the queued files and wait for the worker to finish."""
+        self.lock.acquire()
+        self.pending_files.difference_update( self.queued_files )
+        self.queued_files = []
+        worker = self.worker
+        self.lock.release()
+
+        if worker is not None:
+            worker.join()
+
+    def is_prefetching( self ):
+        return len( self.prefetch_names ) > 0
+
+    def _decode_files( self ):
+        """Decode the queued files, runs on the worker thread."""
+        while True:
+            self.lock.acquire()
+            if len( self.queued_files ) == 0:
+                self.worker = None
+                self.lock.release()
+                return
+            filename = self.queued_files.pop( 0 )
+            self.lock.release()
+
+            decoded = None
+            try:
+                if filename.lower().endswith(".png") or filename.lower().endswith(".jpg"):
+                    image = pygame.image.load( filename )
+                    decoded = (image, gfx.is_opaque( image ))
+                elif pygame.mixer.get_init():
+                    decoded = pygame.mixer.Sound( filename )
+            except Exception:
+                pass # get() loads it again, and reports the error
+
+            self.lock.acquire()
+            if decoded is not None:
+                self.decoded_files[ filename ] = decoded
+            self.pending_files.discard( filename )
+            self.lock.release()
+
 
 resman = ResourceManager()
@@ -0,0 +1,51 @@
+import time
+
+import pygame
+
+from monorail.koon.app import *
+
+class TestFrameScheduler:
+
+    def setup_class( cls ):
+        pygame.init()
+
+    def teardown_class( cls ):
+        pygame.quit()
+
+    def test_get_tick_count( self ):
+        scheduler = FrameScheduler()
+        scheduler.next_game_tick = pygame.time.get_ticks() - GAMETICKS * 2 - 1
+        assert scheduler.get_tick_count() == 3
+        assert scheduler.get_tick_count() == 0
+
+        scheduler.next_game_tick = pygame.time.get_ticks() - GAMETICKS * 10
+        assert scheduler.get_tick_count() == FrameScheduler.MAX_TICKS
+        assert scheduler.next_game_tick >= pygame.time.get_ticks() - 5
+
+    def test_should_render( self ):
+        scheduler = FrameScheduler()
+        assert scheduler.should_render()
+
+        scheduler.next_game_tick = pygame.time.get_ticks() - GAMETICKS * 10
+        assert not scheduler.should_render()
+        assert not scheduler.should_render()
+        assert scheduler.should_render()
+
+    def test_wait( self ):
+        scheduler = FrameScheduler( max_fps = 50, idle_fps = 20 )
+        start = time.time()
+        for i in range( 5 ):
+            scheduler.wait()
+        assert 0.08 < time.time() - start < 0.15
+
+        scheduler.is_idle = True
+        start = time.time()
+        scheduler.wait()
+        assert 0.03 < time.time() - start < 0.07
+        assert scheduler.jitter < 5
+
+    def test_no_limit( self ):
+        scheduler = FrameScheduler( max_fps = None )
+        start = time.time()
+        scheduler.wait()
+        assert time.time() - start < 0.01
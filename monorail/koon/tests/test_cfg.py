@@ -197,6 +197,18 @@ class TestConfigFile:
         except:
             assert True
 
+    def test_flatten( self ):
+        root = cfg.ConfigNode("root", "root")
+        sub1 = cfg.ConfigNode("sub1", "val1")
+        sub2 = cfg.ConfigNode("sub2", "val2")
+        root.attribs["sub1"] = sub1
+        sub1.attribs["sub2"] = sub2
+
+        values, children = root.flatten()
+
+        assert values == {"sub1": "val1", "sub1.sub2": "val2"}
+        assert children == {"": ["sub1"], "sub1": ["sub2"], "sub1.sub2": []}
+
     def test_preserve_layout( self ):
         pass
 
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+
+from monorail.koon.diskcache import *
+
+class TestDiskCache:
+
+    def setup_method( self, method ):
+        self.directory = os.path.join( tempfile.mkdtemp(), "cache" )
+
+    def teardown_method( self, method ):
+        shutil.rmtree( os.path.dirname( self.directory ) )
+
+    def _add( self, cache, key, size ):
+        f = open( cache.get_tmp_filename( key, ".dat" ), "wb" )
+        f.write( "x" * size )
+        f.close()
+        return cache.add( key, ".dat" )
+
+    def test_add_get( self ):
+        cache = DiskCache( self.directory, 1000 )
+
+        assert cache.get( "a", ".dat" ) is None
+
+        filename = self._add( cache, "a", 10 )
+
+        assert cache.get( "a", ".dat" ) == filename
+        assert open( filename, "rb" ).read() == "x" * 10
+        assert cache.get_size() == 10
+
+    def test_evict_least_recently_used( self ):
+        cache = DiskCache( self.directory, 250 )
+
+        self._add( cache, "a", 100 )
+        self._add( cache, "b", 100 )
+        os.utime( cache.get_filename( "a", ".dat" ), (1000, 1000) )
+        os.utime( cache.get_filename( "b", ".dat" ), (2000, 2000) )
+        cache.get( "a", ".dat" )
+
+        self._add( cache, "c", 100 )
+
+        assert cache.get( "a", ".dat" ) is not None
+        assert cache.get( "b", ".dat" ) is None
+        assert cache.get( "c", ".dat" ) is not None
+        assert cache.get_size() == 200
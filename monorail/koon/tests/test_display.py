@@ -0,0 +1,58 @@
+import pygame
+
+from monorail.koon.display import *
+
+class TestScaledDisplay:
+
+    def setup_class( cls ):
+        pygame.init()
+
+    def teardown_class( cls ):
+        pygame.quit()
+
+    def init_display( self, screen_size ):
+        display = ScaledDisplay( (80, 60) )
+        display.init_scaling( pygame.display.set_mode( screen_size, 0, 32 ) )
+        display.surface.fill( (0, 0, 255) )
+        display.present()
+        return display
+
+    def test_not_scaled( self ):
+        display = self.init_display( (80, 60) )
+        assert not display.is_scaled()
+        assert display.surface is display.screen
+        assert display.to_surface_pos( (10, 20) ) == (10, 20)
+
+    def test_integer_scale( self ):
+        display = self.init_display( (170, 130) )
+        assert display.scale == 2
+        assert display.offset == (5, 5)
+        assert not display.is_smooth()
+        assert display.to_surface_pos( (25, 45) ) == (10, 20)
+        assert display.to_surface_pos( (0, 500) ) == (0, 59)
+
+        display.surface.fill( (255, 0, 0), (10, 10, 5, 5) )
+        display.present( [pygame.Rect(10, 10, 5, 5)] )
+        assert display.screen.get_at( (25, 25) ) == (255, 0, 0)
+        assert display.screen.get_at( (34, 34) ) == (255, 0, 0)
+        assert display.screen.get_at( (35, 35) ) == (0, 0, 255)
+        assert display.screen.get_at( (2, 2) ) == (0, 0, 0)
+
+    def test_smooth_scale( self ):
+        display = self.init_display( (100, 90) )
+        assert display.scale == 1.25
+        assert display.offset == (0, 7)
+        assert display.is_smooth()
+
+        display.surface.fill( (255, 0, 0), (20, 20, 20, 20) )
+        display.present( [pygame.Rect(20, 20, 20, 20)] )
+        assert display.screen.get_at( (37, 44) ) == (255, 0, 0)
+        assert display.screen.get_at( (5, 14) ) == (0, 0, 255)
+
+        display.surface.fill( (0, 255, 0), (60, 40, 10, 10) )
+        display.present( [] )
+        assert display.screen.get_at( (81, 63) ) == (0, 0, 255)
+
+        display.present( [pygame.Rect(60, 40, 10, 10)] )
+        assert display.screen.get_at( (81, 63) ) == (0, 255, 0)
+        assert display.screen.get_at( (37, 44) ) == (255, 0, 0)
@@ -1,5 +1,6 @@
 
 from monorail.koon.gfx import *;
+import os
 import pygame
 
 class TestFont:
@@ -33,6 +34,78 @@ class TestFont:
         font = Font( size=20 )
         font.draw( "Testje", surface, (10, 10) )
 
+    def test_shared_fonts( self ):
+        font = Font( size=20 )
+        assert Font( size=20, color=(255,0,0) ).pygame_font is font.pygame_font
+        assert Font( size=21 ).pygame_font is not font.pygame_font
+
+    def test_text_cache( self ):
+        surface = Surface( (400, 400) )
+        font = Font( size=20 )
+        misses = Font.text_cache.misses
+        hits = Font.text_cache.hits
+
+        font.draw( "Cached", surface, (10, 10) )
+        font.draw( "Cached", surface, (10, 30) )
+        assert Font.text_cache.misses == misses + 1
+        assert Font.text_cache.hits == hits + 1
+
+        font.set_color( (255,255,255) )
+        font.render( "Cached" )
+        assert Font.text_cache.misses == misses + 2
+
+    def test_text_cache_size( self ):
+        cache = TextCache( 2 )
+        cache.add( "a", 1 )
+        cache.add( "b", 2 )
+        assert cache.get( "a" ) == 1
+        cache.add( "c", 3 )
+
+        assert cache.get( "b" ) is None
+        assert cache.get( "a" ) == 1
+        assert cache.get( "c" ) == 3
+        assert (cache.hits, cache.misses) == (3, 1)
+
+
+class TestDirtySurface:
+
+    def test_draw( self ):
+        target = pygame.Surface( (100, 100) )
+        surface = DirtySurface( target )
+        image = Surface( (10, 20) )
+
+        assert surface.get_rect() is None
+        image.draw( surface, (5, 5) )
+        image.draw( surface, (50, 50), (0, 0, 10, 10) )
+
+        assert surface.rects == [pygame.Rect(5, 5, 10, 20), pygame.Rect(50, 50, 10, 10)]
+        assert surface.get_rect() == pygame.Rect(5, 5, 55, 55)
+
+        surface.scroll( 1, 1 )
+        assert surface.rects[-1] == target.get_rect()
+
+    def test_measure_only( self ):
+        target = pygame.Surface( (100, 100) )
+        target.fill( (1, 2, 3) )
+        surface = DirtySurface( target, True )
+        image = Surface( (10, 20) )
+
+        image.draw( surface, (5, 5) )
+
+        assert target.get_at( (10, 10) ) == (1, 2, 3)
+        assert surface.get_rect().contains( pygame.Rect(5, 5, 10, 20) )
+        assert surface.draws == [("blit", (image.pysurf, (5, 5), None, 0))]
+
+        surface.fill( (4, 5, 6), (20, 30, 5, 5) )
+        assert target.get_at( (22, 32) ) == (1, 2, 3)
+        assert surface.rects[-1] == pygame.Rect(20, 30, 5, 5)
+        assert surface.draws[-1] == ("fill", ((4, 5, 6), (20, 30, 5, 5), 0))
+
+        try:
+            surface.scroll( 1, 1 )
+            assert False, "scroll can't be measured"
+        except UnsupportedDraw:
+            pass
 
 class TestTimer:
 
@@ -141,3 +214,77 @@ class TestLoopAnimationTimer:
         # Then
         assert anim.get_frame( 0 ) == 0
         assert anim.get_frame( 1 ) == 2
+
+
+class TestSpriteFilm:
+
+    def test_frame_rects( self ):
+        sprite = SpriteFilm( Surface( (40, 20) ) )
+        sprite.set_div( 4, 2 )
+
+        assert len( sprite.frame_rects ) == 8
+        assert sprite.get_frame_rect( 0 ) == (0, 0, 10, 10)
+        assert sprite.get_frame_rect( 5 ) == (10, 10, 10, 10)
+        assert sprite.get_frame_rect( 9 ) == (10, 20, 10, 10)
+
+    def test_draw( self ):
+        image = pygame.Surface( (20, 10) )
+        image.fill( (255, 0, 0), (10, 0, 10, 10) )
+        sprite = SpriteFilm( Surface( image ) )
+        sprite.set_div( 2, 1 )
+        target = pygame.Surface( (10, 10) )
+
+        sprite.nr = 1
+        sprite.draw( target, Vec2D( 5, 5 ) )
+
+        assert target.get_at( (0, 0) ) == (255, 0, 0)
+
+
+class TestLoadImage:
+
+    def setup_class( cls ):
+        pygame.init()
+        pygame.display.set_mode( (100, 100), 0, 32 )
+
+    def teardown_class( cls ):
+        pygame.quit()
+
+    def test_alpha( self ):
+        image = pygame.Surface( (10, 10), pygame.SRCALPHA, 32 )
+        image.fill( (255, 0, 0, 255) )
+        pygame.image.save( image, "image.tmp.png" )
+        assert not load_image( "image.tmp.png" ).get_flags() & pygame.SRCALPHA
+
+        image.fill( (255, 0, 0, 128), (0, 0, 5, 5) )
+        pygame.image.save( image, "image.tmp.png" )
+        surface = load_image( "image.tmp.png" )
+        assert surface.get_flags() & pygame.SRCALPHA
+        assert surface.get_flags() & pygame.RLEACCELOK
+        assert not load_image( "image.tmp.png", use_rle = False ).get_flags() & pygame.RLEACCELOK
+        os.remove( "image.tmp.png" )
+
+
+class TestBlendCache:
+
+    def test_get( self ):
+        cache = BlendCache()
+        surface = Surface( pygame.Surface( (10, 10), pygame.SRCALPHA, 32 ) )
+        surface.pysurf.fill( (255, 0, 0, 255) )
+
+        blended = cache.get( surface, 0.6 )
+        assert cache.get( surface, 0.61 ) is blended
+        assert cache.get( surface, 0.5 ) is not blended
+        assert cache.get( surface, 1.0 ) is surface
+        assert blended.pysurf.get_at( (0, 0) )[3] == int( 255 * 10 / 16.0 )
+
+    def test_max_bytes( self ):
+        cache = BlendCache( max_bytes = 2 * 10 * 10 * 4 )
+        surface = Surface( pygame.Surface( (10, 10), pygame.SRCALPHA, 32 ) )
+
+        cache.prewarm( surface, [0.25, 0.5] )
+        first = cache.get( surface, 0.25 )
+        cache.get( surface, 0.75 )
+
+        assert len( cache.surfaces ) == 2
+        assert cache.size == 2 * 10 * 10 * 4
+        assert cache.get( surface, 0.25 ) is first
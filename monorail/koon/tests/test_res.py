@@ -1,9 +1,23 @@
 
+import os
+import time
+import shutil
+import tempfile
 import pygame
-from monorail.koon.res import resman
+from monorail.koon.res import resman, ResourceManager
+from monorail.koon.diskcache import DiskCache
 import monorail.koon.geo as geo
 
 class TestResourceManager:
+    def setup_method( self, method ):
+        self.directory = tempfile.mkdtemp()
+        self.old_cache = ResourceManager.tree_cache
+        ResourceManager.tree_cache = DiskCache( self.directory, 1024 * 1024 )
+
+    def teardown_method( self, method ):
+        ResourceManager.tree_cache = self.old_cache
+        shutil.rmtree( self.directory )
+
     def test_get( self ):
         f = open( "resources.tmp", "w" )
         f.write("""
@@ -35,3 +49,118 @@ class TestResourceManager:
         assert resman.get("place1") == pygame.Rect( 10, 20, 100, 50 )
 
         assert resman.get("pos", int) == geo.Vec2D( 10, 20 )
+
+    def test_tree_cache( self ):
+        f = open( "resources.tmp", "w" )
+        f.write("""
+            timeout = 44
+            en = Language {
+                findit = Find it
+            }
+        """)
+        f.close()
+
+        resman.read( "resources.tmp" )
+        assert ResourceManager.tree_cache.get( resman.revision, ".marshal" ) is not None
+        values, children = resman.values, resman.children
+
+        resman.read( "resources.tmp" )
+        assert resman.values == values
+        assert resman.children == children
+        assert resman.values["en.findit"] == "Find it"
+        assert sorted( resman.children[""] ) == ["en", "timeout"]
+
+        # a changed file has another revision
+        f = open( "resources.tmp", "a" )
+        f.write("timeout2 = 45\n")
+        f.close()
+        resman.read( "resources.tmp" )
+        assert resman.values["timeout2"] == "45"
+
+        os.remove( "resources.tmp" )
+
+    def test_atlas_surface( self ):
+        pygame.init()
+        pygame.display.set_mode( (100, 100), 0, 32 )
+        atlas = pygame.Surface( (30, 10), pygame.SRCALPHA, 32 )
+        atlas.fill( (0, 255, 0, 128), (20, 0, 10, 10) )
+        pygame.image.save( atlas, "atlas.tmp.png" )
+
+        f = open( "resources.tmp", "w" )
+        f.write("""
+            green = Surface {
+                atlas = atlas.tmp.png
+                rect = Rectangle {
+                    x = 20
+                    y = 0
+                    width = 10
+                    height = 10
+                }
+            }
+        """)
+        f.close()
+        resman.read( "resources.tmp" )
+
+        green = resman.get("green")
+        assert green.get_size() == (10, 10)
+        assert green.pysurf.get_at( (0, 0) ) == (0, 255, 0, 128)
+
+        pygame.quit()
+        os.remove( "atlas.tmp.png" )
+
+    def test_prefetch( self ):
+        pygame.init()
+        pygame.display.set_mode( (100, 100), 0, 32 )
+        image = pygame.Surface( (10, 10), pygame.SRCALPHA, 32 )
+        image.fill( (255, 0, 0, 128) )
+        pygame.image.save( image, "red.tmp.png" )
+
+        f = open( "resources.tmp", "w" )
+        f.write("""
+            game = Section {
+                red_surf = Surface {
+                    file = red.tmp.png
+                }
+                red_sprite = SpriteFilm {
+                    center_x = 0
+                    center_y = 0
+                    div_x = 1
+                    div_y = 1
+                    surface = game.red_surf
+                }
+                title = Red
+                red_music = Music {
+                    file = red.tmp.ogg
+                }
+            }
+            other_surf = Surface {
+                file = red.tmp.png
+            }
+        """)
+        f.close()
+        resman.read( "resources.tmp" )
+
+        assert resman.get_names( ["game.*"] ) == ["game.red_sprite", "game.red_surf"]
+        assert resman.get_names( ["*_surf"] ) == ["game.red_surf", "other_surf"]
+        assert resman.get_files( "game.red_sprite" ) == ["red.tmp.png"]
+
+        resman.prefetch( ["game.red_sprite"] )
+        for i in range( 0, 1000 ):
+            resman.prefetch_tick()
+            if not resman.is_prefetching():
+                break
+            time.sleep( 0.005 )
+
+        assert not resman.is_prefetching()
+        assert "game.red_surf" in resman.loaded_resources
+        red = resman.get("game.red_sprite")
+        assert red.surface.pysurf.get_at( (0, 0) ) == (255, 0, 0, 128)
+        assert resman.decoded_files == {}
+
+        resman.prefetch( ["other_surf"] )
+        resman.stop_prefetch()
+        assert resman.worker is None
+        assert resman.get("other_surf").get_size() == (10, 10)
+
+        pygame.quit()
+        os.remove( "red.tmp.png" )
@@ -0,0 +1,70 @@
+import os
+import json
+import time
+
+from monorail.koon.timing import *
+
+class TestTimings:
+
+    def test_disabled( self ):
+        timings = Timings()
+        start = timings.begin()
+        timings.end( "tick", start )
+        assert start is None
+        assert timings.get_names() == []
+
+    def test_stats( self ):
+        timings = Timings( 100 )
+        for i in range( 200 ):
+            timings.add( "tick", float(i) )
+
+        stats = timings.get_stats( "tick" )
+        assert stats["count"] == 100
+        assert stats["p50"] == 150.0
+        assert stats["p95"] == 195.0
+        assert stats["p99"] == 199.0
+        assert stats["max"] == 199.0
+        assert stats["mean"] == 149.5
+
+    def test_frame_totals( self ):
+        timings = Timings()
+        timings.is_enabled = True
+        for i in range( 3 ):
+            timings.end_in_frame( "draw.View", timings.begin() )
+        assert timings.get_names() == []
+
+        timings.end_frame()
+        assert timings.get_stats( "draw.View" )["count"] == 1
+
+    def test_dump( self ):
+        timings = Timings()
+        timings.add( "tick", 2.0 )
+        timings.add( "render", 5.0 )
+
+        timings.dump( "timings.tmp.json" )
+        stats = json.load( open( "timings.tmp.json" ) )
+        assert sorted( stats.keys() ) == ["render", "tick"]
+        assert stats["tick"]["p99"] == 2.0
+
+        timings.dump( "timings.tmp.csv" )
+        lines = open( "timings.tmp.csv" ).read().splitlines()
+        assert lines[0] == "name,count,mean,p50,p95,p99,max"
+        assert lines[1].startswith( "render,1,5.0" )
+
+        os.remove( "timings.tmp.json" )
+        os.remove( "timings.tmp.csv" )
+
+class TestPhases:
+
+    def test_end( self ):
+        phases = Phases( time.time() - 0.5 )
+        phases.end( "imports" )
+        phases.end( "menu" )
+
+        assert [name for name, msec in phases.durations] == ["imports", "menu"]
+        assert phases.durations[0][1] >= 500.0
+        assert abs( phases.get_total() - sum( [msec for name, msec in phases.durations] ) ) < 0.001
+
+        lines = phases.get_report( "startup" ).splitlines()
+        assert lines[0].startswith( "startup: " )
+        assert lines[1].split()[0] == "imports"
@@ -0,0 +1,145 @@
+"""Timing of named scopes, to find out where the frame time goes.
+
+use 'timings' as the main Timings of the application
+"""
+import time
+import csv
+import json
+from collections import deque, OrderedDict
+
+import gfx
+
+class Timings:
+    """Durations of named scopes in milliseconds
+
+    Only the last size durations of each scope are kept. Nothing is
+    measured when is_enabled is False.
+
+    Usage:
+        start = timings.begin()
+        ...
+        timings.end( "name", start )
+    """
+    STATS = ["count", "mean", "p50", "p95", "p99", "max"]
+
+    def __init__( self, size = 256 ):
+        self.size = size
+        self.is_enabled = False
+        self.clear()
+
+    def clear( self ):
+        self.samples = OrderedDict()
+        self.frame_totals = {}
+
+    def begin( self ):
+        """Return the start time of a scope, or None when not enabled."""
+        if self.is_enabled:
+            return time.time()
+        else:
+            return None
+
+    def end( self, name, start ):
+        """Add the duration of scope name, started at start."""
+        if start is not None:
+            self.add( name, (time.time() - start) * 1000.0 )
+
+    def add( self, name, msec ):
+        if name not in self.samples:
+            self.samples[ name ] = deque( maxlen = self.size )
+        self.samples[ name ].append( msec )
+
+    def end_in_frame( self, name, start ):
+        """Add the duration of scope name to its total of this frame.
+
+        Use it for scopes that run many times each frame.
+        """
+        if start is not None:
+            msec = (time.time() - start) * 1000.0
+            self.frame_totals[ name ] = self.frame_totals.get( name, 0.0 ) + msec
+
+    def end_frame( self ):
+        """Add the totals of the frame to their scopes."""
+        for name, msec in self.frame_totals.items():
+            self.add( name, msec )
+        self.frame_totals = {}
+
+    def get_stats( self, name ):
+        """Return the count, mean, p50, p95, p99 and max duration of name."""
+        samples = sorted( self.samples[ name ] )
+        count = len( samples )
+        stats = { "count": count,
+                  "mean": sum( samples ) / count,
+                  "max": samples[-1] }
+        for p in [50, 95, 99]:
+            stats[ "p%d" % p ] = samples[ min( count-1, count * p / 100 ) ]
+        return stats
+
+    def get_names( self ):
+        return sorted( self.samples.keys() )
+
+    def dump( self, filename ):
+        """Write the stats of all scopes to a .json or .csv file."""
+        out_file = open( filename, "wb" )
+        if filename.endswith(".json"):
+            json.dump( OrderedDict( [(name, self.get_stats( name ))
+                                     for name in self.get_names()] ),
+                       out_file, indent = 1 )
+        else:
+            writer = csv.writer( out_file )
+            writer.writerow( ["name"] + Timings.STATS )
+            for name in self.get_names():
+                stats = self.get_stats( name )
+                writer.writerow( [name] + [stats[s] for s in Timings.STATS] )
+        out_file.close()
+
+    def draw( self, surface, pos = (10, 30), header = None ):
+        """Draw the p50, p95 and p99 of all scopes on surface."""
+        font = gfx.Font.get_pygame_font( "freesansbold.ttf", 12 )
+        rows = [["ms", "p50", "p95", "p99"]]
+        for name in self.get_names():
+            stats = self.get_stats( name )
+            rows.append( [name] + ["%.2f" % stats[s] for s in ["p50", "p95", "p99"]] )
+        if header is not None:
+            rows.insert( 0, [header] )
+
+        x, y = pos
+        columns = [0, 170, 220, 270]
+        surface.fill( (0, 0, 0), (x - 4, y - 2, 320, len(rows) * 14 + 4) )
+        for row in rows:
+            for column, text in zip( columns, row ):
+                surface.blit( font.render( text, True, (255, 255, 255) ),
+                              (x + column, y) )
+            y += 14
+
+class Phases:
+    """Durations of consecutive phases in milliseconds, like the phases of
+    starting up
+
+    Usage:
+        phases = Phases()
+        ...
+        phases.end( "name" )
+    """
+    def __init__( self, start = None ):
+        if start is None:
+            start = time.time()
+        self.start = start
+        self.last = start
+        self.durations = []
+
+    def end( self, name ):
+        """End phase name, which started at the end of the previous one."""
+        now = time.time()
+        self.durations.append( (name, (now - self.last) * 1000.0) )
+        self.last = now
+
+    def get_total( self ):
+        return (self.last - self.start) * 1000.0
+
+    def get_report( self, title ):
+        lines = ["%s: %.1f ms" % (title, self.get_total())]
+        for name, msec in self.durations:
+            lines.append( "  %-20s %8.1f ms" % (name, msec) )
+        return "\n".join( lines )
+
+timings = Timings()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""All level files in one memory mapped file.
+
+The pack starts with an index of the name, offset, size, modification
+time and md5 of each level file, followed by their contents.
+
+Usage: levelpack.py [pack_filename]
+       packs the .lvl files in the directory of pack_filename, which is
+       data/levels/levels.pak by default
+"""
+
+import os
+import sys
+import glob
+import mmap
+import struct
+import hashlib
+
+class LevelPack:
+    """Gives the contents of the level files in a pack
+
+    Use LevelPack.get_instance() for the pack of the game, it is None when
+    there is no usable pack. When a level file next to the pack has another size or
+    modification time than when it was packed, the file is used instead.
+    """
+    FILENAME = "data/levels/levels.pak"
+    MAGIC = "MMLP"
+    VERSION = 2
+    HEADER_FORMAT = "<4sII" # magic, version, count
+    ENTRY_FORMAT = "<32sIII16s" # name, offset, size, mtime, md5
+
+    instance = None
+    is_unusable = False # set when the pack of the game can't be read
+
+    def __init__( self, filename ):
+        self.filename = filename
+        pack_file = open( filename, "rb" )
+        try:
+            self.data = mmap.mmap( pack_file.fileno(), 0, access = mmap.ACCESS_READ )
+        finally:
+            pack_file.close()
+
+        magic, version, count = struct.unpack_from( LevelPack.HEADER_FORMAT, self.data )
+        if magic != LevelPack.MAGIC or version != LevelPack.VERSION:
+            raise ValueError( "%s is no level pack of version %d" % (filename, LevelPack.VERSION) )
+
+        self.index = {}
+        offset = struct.calcsize( LevelPack.HEADER_FORMAT )
+        entry_size = struct.calcsize( LevelPack.ENTRY_FORMAT )
+        for i in range( count ):
+            name, data_offset, size, mtime, md5 = \
+                  struct.unpack_from( LevelPack.ENTRY_FORMAT, self.data, offset )
+            if data_offset + size > len( self.data ):
+                raise ValueError( "%s is truncated" % filename )
+            self.index[ name.rstrip("\0") ] = (data_offset, size, mtime, md5.encode("hex"))
+            offset += entry_size
+
+    @staticmethod
+    def get_instance():
+        """Return the pack of the game, or None to read the level files."""
+        if LevelPack.instance is None and not LevelPack.is_unusable and \
+           os.path.exists( LevelPack.FILENAME ):
+            try:
+                LevelPack.instance = LevelPack( LevelPack.FILENAME )
+            except (EnvironmentError, ValueError, struct.error):
+                LevelPack.is_unusable = True # an old or broken pack, rebuild it
+        return LevelPack.instance
+
+    def get( self, filename ):
+        """Return the (content, md5) of level filename.
+
+        None is returned when it's not packed, or when the file changed since.
+        """
+        entry = self.index.get( os.path.basename( filename ) )
+        if entry is None:
+            return None
+        offset, size, mtime, md5 = entry
+
+        try:
+            stat = os.stat( filename )
+            if stat.st_size != size or int( stat.st_mtime ) != mtime:
+                return None
+        except OSError:
+            pass # only packed
+
+        return self.data[ offset : offset + size ], md5
+
+    def forget( self, filename ):
+        """Don't use the packed level filename anymore, like after it's saved."""
+        self.index.pop( os.path.basename( filename ), None )
+
+    @staticmethod
+    def write( filename, level_filenames ):
+        """Pack the level_filenames into the file filename."""
+        contents = []
+        for level_filename in level_filenames:
+            level_file = open( level_filename, "rb" )
+            contents.append( (os.path.basename( level_filename ), level_file.read(),
+                              int( os.path.getmtime( level_filename ) )) )
+            level_file.close()
+
+        header = struct.pack( LevelPack.HEADER_FORMAT, LevelPack.MAGIC,
+                              LevelPack.VERSION, len( contents ) )
+        offset = len( header ) + len( contents ) * struct.calcsize( LevelPack.ENTRY_FORMAT )
+
+        pack_file = open( filename, "wb" )
+        pack_file.write( header )
+        for name, content, mtime in contents:
+            pack_file.write( struct.pack( LevelPack.ENTRY_FORMAT, name, offset, len( content ),
+                                          mtime, hashlib.md5( content ).digest() ) )
+            offset += len( content )
+        for name, content, mtime in contents:
+            pack_file.write( content )
+        pack_file.close()
+
+def main():
+    filename = LevelPack.FILENAME
+    if len( sys.argv ) > 1: filename = sys.argv[1]
+
+    level_filenames = sorted( glob.glob( os.path.join( os.path.dirname( filename ), "*.lvl" ) ) )
+    LevelPack.write( filename, level_filenames )
+    print "packed %d levels in %s" % (len( level_filenames ), filename)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from koon.geo import *
 from koon.res import resman
 import koon.gfx as gfx
 import koon.input as input
+from koon.display import display
 
 from settings import GameType, Configuration
 from player import *
@@ -78,7 +79,7 @@ class MonorailMenu:
         self.screen.draw( surface, interpol, time_sec )
 
     def draw_mouse( self, surface, interpol, time_sec ):
-        x, y = pygame.mouse.get_pos()
+        x, y = display.get_mouse_pos()
         resman.get("gui_surf").draw( surface, Vec2D(x, y), (0,0,32,32) )
 
 
@@ -496,10 +497,7 @@ class OptionsDialog (Dialog):
             if self.fullscreen_btn.went_down():
                 Event.button()
                 self.config.is_fullscreen = not self.config.is_fullscreen
-                if not self.config.is_fullscreen:
-                    pygame.display.set_mode(self.config.resolution)
-                else:
-                    pygame.display.set_mode(self.config.resolution, pygame.FULLSCREEN)
+                display.set_mode( self.config.resolution, self.config.is_fullscreen )
                 self.update_fullscreen_label()
 
             if self.sound_slider.value_changed():
@@ -781,8 +779,8 @@ class ScreenLevelSelect (Screen):
             self.state = ScreenLevelSelect.LEVELS
 
         self.background = resman.get("gui.levelselect_surf")
-        self.font = pygame.font.Font("data/edmunds.ttf", 20)
-        self.fontL = pygame.font.Font("data/edmunds.ttf", 28)
+        self.font = Font.get_pygame_font( "data/edmunds.ttf", 20 )
+        self.fontL = Font.get_pygame_font( "data/edmunds.ttf", 28 )
 
         self.scenario = self.game_data.get_quest().create_scenario(self.game_data.skill_level.value)
         self.info = ScenarioInfo( self.scenario, self.game_data )
@@ -13,6 +13,8 @@ import pygame
 from pygame.locals import *
 
 from koon.geo import Vec2D
+from koon.app import FrameScheduler
+from koon.display import display
 import monorail
 from settings import Configuration
 
@@ -155,12 +157,26 @@ ALL_KEYS = [
 TICKS_PER_SECOND = 25
 GAMETICKS = 1000 / TICKS_PER_SECOND
 
+class MonkeyScheduler (FrameScheduler):
+    """Does one tick for each frame as fast as possible, so replays are equal."""
+
+    def get_tick_count( self ):
+        self.next_game_tick += GAMETICKS
+        return 1
+
+    def should_render( self ):
+        return True
+
+    def wait( self ):
+        pass
+
 class Monkey (monorail.Monorail):
     """A fuzzy Tester of Monorail
     """
 
     def __init__( self, config, replay_file = None ):
         monorail.Monorail.__init__( self, config )
+        self.scheduler = MonkeyScheduler()
         self.user_exit = False
 
         if replay_file is None:
@@ -241,7 +257,7 @@ class Monkey (monorail.Monorail):
             self.fps = 0
             frame_count = 0
 
-            next_game_tick = pygame.time.get_ticks()
+            self.scheduler.start()
             next_half_second = pygame.time.get_ticks()
             if timeout is not None:
                 end_game_tick = pygame.time.get_ticks() + timeout * 1000
@@ -253,24 +269,24 @@ class Monkey (monorail.Monorail):
                 self.handle_events()
 
                 # game tick
-                loop_count = 0
-                while loop_count < 1:
+                for i in range( self.scheduler.get_tick_count() ):
                     self.do_tick( self.userinput )
                     self.userinput.update()
-                    next_game_tick += GAMETICKS
-                    loop_count += 1
 
                 # render
-                time_sec = pygame.time.get_ticks() * 0.001
-                interpol = 1 - ((next_game_tick - pygame.time.get_ticks()) / GAMETICKS)
-                self.render(pygame.display.get_surface(), interpol, time_sec )
-                pygame.display.flip()
-
-                frame_count += 1
-                if pygame.time.get_ticks() > next_half_second:
-                    self.fps = 2 * frame_count
-                    frame_count = 0
-                    next_half_second += 500
+                if self.scheduler.should_render():
+                    time_sec = pygame.time.get_ticks() * 0.001
+                    interpol = self.scheduler.get_interpol()
+                    rects = self.render( display.surface, interpol, time_sec )
+                    display.present( rects )
+
+                    frame_count += 1
+                    if pygame.time.get_ticks() > next_half_second:
+                        self.fps = 2 * frame_count
+                        frame_count = 0
+                        next_half_second += 500
+
+                self.scheduler.wait()
 
                 if timeout is not None and \
                                 pygame.time.get_ticks() > end_game_tick:
@@ -8,6 +8,8 @@ import traceback
 import inspect
 import imp
 
+START_TIME = time.time()
+
 #http://stackoverflow.com/questions/606561/how-to-get-filename-of-the-main-module-in-python
 def main_is_frozen():
    return (hasattr(sys, "frozen") or # new py2exe
@@ -62,7 +64,10 @@ import koon.app
 from koon.app import Game
 from koon.input import UserInput, Mouse, Joystick
 from koon.geo import Vec3D, Vec2D, Rectangle
-from koon.res import resman
+from koon.res import resman, ResourceManager
+from koon.diskcache import DiskCache
+from koon.timing import timings, Phases
+from koon.display import display
 from koon.gui import ImageButton, GuiState
 import koon.snd as snd
 
@@ -70,15 +75,15 @@ from menu import MonorailMenu, SingleSwitch
 from tiles import *
 from world import Level, Playfield
 from player import *
-from hud import Hud, IngameMenu
 from settings import *
-from frame import Frame
+from frame import Frame, DirtyScreen
 from sndman import MusicManager, SoundManager
 import control as ctrl
 import event
 import scenarios
 
-from worldview import PlayfieldView
+from worldview import LevelView, PlayfieldView
+from playerview import GoldCarView
 
 class Monorail (Game):
     """The Monorail main application
@@ -89,33 +94,55 @@ class Monorail (Game):
 
     def __init__( self, configuration ):
         Game.__init__( self, _("Mystic Mine"), configuration )
+        self.scheduler.max_fps = configuration.max_fps
+        self.scheduler.idle_fps = configuration.idle_fps
+        self.show_timings = False
+        self.timings_filename = None
 
     def before_gameloop( self ):
+        cache_dir = os.path.expanduser( "~/.mysticmine_cache" )
+        ResourceManager.tree_cache = DiskCache( os.path.join( cache_dir, "resources" ),
+                                                1024 * 1024 )
+        LevelView.background_cache = DiskCache( os.path.join( cache_dir, "backgrounds" ),
+                                                32 * 1024 * 1024 )
+
         resman.read("data/resources.cfg")
+        self.end_startup_phase( "resources" )
 
         self.game_data = GameData( self.userinput )
 
         # apply configuration settings
         SoundManager.set_sound_volume( self.config.sound_volume )
         SoundManager.set_music_volume( self.config.music_volume )
+        self.end_startup_phase( "game data" )
 
-        # set state
+        # set state, the game is created when the menu is done
         self.menu = MonorailMenu( self.game_data )
-        self.game = MonorailGame( self.game_data )
+        self.game = None
         self.editor = None
 
-        self.state = self.game
         self.state = self.menu
+        self.end_startup_phase( "menu" )
 
         # set window buttons
         self.max_button = ImageButton( copy.copy(resman.get("game.max_button")), Vec2D(800-16-4, 4) )
 
+        # clock sounds and big explosion graphic first, then the menu and
+        # the graphics and sounds of the first level while the menu is shown
+        resman.prefetch( ["game.clock_sound", "game.clockring_sound",
+                          "game.explosion_sprite"] )
+        resman.prefetch( ["gui_surf", "gui.*", "game.*"] )
+
 
 
     def do_tick( self, indev ):
         if indev.key.is_down(K_F5) and indev.key.is_down(K_F8) and indev.key.went_down( K_ESCAPE ):
             self.game_is_done = True
 
+        if indev.key.went_down( K_F3 ):
+            self.show_timings = not self.show_timings
+            timings.is_enabled = self.show_timings or self.timings_filename is not None
+
         if indev.key.is_down(K_F5) and indev.key.is_down(K_F8) and indev.key.went_down( K_e ):
             if self.state == self.game:
                 level_nr = self.game_data.get_quest().get_current_level_nr()
@@ -150,8 +177,11 @@ class Monorail (Game):
                 if self.menu.should_quit:
                     self.game_is_done = True
                 else:
+                    if self.game is None:
+                        self.game = MonorailGame( self.game_data )
+                    else:
+                        self.game.restart( self.game_data )
                     self.state = self.game
-                    self.game.restart( self.game_data )
 
         self.state.do_tick( indev )
 
@@ -159,17 +189,44 @@ class Monorail (Game):
         self.max_button.tick( indev, None )
         if self.max_button.went_down():
             self.config.is_fullscreen = not self.config.is_fullscreen
-            if not self.config.is_fullscreen:
-                pygame.display.set_mode(self.config.resolution)
-            else:
-                pygame.display.set_mode(self.config.resolution, pygame.FULLSCREEN)
+            display.set_mode( self.config.resolution, self.config.is_fullscreen )
+            self.invalidate_game()
 
     def render( self, surface, interpol, time_sec ):
-        self.state.draw( surface, interpol, time_sec )
+        """Render the current state.
+
+        Returns the changed screen rects, or None when all is changed."""
+        # menus don't need the full frame rate
+        self.scheduler.is_idle = self.state is self.menu
+
+        if self.state is not self.game:
+            self.invalidate_game()
+
+        screen = surface
+        dirty_screen = self.state.draw( surface, interpol, time_sec )
+        if dirty_screen is not None:
+            surface = dirty_screen.surface
+
         self.max_button.draw( surface, interpol, time_sec )
         self.state.draw_mouse( surface, interpol, time_sec )
         #self.draw_fps( surface )
 
+        if self.show_timings:
+            timings.draw( screen, header = "fps %d, jitter %.1f ms" %
+                                  (self.fps, self.scheduler.jitter) )
+            self.invalidate_game()
+            return None
+
+        if dirty_screen is not None:
+            return dirty_screen.end_frame()
+        else:
+            return None
+
+    def invalidate_game( self ):
+        """Redraw the whole game when it's shown again."""
+        if self.game is not None:
+            self.game.dirty_screen.invalidate()
+
 
 class MonorailGame:
     STATE_INTRO, STATE_BEGIN, STATE_GAME, STATE_MENU, STATE_QUIT, STATE_STATS, STATE_TOTAL,\
@@ -180,15 +237,13 @@ class MonorailGame:
     def __init__( self, game_data ):
         self.restart( game_data )
         self.music_man = MusicManager()
-
-        # preload clock sounds and big explosion graphic
-        resman.get("game.clock_sound")
-        resman.get("game.clockring_sound")
-        resman.get("game.explosion_sprite")
-
+        self.dirty_screen = DirtyScreen()
 
     def restart( self, game_data ):
         """Start a new game with the current game_data"""
+        # hud is only imported when the first game starts
+        from hud import Hud
+
         self.game_data = game_data
 
         self.state = MonorailGame.STATE_INTRO
@@ -198,6 +253,9 @@ class MonorailGame:
         self.controller = ctrl.GroundControl( self.playfield )
         self.init_goldcars()
 
+        for goldcar in self.playfield.goldcars:
+            GoldCarView.prewarm( goldcar, self.scenario.pickups or [] )
+
         self.hud = Hud( self.scenario, self.controller, self.game_data )
         self.hud.start_intro_screen()
 
@@ -250,12 +308,9 @@ class MonorailGame:
                     if spawns_left:
                         self.begin_timeout += 50
 
-                self.controller.game_tick( indev )
-                self.playfield.game_tick()
-
                 # Start right away in single player
-                if self.game_data.is_single_player():
-                    self.scenario.game_tick()
+                self.game_tick_models( indev,
+                                       self.game_data.is_single_player() )
 
                 self.begin_timeout -= 1
                 if self.begin_timeout <= 0:
@@ -267,9 +322,7 @@ class MonorailGame:
                     self.mouse_timeout -= 1
 
             elif self.state == MonorailGame.STATE_GAME:
-                self.controller.game_tick( indev )
-                self.playfield.game_tick()
-                self.scenario.game_tick()
+                self.game_tick_models( indev )
                 if self.scenario.is_finished():
                     if not self.game_data.is_single_player():
                         self.hud.start_end_screen()
@@ -314,7 +367,9 @@ class MonorailGame:
             elif self.state == MonorailGame.STATE_MENU:
                 pass
 
+            start = timings.begin()
             self.hud.game_tick( indev )
+            timings.end( "tick.hud", start )
             self.music_man.game_tick()
 
             SingleSwitch.tick( indev, None )
@@ -322,6 +377,7 @@ class MonorailGame:
                         self.hud.menu_btn.went_down() or \
                         SingleSwitch.esc_went_down or \
                         indev.joys.any_went_down( Joystick.BTN_BACK ):
+                from hud import IngameMenu
                 resman.get("gui.paper_sound").play()
                 self.ingame_menu = IngameMenu(self.game_data.is_single_player(), self.game_data)
 
@@ -356,13 +412,37 @@ class MonorailGame:
             self.controller.game_tick( indev )
 
 
+    def game_tick_models( self, indev, with_scenario = True ):
+        """Tick the controllers, the playfield and the scenario, timed."""
+        start = timings.begin()
+        self.controller.game_tick( indev )
+        timings.end( "tick.control", start )
+
+        start = timings.begin()
+        self.playfield.game_tick()
+        timings.end( "tick.playfield", start )
+
+        if with_scenario:
+            start = timings.begin()
+            self.scenario.game_tick()
+            timings.end( "tick.scenario", start )
+
     def draw( self, surface, interpol, time_sec ):
+        """Draw the game.
+
+        Returns the DirtyScreen when only changed areas are drawn."""
         #surface.fill( (0,0,0) )
 
         frame = Frame( surface, time_sec, interpol )
         if self.ingame_menu is not None or self.is_paused or\
             self.state not in [MonorailGame.STATE_BEGIN, MonorailGame.STATE_GAME]:
             frame.interpol = 0.0
+
+        if self.can_draw_dirty():
+            self.dirty_screen.begin_frame( frame )
+        else:
+            self.dirty_screen.invalidate()
+
         frame.draw( self.playfield )
         frame.draw( self.controller )
 
@@ -373,9 +453,19 @@ class MonorailGame:
 
         frame.draw( event.Event.instance )
 
+        return frame.dirty_screen
+
+    def can_draw_dirty( self ):
+        """Only the playing game is drawn with dirty rects, dialogs and menus
+        are drawn completely."""
+        return Configuration.get_instance().use_dirty_rects and \
+               self.ingame_menu is None and not self.is_paused and \
+               self.hud.dialog is None and \
+               self.state in [MonorailGame.STATE_BEGIN, MonorailGame.STATE_GAME]
+
     def draw_mouse( self, surface, interpol, time_sec ):
         if self.mouse_timeout > 0:
-            x, y = pygame.mouse.get_pos()
+            x, y = display.get_mouse_pos()
             resman.get("gui_surf").draw( surface, Vec2D(x, y), (0,0,32,32) )
 
     def mouse_down( self, button ):
@@ -432,17 +522,13 @@ class MonorailEditor:
             self.load_level()
 
         if indev.key.went_down( K_UP ):
-            for tile in self.level.tiles:
-                tile.pos.y -= 1
+            self.level.move_tiles( 0, -1 )
         if indev.key.went_down( K_DOWN ):
-            for tile in self.level.tiles:
-                tile.pos.y += 1
+            self.level.move_tiles( 0, 1 )
         if indev.key.went_down( K_LEFT ):
-            for tile in self.level.tiles:
-                tile.pos.x -= 1
+            self.level.move_tiles( -1, 0 )
         if indev.key.went_down( K_RIGHT ):
-            for tile in self.level.tiles:
-                tile.pos.x += 1
+            self.level.move_tiles( 1, 0 )
 
 
     def draw( self, surface, interpol, time_sec ):
@@ -472,7 +558,7 @@ class MonorailEditor:
         surface.blit( render_text, (100,10) )
 
     def draw_mouse( self, surface, interpol, time_sec ):
-        x, y = pygame.mouse.get_pos()
+        x, y = display.get_mouse_pos()
         resman.get("gui_surf").draw( surface, Vec2D(x, y), (0,0,32,32) )
 
 
@@ -485,7 +571,7 @@ class MonorailEditor:
         self.update_edit_tiles()
 
     def update_edit_tiles( self ):
-        mouse_x, mouse_y = pygame.mouse.get_pos()
+        mouse_x, mouse_y = display.get_mouse_pos()
 
         pos = Vec3D((-mouse_y + (mouse_x+32)/2 - MonorailEditor.X_OFFSET/2 + MonorailEditor.Y_OFFSET) / 32,
     	            (mouse_y + (mouse_x-32)/2 - MonorailEditor.X_OFFSET/2 - MonorailEditor.Y_OFFSET) / 32,
@@ -537,9 +623,28 @@ def main():
 
     koon.app.set_game_speed(configuration.game_speed)
 
+    # timings[=file.csv|file.json]: measure and dump the timings on exit
+    timings_filename = None
+    for arg in args:
+        if arg.startswith("timings"):
+            timings.is_enabled = True
+            if "=" in arg:
+                timings_filename = arg.split("=", 1)[1]
+            else:
+                timings_filename = "timings.csv"
+
     app = Monorail( configuration )
+    app.timings_filename = timings_filename
+
+    # --measure-startup: print the time to the first frame, by phase
+    if "--measure-startup" in args:
+        app.startup = Phases( START_TIME )
+        app.end_startup_phase( "imports and config" )
     app.run()
 
+    if timings_filename is not None:
+        timings.dump( timings_filename )
+
 
     # Make sure latest configuration gets saved
     configuration.save()
@@ -11,7 +11,10 @@ class Pickup (object):
     """Object that cars can pick up.
 
     container: the object that owns this pickup
+    views: the views that draw it, attached by frame.Frame
     """
+    views = None
+
     def __init__( self ):
         self._is_good = True
 
@@ -25,7 +25,7 @@ class PickupView:
 
     def get_pos( self, frame ):
         self.pos = None
-        if self.model.container is None or not hasattr( self.model.container, "views" ): return None
+        if self.model.container is None or self.model.container.views is None: return None
 
         self.pos = self.model.container.views[0].get_pickup_pos( frame )
 
@@ -18,8 +18,10 @@ class GoldCar:
     - score
     - amount: amount of gold in car (0,1,2,3)
     - collectible: current collectible on car
+    - views: the views that draw it, attached by frame.Frame
     """
     COLLIDE_DISTANCE = 500
+    views = None
 
     def __init__( self, position, nr ):
         self.pos = position
@@ -1,13 +1,15 @@
 
 from koon.geo import Vec2D
 from koon.res import resman
-from koon.gfx import Timer, Font
+from koon.gfx import Timer, Font, blend_cache
 
 from tiles import *
 from pickups import Oiler, Ghost
 
 
 class GoldCarView (object):
+    GHOST_ALPHA = 0.6
+    MAX_MOTIONBLUR = 3
 
     def __init__( self, model ):
         self.model = model
@@ -17,9 +19,30 @@ class GoldCarView (object):
         self.motionblur = []
         self.motionblur_cnt = 0
         self.motionblur_timer = Timer( 25 )
-        self.alpha_surfs = {}
         self.ghost_sprite = None
 
+    @staticmethod
+    def get_motionblur_alphas( count ):
+        """Return the alpha of each of count motion blur ghosts."""
+        diff = 1.0 / (count+1)
+        return [diff * (i+2) for i in range( count )]
+
+    @staticmethod
+    def prewarm( goldcar, pickup_classes ):
+        """Blend the sprite of goldcar for the pickups that make it translucent.
+
+        Call this at level load, so the first Oiler or Ghost doesn't stall.
+        """
+        alphas = []
+        if Oiler in pickup_classes:
+            for count in range( 1, GoldCarView.MAX_MOTIONBLUR + 1 ):
+                alphas.extend( GoldCarView.get_motionblur_alphas( count ) )
+        if Ghost in pickup_classes:
+            alphas.append( GoldCarView.GHOST_ALPHA )
+
+        surface = resman.get("game.car%d_sprite" % (goldcar.nr+1)).surface
+        blend_cache.prewarm( surface, alphas )
+
     def align_car_to_track( self, pos ):
         """Find the right car rotation/angle"""
         if pos is None: return
@@ -82,15 +105,10 @@ class GoldCarView (object):
 
         # draw motion blur
         if isinstance( self.model.modifier, Oiler ):
-            diff = 1.0 / (len(self.motionblur)+1)
-            alpha = 0.0 + diff*2
-            for ghost in self.motionblur:
-                if not self.alpha_surfs.has_key( alpha ):
-                    self.alpha_surfs[alpha] = self.sprite.surface.get_blended( alpha )
-
-                ghost[1].surface = self.alpha_surfs[alpha]
+            alphas = GoldCarView.get_motionblur_alphas( len(self.motionblur) )
+            for ghost, alpha in zip( self.motionblur, alphas ):
+                ghost[1].surface = blend_cache.get( self.sprite.surface, alpha )
                 ghost[1].draw( frame.surface, Vec2D(ghost[0][0] + frame.X_OFFSET, ghost[0][1] + frame.Y_OFFSET) )
-                alpha += diff
 
         screen_x, screen_y = pos.get_screen_position()
         screen_x += frame.X_OFFSET
@@ -99,7 +117,8 @@ class GoldCarView (object):
         if isinstance( self.model.modifier, Ghost ):
             if self.ghost_sprite is None:
                 self.ghost_sprite = copy.copy( self.sprite )
-                self.ghost_sprite.surface = self.sprite.surface.get_blended( 0.6 )
+                self.ghost_sprite.surface = blend_cache.get( self.sprite.surface,
+                                                             GoldCarView.GHOST_ALPHA )
             self.ghost_sprite.nr = self.sprite.nr
             self.ghost_sprite.draw( frame.surface, Vec2D(screen_x, screen_y) )
         else:
@@ -110,7 +129,7 @@ class GoldCarView (object):
             if self.motionblur_cnt == 0:
                 self.motionblur.append( (pos.get_screen_position(), copy.copy(self.sprite)) )
             self.moctionblur_cnt = (self.motionblur_cnt+1) % 2
-            while len( self.motionblur ) > 3:
+            while len( self.motionblur ) > GoldCarView.MAX_MOTIONBLUR:
                 self.motionblur.pop(0)
         else:
             self.motionblur = []
@@ -809,7 +809,7 @@ class Quest:
         return scenario
 
     def save_score( self, scenario ):
-        stats = QuestStatistics()
+        stats = QuestStatistics.get_instance()
 
         if not scenario.ontime:
             stats.add( self.progress, -scenario.completed_time )
@@ -967,11 +967,20 @@ class SkillSet:
 
 class QuestStatistics:
 
+    _instances = {}
+
     def __init__( self, filename = "quest.stat"):
         self.filename = filename
         self.stats = {}
         self._load()
 
+    @staticmethod
+    def get_instance( filename = "quest.stat" ):
+        """Return the shared statistics of filename, it's only loaded once."""
+        if filename not in QuestStatistics._instances:
+            QuestStatistics._instances[ filename ] = QuestStatistics( filename )
+        return QuestStatistics._instances[ filename ]
+
     def get( self, i ):
         if self.stats.has_key(i):
 #            print i, self.stats[i]
@@ -1026,7 +1035,7 @@ class QuestManager:
     def add( self, quest, scenario_class, level_nr, ai_count = 0, \
              pickups = [], xtra = None, ontime = True ):
         timeout = 120
-        stats = QuestStatistics()
+        stats = QuestStatistics.get_instance()
         goal = stats.get( quest.get_level_count() )
 
         ai = [0.5 for i in range(0,ai_count)]
@@ -301,6 +301,11 @@ class Configuration (object):
         self.one_switch = False
         self.scan_speed = 30
 
+        self.use_dirty_rects = True
+
+        self.max_fps = 60
+        self.idle_fps = 30
+
     def _append_defaults( self ):
         default = Configuration()
         if not hasattr(self, "game_speed"):
@@ -308,6 +313,11 @@ class Configuration (object):
         if not hasattr(self, "one_switch"):
             self.one_switch = default.one_switch
             self.scan_speed = default.scan_speed
+        if not hasattr(self, "use_dirty_rects"):
+            self.use_dirty_rects = default.use_dirty_rects
+        if not hasattr(self, "max_fps"):
+            self.max_fps = default.max_fps
+            self.idle_fps = default.idle_fps
 
         Configuration.instance = self
 
@@ -0,0 +1,177 @@
+"""Headless simulation of a scenario, without pygame display or mixer.
+
+Usage: simulation.py [level_nr] [ai_count] [seed] [max_ticks]
+"""
+
+import sys
+import random
+import time
+import gettext
+
+from koon.input import Keyboard, Mouse, Joysticks
+from koon.geo import Vec2D
+
+import scenarios
+import control as ctrl
+from event import Event
+
+class HeadlessInput:
+    """User input that never receives any events."""
+
+    def __init__( self ):
+        self.key = Keyboard()
+        self.mouse = Mouse()
+        self.joys = Joysticks()
+
+    def update( self ):
+        pass
+
+class Simulation:
+    """Steps the model of a scenario on a level as fast as possible.
+
+    Goldcars are spawned and ticked like in MonorailGame, but nothing is
+    drawn or played. With the same seed, the same match is played.
+    """
+    SPAWN_TICKS = 50
+    BEGIN_TICKS = 25 * 3
+
+    def __init__( self, level_nr, scenario, controllers, seed = 0, skill = 1 ):
+        """Create a simulation.
+
+        level_nr - the level to play on
+        scenario - the scenario template, it gets copied like in Quest
+        controllers - a controller for each goldcar
+        seed - seed for the random generator
+        """
+        random.seed( seed )
+
+        self.level_nr = level_nr
+        self.seed = seed
+
+        quest = scenarios.Quest()
+        quest.add_level( scenario, level_nr )
+        self.scenario = quest.create_scenario( skill )
+        self.playfield = self.scenario.playfield
+
+        self.controller = ctrl.GroundControl( self.playfield )
+        self.playfield.add_goldcars( ["" for c in controllers] )
+        self.controller.add_controllers( controllers )
+
+        self.indev = HeadlessInput()
+        self.indev.mouse.feed_pos( Vec2D( 0, 0 ) )
+
+        self.ticks = 0
+        self.wall_time = 0.0
+        self.begin_timeout = Simulation.BEGIN_TICKS
+
+    def step( self ):
+        """Perform one game tick. Return True when the scenario is finished.
+
+        Events are headless during the tick only, so a game that runs
+        after the simulation still plays its sounds.
+        """
+        was_headless = Event.instance.is_headless
+        Event.set_headless( True )
+        try:
+            return self._step()
+        finally:
+            Event.set_headless( was_headless )
+
+    def _step( self ):
+        if self.begin_timeout > 0:
+            if self.begin_timeout % Simulation.SPAWN_TICKS == 0:
+                random_spawn = self.scenario.is_multiplayer
+                if self.playfield.spawn_next_goldcar( random_spawn ):
+                    self.begin_timeout += Simulation.SPAWN_TICKS
+
+            self.controller.game_tick( self.indev )
+            self.playfield.game_tick()
+
+            # Start right away in single player
+            if not self.scenario.is_multiplayer:
+                self.scenario.game_tick()
+
+            self.begin_timeout -= 1
+        else:
+            self.controller.game_tick( self.indev )
+            self.playfield.game_tick()
+            self.scenario.game_tick()
+
+        Event.update()
+
+        self.ticks += 1
+        return self.begin_timeout <= 0 and self.scenario.is_finished()
+
+    def run( self, max_ticks = None ):
+        """Step until the scenario is finished, or max_ticks are done."""
+        start = time.time()
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            ticks += 1
+            if self.step():
+                break
+        self.wall_time += time.time() - start
+
+        return self.is_finished()
+
+    def is_finished( self ):
+        return self.begin_timeout <= 0 and self.scenario.is_finished()
+
+    def get_ticks_per_second( self ):
+        """Return the number of simulated ticks per second of wall time."""
+        if self.wall_time > 0:
+            return self.ticks / self.wall_time
+        else:
+            return 0.0
+
+    def get_scores( self ):
+        return [goldcar.score for goldcar in self.playfield.goldcars]
+
+    def get_results( self ):
+        """Return a dictionary with the outcome of the simulation.
+
+        won and completed_time are None when the match is not finished.
+        """
+        finished = self.is_finished()
+        won = None
+        completed_time = None
+        if finished:
+            won = self.scenario.has_won()
+            completed_time = self.scenario.completed_time
+
+        return { "level_nr": self.level_nr,
+                 "seed": self.seed,
+                 "scenario": self.scenario.__class__.__name__,
+                 "finished": finished,
+                 "won": won,
+                 "scores": self.get_scores(),
+                 "completed_time": completed_time,
+                 "ticks": self.ticks,
+                 "wall_time": self.wall_time,
+                 "ticks_per_second": self.get_ticks_per_second() }
+
+def main():
+    # The scenario texts are not shown, so no translation is needed
+    gettext.install( "monorail" )
+
+    level_nr = 12
+    ai_count = 4
+    seed = 0
+    max_ticks = None
+    if len( sys.argv ) > 1: level_nr = int( sys.argv[1] )
+    if len( sys.argv ) > 2: ai_count = int( sys.argv[2] )
+    if len( sys.argv ) > 3: seed = int( sys.argv[3] )
+    if len( sys.argv ) > 4: max_ticks = int( sys.argv[4] )
+
+    scenario = scenarios.ScenarioCoinCollect( 120, None, 1, [] )
+    controllers = [ctrl.AiController( None ) for i in range( ai_count )]
+    sim = Simulation( level_nr, scenario, controllers, seed )
+    sim.run( max_ticks )
+
+    results = sim.get_results()
+    print "level %(level_nr)d, %(ticks)d ticks in %(wall_time).2f sec: " \
+          "%(ticks_per_second).0f ticks/sec" % results
+    print "scores:", results["scores"]
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 
 import monorail.ai as ai
+import monorail.control as ctrl
+from monorail.player import GoldCar
+from monorail.pickups import *
 
 class SimpleNode (ai.Node):
     """AiNode for use in the unit tests
@@ -303,3 +306,37 @@ class TestPredictionTree:
 ##        assert generation[2].generation == 2
 ##        assert generation[3].generation == 2
 ##
+
+class TestScoreTable:
+    def test_get_score( self ):
+        """Given the default ScoreTable
+        When pickups are scored for a car
+        Then the score depends on the pickup and the car collectible
+        """
+        # Given
+        table = ai.ScoreTable()
+        carstate = ctrl.GoldcarNodeState( GoldCar( None, 0 ) )
+
+        # When/Then
+        assert table.get_score( CopperCoin(), carstate ) == 1
+        assert table.get_score( Dynamite(), carstate ) == -8
+        assert table.get_score( GoldBlock(), carstate ) == table.scores[ ai.GOLD_BLOCK ]
+        assert table.get_score( Flag( carstate.goldcar ), carstate ) == 1
+        assert table.get_score( Flag( GoldCar( None, 1 ) ), carstate ) == 0
+
+        carstate.collectible = Axe()
+        assert table.get_score( GoldBlock(), carstate ) == 1
+
+    def test_own_scores( self ):
+        """Given some scores by pickup name
+        When a ScoreTable is created with them
+        Then those scores replace the defaults
+        """
+        # When
+        table = ai.ScoreTable( {"GoldBlock": 0.5, "Dynamite": -2} )
+
+        # Then
+        carstate = ctrl.GoldcarNodeState( GoldCar( None, 0 ) )
+        assert table.get_score( GoldBlock(), carstate ) == 0.5
+        assert table.get_score( Dynamite(), carstate ) == -2
+        assert table.get_score( CopperCoin(), carstate ) == 1
@@ -0,0 +1,81 @@
+from StringIO import StringIO
+
+from monorail.batch import *
+from monorail.simulation import Event
+
+class TestBatch:
+
+    def teardown_method( self, method ):
+        Event.set_headless( False )
+
+    def test_parse_range( self ):
+        assert parse_range( "3" ) == [3]
+        assert parse_range( "0-3,7" ) == [0, 1, 2, 3, 7]
+
+    def test_create_jobs( self ):
+        options, args = create_parser().parse_args( ["-q", "random", "-l", "3-5",
+                                                     "-s", "CoinCollect,Race",
+                                                     "-i", "0.5,1.0", "-n", "2"] )
+        jobs = create_jobs( options )
+
+        assert len( jobs ) == 3 * 2 * 2 * 2
+        assert jobs[0]["level_nr"] == 3
+        assert isinstance( jobs[0]["scenario"], ScenarioCoinCollect )
+        assert jobs[0]["opponent_iqs"] == [0.5, 0.5]
+        assert [job["seed"] for job in jobs[:2]] == [0, 1]
+
+    def test_run_job( self ):
+        options, args = create_parser().parse_args( ["-q", "random", "-l", "40",
+                                                     "-o", "1", "-t", "100"] )
+        result = run_job( create_jobs( options )[0] )
+
+        assert result["ticks"] == 100
+        assert len( result["scores"] ) == 2
+        assert result["opponent_iqs"] == [1.0]
+
+        out_file = StringIO()
+        write_csv( [result], out_file )
+        lines = out_file.getvalue().splitlines()
+        assert lines[0].split(",") == RESULT_FIELDS
+        assert lines[1].startswith( "random,40,40,ScenarioCoinCollect,1.0,1.0,0," )
+
+    def test_run_batch( self ):
+        options, args = create_parser().parse_args( ["-q", "random", "-l", "40-41",
+                                                     "-o", "1", "-t", "50"] )
+        out_file = StringIO()
+        writer = JsonWriter( out_file )
+        count = run_batch( create_jobs( options ), writer, 2 )
+        writer.close()
+
+        rows = json.loads( out_file.getvalue() )
+        assert count == 2
+        assert sorted( [row["level_nr"] for row in rows] ) == [40, 41]
+        assert rows[0]["won"] is None
+
+    def test_main_quest_batch( self ):
+        options, args = create_parser().parse_args( ["-l", "0-1", "-t", "50"] )
+        jobs = create_jobs( options )
+        quest = QuestManager.get_instance().get_quest( QuestManager.MAIN_QUEST )
+
+        assert [job["level_nr"] for job in jobs] == quest.level_nrs[0:2]
+        assert [job["opponent_iqs"] for job in jobs] == quest.opponent_iqs_list[0:2]
+
+        csv_file = StringIO()
+        assert run_batch( jobs, CsvWriter( csv_file ), 2 ) == 2
+        json_file = StringIO()
+        writer = JsonWriter( json_file )
+        assert run_batch( jobs, writer, 2 ) == 2
+        writer.close()
+
+        lines = sorted( csv_file.getvalue().splitlines()[1:] )
+        assert [line.split(",")[0:3] for line in lines] == \
+               [["main", "0", str(quest.level_nrs[0])],
+                ["main", "1", str(quest.level_nrs[1])]]
+
+        rows = sorted( json.loads( json_file.getvalue() ), key = lambda row: row["index"] )
+        assert [row["level_nr"] for row in rows] == quest.level_nrs[0:2]
+        assert [row["scenario"] for row in rows] == \
+               [quest.scenarios[i].__class__.__name__ for i in range(2)]
+        assert [row["ticks"] for row in rows] == [50, 50]
+        assert [len( row["scores"] ) for row in rows] == \
+               [1 + len( iqs ) for iqs in quest.opponent_iqs_list[0:2]]
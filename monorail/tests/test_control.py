@@ -1,10 +1,27 @@
 
+import random
+
+import pygame
+
 from monorail.koon.geo import Vec3D
+from monorail.koon.input import Mouse
+from monorail.koon.res import resman
 from monorail.world import *
 from monorail.tiles import *
 import monorail.control as ctrl
 import monorail.ai as ai
 
+def setup_module( module ):
+    resman.read("data/resources.cfg")
+    pygame.init()
+
+def teardown_module( module ):
+    pygame.quit()
+
+class UserInput:
+    def __init__( self ):
+        self.mouse = Mouse()
+
 class TestGroundControl:
 
     def test_init( self ):
@@ -23,6 +40,73 @@ class TestGroundControl:
 
         ground_control._update_prediction_trees()
 
+    def test_prediction_tree_budgets( self ):
+        """Given a PredictionTree limited in depth and time
+        When it is updated and its root is replaced
+        Then it stays within depth and recycles the old nodes
+        """
+        # Given
+        playfield = Playfield()
+        playfield.load("tests/levelTest.lvl")
+
+        tile = playfield.level.get_first_flat_tile()
+        goldcar = GoldCar( TrailPosition(tile, 0), 0 )
+        tree = ai.PredictionTree( 256, 16, max_generations = 3, time_budget = 5 )
+
+        car_node = ai.AiNode_create( ctrl.GoldcarNodeState(goldcar), TrailNode(tile, goldcar.pos.get_in_direction()) )
+        car_node.set_playfield( playfield )
+        car_node.set_other_trees( [] )
+
+        # When
+        tree.set_root( ai.Node(car_node) )
+        for i in range( 0, 10 ):
+            tree.update()
+
+        # Then
+        depth = 0
+        nodes = [tree.root_node]
+        while len( nodes ) > 0:
+            depth += 1
+            childeren = []
+            for node in nodes:
+                if node.get_childeren() is not None:
+                    childeren.extend( node.get_childeren() )
+            nodes = childeren
+        assert depth == 4
+
+        # And when
+        tree.set_root( ai.Node(car_node) )
+
+        # Then
+        assert tree.pool.get_free_count() > 0
+        assert len( tree.generations ) == 1
+
+    def _play( self, seed ):
+        """Return the positions of two AI goldcars on each tick of a match."""
+        random.seed( seed )
+        playfield = Playfield()
+        playfield.load( Level.get_filename( 40 ) )
+
+        tiles = [tile for tile in playfield.level.tiles if tile.type == Tile.Type.FLAT]
+        playfield.goldcars = [GoldCar( TrailPosition( tiles[0], 0 ), 0 ),
+                              GoldCar( TrailPosition( tiles[len(tiles)/2], 0 ), 1 )]
+
+        ground_control = ctrl.GroundControl( playfield )
+        ground_control.add_controllers( [ctrl.AiController( car ) for car in playfield.goldcars] )
+
+        indev = UserInput()
+
+        moves = []
+        for i in range( 0, 200 ):
+            ground_control.game_tick( indev )
+            playfield.game_tick()
+            moves.append( [(car.pos.tile.pos.x, car.pos.tile.pos.y, car.pos.progress)
+                           for car in playfield.goldcars] )
+        return moves
+
+    def test_same_moves_for_same_seed( self ):
+        assert self._play( 5 ) == self._play( 5 )
+
 ##    def test_tree_reuse_on_root_change( self ):
 ##        """Given a PredictionTree with root AiNode and scores
 ##        When the root node changes to an AiNode with same position as child node
@@ -100,7 +184,13 @@ class TestPlayfieldState:
 
         # Then
         assert clone.playfield is playfieldstate.playfield
-        assert clone.pickups is not playfieldstate.pickups
+
+        # And when
+        clone.remove_pickup( playfield.level.get_tile(0,0) )
+
+        # Then
+        assert clone.get_pickup( playfield.level.get_tile(0,0) ) is None
+        assert playfieldstate.get_pickup( playfield.level.get_tile(0,0) ) is pickup
 
 
 class TestGoldcarNodeState:
@@ -1,5 +1,9 @@
 
+import tempfile
+import shutil
+
 from monorail.koon.gfx import Surface
+from monorail.koon.diskcache import DiskCache
 
 from monorail.frame import *
 
@@ -26,6 +30,42 @@ class TestFrame:
         assert isinstance( views[0], PlayfieldView )
 
 
+    def test_get_views_of_subclass( self ):
+        """Given a registered view for a pickup class
+           When we request the views of a subclass
+           Then we get the registered view, kept on the model"""
+        class TestPickup( Pickup ): pass
+        class TestSubPickup( TestPickup ): pass
+        class TestPickupView:
+            def __init__( self, model ):
+                self.model = model
+        register_view( TestPickup, TestPickupView )
+
+        frame = Frame( None, 0.0, 0 )
+        pickup = TestSubPickup()
+        views = frame.get_views( pickup )
+
+        assert isinstance( views[0], TestPickupView )
+        assert views[0].model is pickup
+        assert pickup.views is views
+        assert frame.get_views( pickup ) is views
+        assert get_view_classes( TestSubPickup ) == (TestPickupView,)
+        assert get_view_classes( Pickup ) is None
+        assert isinstance( frame.get_views( Enterance( Vec3D(0,0,0) ) )[1], EnteranceTopView )
+
+    def test_register_view_declares_views( self ):
+        class TestModel: pass
+        class TestView:
+            def __init__( self, model ):
+                self.model = model
+        register_view( TestModel, TestView )
+
+        frame = Frame( None, 0.0, 0 )
+        model = TestModel()
+
+        assert TestModel.views is None
+        assert isinstance( frame.get_views( model )[0], TestView )
+
     def test_draw_code( self ):
         # Given
         frame = Frame( Surface((800,600)), 20.1, 0.4 )
@@ -79,3 +119,185 @@ class TestFrame:
         frame.draw( playfield )
 
         # Then all passes fine
+
+    def test_static_views( self ):
+        """Given a level with tiles
+           When we request the static views of its view twice
+           Then the same sorted list is returned until the level changes"""
+        level = Level()
+        for y in range( 0, 5 ):
+            level.set_tile( Tile( Vec3D(2,y,0), Tile.Type.FLAT ) )
+        frame = Frame( None, 0.0, 0 )
+        view = frame.get_views( level )[0]
+
+        views, keys = frame.get_static_views( view )
+
+        assert len( views ) == 6
+        assert keys == sorted( keys )
+        assert frame.get_static_views( view )[0] is views
+
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+
+        assert len( frame.get_static_views( view )[0] ) == 7
+
+    def test_draw_z_order( self ):
+        """Given a level with goldcars on it
+           When we draw them with draw_z
+           Then all views are drawn sorted on z"""
+        level = Level()
+        for y in range( 0, 5 ):
+            level.set_tile( Tile( Vec3D(0,y,0), Tile.Type.FLAT ) )
+        goldcarA = GoldCar( TrailPosition( level.get_tile(0,3), 0 ), 0 )
+        goldcarB = GoldCar( TrailPosition( level.get_tile(0,1), 0 ), 1 )
+        goldcarB.collectible = Lamp()
+
+        class DrawOrder:
+            def draw_views( self, frame, views ):
+                self.views = views
+        frame = Frame( None, 0.0, 0 )
+        frame.dirty_screen = DrawOrder()
+        frame.draw_z( [level, goldcarA, goldcarB] )
+
+        views = frame.dirty_screen.views
+        assert len( views ) == 1 + 5 + 2 + 1
+        assert [v.z for v in views] == sorted( [v.z for v in views] )
+        assert frame.get_views( goldcarA )[0] in views
+        assert frame.get_views( goldcarB.collectible )[0] in views
+
+
+class TestDirtyScreen:
+    def _create_playfield( self ):
+        level = Level()
+        for y in range( 0, 5 ):
+            level.set_tile( Tile( Vec3D(0,y,0), Tile.Type.FLAT ) )
+
+        playfield = Playfield()
+        playfield.level = level
+        playfield.goldcars = [GoldCar( TrailPosition( level.get_tile(0,1), 0 ), 0 )]
+        return playfield
+
+    def test_draw_equals_full_draw( self ):
+        """Given a playfield with a moving goldcar
+           When we draw it each frame with and without a DirtyScreen
+           Then the screens are equal, while less is redrawn"""
+        playfield = self._create_playfield()
+        full_surf = pygame.Surface( (800,600) )
+        dirty_surf = pygame.Surface( (800,600) )
+        dirty_screen = DirtyScreen()
+
+        for i in range( 0, 10 ):
+            playfield.goldcars[0].pos += 20
+
+            Frame( full_surf, i * 0.1, 0.0 ).draw( playfield )
+
+            frame = Frame( dirty_surf, i * 0.1, 0.0 )
+            dirty_screen.begin_frame( frame )
+            frame.draw( playfield )
+            rects = dirty_screen.end_frame()
+
+            assert pygame.image.tostring( full_surf, "RGB" ) == \
+                   pygame.image.tostring( dirty_surf, "RGB" )
+
+        assert 0 < len( rects )
+        assert rects[0].width * rects[0].height < 800 * 600
+
+    def test_fill_and_unsupported_draws( self ):
+        """Given views that fill, and a view that scrolls the screen
+           When we draw them each frame with and without a DirtyScreen
+           Then the screens are equal"""
+        class FillModel:
+            def __init__( self, z ):
+                self.x = 0
+                self.z = z
+        class BackgroundView:
+            z = -1
+            def __init__( self, model ):
+                self.background = Surface( (800, 600) )
+            def draw( self, frame ):
+                self.background.draw( frame.surface, (0, 0) )
+        class FillView:
+            def __init__( self, model ):
+                self.model = model
+                self.z = model.z
+            def draw( self, frame ):
+                if self.z > 1:
+                    frame.surface.scroll( 0, 0 )
+                frame.surface.fill( (255, 0, 0), (self.model.x, 10 * self.z, 20, 20) )
+        class BackgroundModel: pass
+
+        models = [BackgroundModel(), FillModel( 1 ), FillModel( 2 )]
+        models[0].views = [BackgroundView( models[0] )]
+        for model in models[1:]:
+            model.views = [FillView( model )]
+        full_surf = pygame.Surface( (800,600) )
+        dirty_surf = pygame.Surface( (800,600) )
+        dirty_screen = DirtyScreen()
+
+        for i in range( 0, 6 ):
+            models[1].x += 30
+            if i == 3:
+                models.pop()
+
+            Frame( full_surf, 0.0, 0.0 ).draw_z( models )
+
+            frame = Frame( dirty_surf, 0.0, 0.0 )
+            dirty_screen.begin_frame( frame )
+            frame.draw_z( models )
+            rects = dirty_screen.end_frame()
+
+            assert pygame.image.tostring( full_surf, "RGB" ) == \
+                   pygame.image.tostring( dirty_surf, "RGB" )
+            if i < 3:
+                assert rects == [dirty_surf.get_rect()]
+
+        assert rects[0].width * rects[0].height < 800 * 600
+
+    def test_merge_rects( self ):
+        bounds = pygame.Rect( 0, 0, 100, 100 )
+        rects = merge_rects( [pygame.Rect( 0, 0, 10, 10 ), pygame.Rect( 5, 5, 10, 10 ),
+                              pygame.Rect( 50, 50, 10, 10 ), pygame.Rect( 95, 95, 10, 10 )],
+                             bounds )
+
+        assert pygame.Rect( 0, 0, 15, 15 ) in rects
+        assert pygame.Rect( 50, 50, 10, 10 ) in rects
+        assert pygame.Rect( 95, 95, 5, 5 ) in rects
+        assert len( rects ) == 3
+
+        assert merge_rects( [pygame.Rect( 0, 0, 90, 90 )], bounds, 0.5 ) == [bounds]
+
+class TestLevelView:
+    def setup_method( self, method ):
+        self.directory = tempfile.mkdtemp()
+        self.old_cache = LevelView.background_cache
+        LevelView.background_cache = DiskCache( self.directory, 10 * 1024 * 1024 )
+
+    def teardown_method( self, method ):
+        LevelView.background_cache = self.old_cache
+        shutil.rmtree( self.directory )
+
+    def test_background_cache( self ):
+        level = Level()
+        level.load( Level.get_filename( 12 ) )
+
+        view = LevelView( level )
+        view.init_background()
+
+        assert view.get_cache_key() is not None
+        assert LevelView.background_cache.get( view.get_cache_key(), ".png" ) is not None
+
+        cached_view = LevelView( level )
+        cached_view.init_background()
+
+        assert pygame.image.tostring( view.background.pysurf, "RGB" ) == \
+               pygame.image.tostring( cached_view.background.pysurf, "RGB" )
+
+    def test_changed_level_not_cached( self ):
+        level = Level()
+        level.load( Level.get_filename( 12 ) )
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+
+        view = LevelView( level )
+        view.init_background()
+
+        assert view.get_cache_key() is None
+        assert LevelView.background_cache.get_size() == 0
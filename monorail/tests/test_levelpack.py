@@ -0,0 +1,96 @@
+import os
+import struct
+
+from monorail.koon.geo import Vec3D
+from monorail.tiles import Tile, Direction
+from monorail.world import Level
+from monorail.levelpack import LevelPack
+
+
+class TestLevelPack:
+
+    def setup_method( self, method ):
+        level = Level()
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+        level.set_tile( Tile( Vec3D(0,1,0), Tile.Type.SOUTH_SLOPE_TOP ) )
+        level.set_tile( Tile( Vec3D(1,0,0), Tile.Type.WEST_SLOPE_TOP ) )
+        level.save( "packtest.lvl" )
+        LevelPack.write( "packtest.pak", ["packtest.lvl"] )
+        self.old_filename = LevelPack.FILENAME
+
+    def teardown_method( self, method ):
+        LevelPack.instance = None
+        LevelPack.is_unusable = False
+        LevelPack.FILENAME = self.old_filename
+        os.remove( "packtest.lvl" )
+        os.remove( "packtest.pak" )
+
+    def test_get( self ):
+        pack = LevelPack( "packtest.pak" )
+
+        content, md5 = pack.get( "somewhere/packtest.lvl" )
+        assert content == open( "packtest.lvl", "rb" ).read()
+        assert pack.get( "other.lvl" ) is None
+
+        pack.forget( "packtest.lvl" )
+        assert pack.get( "packtest.lvl" ) is None
+
+    def test_load_level( self ):
+        level_file = Level()
+        level_file.load( "packtest.lvl" )
+
+        LevelPack.instance = LevelPack( "packtest.pak" )
+        level_pack = Level()
+        level_pack.load( "packtest.lvl" )
+
+        assert level_pack.content_hash == level_file.content_hash
+        assert len( level_pack.tiles ) == len( level_file.tiles )
+        assert level_pack.get_tile( 0, 1 ).type == Tile.Type.SOUTH_SLOPE_TOP
+        assert level_pack.get_tile( 1, 0 ).type == Tile.Type.WEST_SLOPE_TOP
+        assert level_pack.get_tile(0,0).get_neighbor( Direction.SOUTH ).type == Tile.Type.SOUTH_SLOPE_TOP
+
+    def test_save_forgets_packed( self ):
+        LevelPack.instance = LevelPack( "packtest.pak" )
+        level = Level()
+        level.load( "packtest.lvl" )
+        level.set_tile( Tile( Vec3D(2,2,0), Tile.Type.FLAT ) )
+        level.save( "packtest.lvl" )
+
+        level_loaded = Level()
+        level_loaded.load( "packtest.lvl" )
+        assert level_loaded.get_tile( 2, 2 ) is not None
+
+    def test_changed_file_not_packed( self ):
+        level = Level()
+        level.load( "packtest.lvl" )
+        level.set_tile( Tile( Vec3D(2,2,0), Tile.Type.FLAT ) )
+        level.save( "packtest.lvl" )
+        os.utime( "packtest.lvl", (0, 0) )
+
+        LevelPack.instance = LevelPack( "packtest.pak" )
+        assert LevelPack.instance.get( "packtest.lvl" ) is None
+
+        level_loaded = Level()
+        level_loaded.load( "packtest.lvl" )
+        assert level_loaded.get_tile( 2, 2 ) is not None
+
+    def test_unusable_pack( self ):
+        LevelPack.instance = None
+        LevelPack.FILENAME = "packtest.pak"
+        data = open( "packtest.pak", "rb" ).read()
+
+        open( "packtest.pak", "wb" ).write( data[:4] + struct.pack( "<I", 99 ) + data[8:] )
+        assert LevelPack.get_instance() is None
+        assert LevelPack.is_unusable
+
+        level = Level()
+        level.load( "packtest.lvl" )
+        assert level.get_tile( 0, 1 ).type == Tile.Type.SOUTH_SLOPE_TOP
+
+        LevelPack.is_unusable = False
+        open( "packtest.pak", "wb" ).write( "garbage" )
+        assert LevelPack.get_instance() is None
+
+        LevelPack.is_unusable = False
+        open( "packtest.pak", "wb" ).write( data[:-10] )
+        assert LevelPack.get_instance() is None
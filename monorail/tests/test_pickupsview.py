@@ -59,3 +59,17 @@ class TestDrawingViews:
 
 
 
+
+    def test_sprites_from_atlas( self ):
+        """The pickup sprites are cut from the atlas with their own pixels."""
+        for name in ["axe", "key", "flag1"]:
+            res_name = "game.%s_surf" % name
+            assert resman.get( res_name + ".atlas" ) == "data/gfx/pickups_atlas.png"
+
+            sprite = resman.get( "game.%s_sprite" % name )
+            image = pygame.image.load( resman.get( res_name + ".file" ) )
+            assert sprite.surface.get_size() == image.get_size()
+
+            width, height = image.get_size()
+            for x, y in [(0, 0), (width / 2, height / 2), (width - 1, height - 1)]:
+                assert sprite.surface.pysurf.get_at( (x, y) ) == image.get_at( (x, y) )
@@ -116,6 +116,16 @@ class TestStatistics:
 
         assert stats2.get(5) == 20
 
+    def test_get_instance( self ):
+        try:
+            stats = QuestStatistics.get_instance(STATNAME)
+            stats.add( 5, 20 )
+
+            assert QuestStatistics.get_instance(STATNAME) is stats
+            assert QuestStatistics.get_instance(STATNAME).get(5) == 20
+        finally:
+            QuestStatistics._instances.pop( STATNAME, None )
+
 
 class TestScenarioPacman:
     def test_game_tick( self ):
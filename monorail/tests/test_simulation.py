@@ -0,0 +1,42 @@
+from monorail.simulation import *
+from monorail.scenarios import ScenarioCoinCollect
+import monorail.control as ctrl
+
+class TestSimulation:
+
+    def _create_simulation( self, seed ):
+        scenario = ScenarioCoinCollect( 120, None, 3, [] )
+        controllers = [ctrl.AiController( None ) for i in range( 2 )]
+        return Simulation( 40, scenario, controllers, seed )
+
+    def test_run( self ):
+        sim = self._create_simulation( 1 )
+
+        assert not sim.run( 200 )
+        assert sim.ticks == 200
+        assert sim.get_ticks_per_second() > 0
+        assert len( sim.get_scores() ) == 2
+
+        results = sim.get_results()
+        assert results["ticks"] == 200
+        assert results["level_nr"] == 40
+        assert not results["finished"]
+        assert results["won"] is None
+        assert results["completed_time"] is None
+
+    def test_restores_headless( self ):
+        sim = self._create_simulation( 1 )
+        sim.run( 10 )
+
+        assert not Event.instance.is_headless
+
+    def test_deterministic( self ):
+        sim0 = self._create_simulation( 3 )
+        sim0.run( 400 )
+        sim1 = self._create_simulation( 3 )
+        sim1.run( 400 )
+
+        assert sim0.get_scores() == sim1.get_scores()
+        for car0, car1 in zip( sim0.playfield.goldcars, sim1.playfield.goldcars ):
+            assert car0.pos.tile.pos == car1.pos.tile.pos
+            assert car0.pos.progress == car1.pos.progress
@@ -18,6 +18,7 @@ class TestDirection:
         a = Direction.WEST
         assert a.get_opposite() == Direction.EAST
         assert a.get_opposite().get_opposite() == a
+        assert a.get_opposite() is Direction.EAST
 
 class TestTileAndTrail:
 
@@ -72,6 +73,28 @@ class TestTileAndTrail:
         assert slope.get_neighbor_offset( Direction.WEST ) == Vec3D(0,-1,0)
         assert slope.get_neighbor_offset( Direction.SOUTH ) == Vec3D(0,0,0)
 
+    def test_hill_directions( self ):
+        for tile_type in range( Tile.Type.NORTH_SLOPE_TOP, Tile.Type.MAX ):
+            t = Tile( Vec3D(0,0,0), tile_type )
+            in_dir = t.trail.get_in_direction()
+            assert t.trail.get_out_direction() is in_dir.get_opposite()
+            assert t.get_length() == 1150
+
+            # a hill only connects in and out
+            assert t.get_neighbor_offset( in_dir ) <> Vec3D(0,0,0)
+            assert t.get_neighbor_offset( in_dir.get_opposite() ) <> Vec3D(0,0,0)
+
+    def test_screen_position( self ):
+        t = Tile( Vec3D(1,2,0), Tile.Type.FLAT, Trail.Type.NS )
+        x, y = t.get_center()
+
+        assert t.get_screen_position( 0 ) == (x - 16, y - 8)
+        assert t.get_screen_position( t.get_length() / 2 ) == (x, y)
+        assert t.get_screen_position( t.get_length() ) == (x + 16, y + 8)
+
+        t.trail.type = Trail.Type.NE
+        assert t.get_screen_position( t.get_length() ) == (x + 16, y - 8)
+
     def test_is_switch( self ):
         center = Tile( Vec3D(0,0,0), Tile.Type.FLAT )
         north  = Tile( Vec3D(0,0,0), Tile.Type.FLAT )
@@ -434,6 +457,35 @@ class TestTrailNode:
         assert (node.tile is enter_b and outs[0].tile is tile_b) or \
                (node.tile is enter_c and outs[0].tile is tile_c)
 
+    def test_path_graph( self ):
+        # Given
+        center = Tile( Vec3D(), Tile.Type.FLAT, Trail.Type.NS )
+        south  = Tile( Vec3D(), Tile.Type.FLAT, Trail.Type.NS )
+        west   = Tile( Vec3D(), Tile.Type.FLAT, Trail.Type.EW )
+
+        center.set_neighbor( south, Direction.SOUTH )
+        center.set_neighbor( west, Direction.WEST )
+        south.set_neighbor( center, Direction.NORTH )
+        west.set_neighbor( center, Direction.EAST )
+
+        # When
+        graph = PathGraph( [center, south, west] )
+
+        # Then
+        node = graph.get_trailnode( center, None )
+        assert node is graph.get_trailnode( center, None )
+
+        outs = graph.get_out_nodes( node )
+        assert len(outs) == 2
+        assert outs[0] is graph.get_trailnode( south, Direction.NORTH ) or \
+               outs[0] is graph.get_trailnode( west, Direction.EAST )
+
+        node = graph.get_trailnode( south, Direction.NORTH )
+        assert graph.get_out_nodes( node ) == []
+        assert graph.out_ids[ graph.get_node_id( west, Direction.EAST ) ] == []
+        assert graph.out_ids[ graph.get_node_id( center, Direction.WEST ) ] == \
+               [graph.get_node_id( south, Direction.NORTH )]
+
     def test_eq( self ):
         tile1 = Tile( Vec3D, Tile.Type.FLAT )
         tile2 = Tile( Vec3D, Tile.Type.FLAT )
@@ -1,9 +1,10 @@
 
 import os
+import random
 
 from monorail.koon.geo import Vec3D
-from monorail.tiles import Tile, Direction, Trail
-from monorail.world import Level, Playfield
+from monorail.tiles import Tile, Direction, Trail, Enterance
+from monorail.world import Level, Playfield, LevelCache, level_cache
 from monorail.player import *
 from monorail.pickups import *
 
@@ -30,6 +31,52 @@ class TestLevel:
         assert level.get_tile( 0, 0 ) is None
 
 
+    def test_move_tiles( self ):
+        level = Level()
+
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+        level.set_tile( Tile( Vec3D(0,1,0), Tile.Type.FLAT ) )
+        level.move_tiles( 2, -1 )
+
+        assert level.get_tile( 0, 0 ) is None
+        assert level.get_tile( 2, -1 ) is not None
+        assert level.get_tile( 2, 0 ) is not None
+        assert level.get_tile( 2, -1 ).get_neighbor( Direction.SOUTH ) is level.get_tile( 2, 0 )
+
+        level.remove_tile( 2, 0 )
+        assert level.get_tile( 2, 0 ) is None
+        assert len( level.tiles ) == 1
+
+    def test_incremental_edits( self ):
+        """Given a level edited tile by tile
+        When the neighbors are rebuilt from scratch
+        Then nothing changes"""
+        # Given
+        random.seed( 3 )
+        level = Level()
+        types = range( Tile.Type.FLAT, Tile.Type.MAX )
+        for i in range( 0, 300 ):
+            x, y = random.randint( 0, 8 ), random.randint( 0, 8 )
+            if random.randint( 0, 4 ) == 0:
+                level.remove_tile( x, y )
+            elif random.randint( 0, 6 ) == 0:
+                level.set_tile( Enterance( Vec3D(x, y, 0) ) )
+            else:
+                level.set_tile( Tile( Vec3D(x, y, 0), random.choice( types ) ) )
+
+        neighbors = [tile.neighbors[:] for tile in level.tiles]
+        trails = [tile.trail.type for tile in level.tiles]
+        order = [-tile.pos.x + tile.pos.y for tile in level.tiles]
+
+        # When
+        level.update_neighbors()
+        level.align_trails()
+
+        # Then
+        assert neighbors == [tile.neighbors for tile in level.tiles]
+        assert trails == [tile.trail.type for tile in level.tiles]
+        assert order == sorted( order )
+
     def test_save_load_level( self ):
         level = Level()
         level_loaded = Level()
@@ -128,6 +175,69 @@ class TestLevel:
 
         assert first_tile and second_tile
 
+    def test_clone( self ):
+        level = Level()
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+        level.set_tile( Tile( Vec3D(0,1,0), Tile.Type.SOUTH_SLOPE_TOP ) )
+        level.set_tile( Tile( Vec3D(0,3,0), Tile.Type.SOUTH_SLOPE_BOT ) )
+        level.set_tile( Enterance( Vec3D(5,5,0) ) )
+        level.set_tile( Enterance( Vec3D(7,5,0) ) )
+        level.get_tile(0,0).pickup = Diamond()
+        graph = level.get_path_graph()
+
+        clone = level.clone()
+
+        assert len( clone.tiles ) == len( level.tiles )
+        for tile in clone.tiles:
+            assert level.get_tile_index( tile ) is None
+            assert tile.trail.tile is tile
+        assert clone.get_tile(0,0).pickup is None
+        assert clone.get_tile(0,0).get_neighbor( Direction.SOUTH ) is clone.get_tile(0,1)
+        assert clone.get_tile(5,5).get_portals() == [clone.get_tile(7,5)]
+
+        clone_graph = clone.get_path_graph()
+        assert clone_graph.out_ids == graph.out_ids
+        assert clone_graph.get_trailnode( clone.get_tile(0,1), None ).tile is clone.get_tile(0,1)
+
+        trail_type = level.get_tile(0,0).trail.type
+        clone.get_tile(0,0).trail.type = Trail.Type.EW
+        clone.move_tiles( 1, 1 )
+        assert level.get_tile(0,0).trail.type == trail_type
+        assert level.get_tile(0,0).pos == Vec3D(0,0,0)
+
+class TestLevelCache:
+
+    def test_get( self ):
+        level = Level()
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+        level.save( "cachetest.lvl" )
+
+        cache = LevelCache( 2 )
+        level1 = cache.get( "cachetest.lvl" )
+        level2 = cache.get( "cachetest.lvl" )
+        assert level1 is not level2
+        assert level1.get_tile(0,0) is not level2.get_tile(0,0)
+        assert level1.content_hash == level2.content_hash
+
+        cache.get( Level.get_filename( 0 ) )
+        cache.get( Level.get_filename( 1 ) )
+        assert cache.levels.keys() == [Level.get_filename( 0 ), Level.get_filename( 1 )]
+
+        os.remove( "cachetest.lvl" )
+
+    def test_saved_level_is_loaded_again( self ):
+        level = Level()
+        level.set_tile( Tile( Vec3D(0,0,0), Tile.Type.FLAT ) )
+        level.save( "cachetest.lvl" )
+        assert level_cache.get( "cachetest.lvl" ).get_tile(1,1) is None
+
+        level.set_tile( Tile( Vec3D(1,1,0), Tile.Type.FLAT ) )
+        level.save( "cachetest.lvl" )
+        assert level_cache.get( "cachetest.lvl" ).get_tile(1,1) is not None
+
+        level_cache.forget( "cachetest.lvl" )
+        os.remove( "cachetest.lvl" )
+
 class TestPlayfield:
 
     def test_goldcar_ranking( self ):
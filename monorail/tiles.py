@@ -4,6 +4,8 @@
 import math
 import struct
 import copy
+from array import array
+from types import InstanceType
 from random import randint
 
 import pygame
@@ -38,7 +40,7 @@ class Direction:
         return self.id <> other.id
 
     def get_opposite( self ):
-        return Direction( (self.id + 2) % 4 )
+        return Direction.OPPOSITES[ self.id ]
 
     def __hash__( self ):
         return hash( self.id )
@@ -48,6 +50,7 @@ Direction.EAST  = Direction( 1 )
 Direction.SOUTH = Direction( 2 )
 Direction.WEST  = Direction( 3 )
 Direction.ALL = [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]
+Direction.OPPOSITES = [Direction.SOUTH, Direction.WEST, Direction.NORTH, Direction.EAST]
 
 
 class Trail:
@@ -70,47 +73,11 @@ class Trail:
 
     def get_in_direction( self ):
         """returns the highest direction"""
-        if self.tile.type == Tile.Type.FLAT:
-            if self.type in [Trail.Type.NS, Trail.Type.NE, Trail.Type.NW]:
-                return Direction.NORTH
-            elif self.type in [Trail.Type.EW, Trail.Type.SE]:
-                return Direction.EAST
-            elif self.type == Trail.Type.SW:
-                return Direction.SOUTH;
-            else:
-                assert False # Trail type not defined!
-                return Direction.NORTH
-
-        elif self.tile.type in [Tile.Type.NORTH_SLOPE_BOT, Tile.Type.NORTH_SLOPE_TOP]:
-            return Direction.NORTH
-
-        elif self.tile.type in [Tile.Type.EAST_SLOPE_BOT, Tile.Type.EAST_SLOPE_TOP]:
-            return Direction.EAST
-
-        elif self.tile.type in [Tile.Type.SOUTH_SLOPE_BOT, Tile.Type.SOUTH_SLOPE_TOP]:
-            return Direction.SOUTH
-
-        elif self.tile.type in [Tile.Type.WEST_SLOPE_BOT, Tile.Type.WEST_SLOPE_TOP]:
-            return Direction.WEST
-
-        else:
-            assert False # Tile type not defined!
-            return Direction.NORTH
+        return TRAIL_IN_DIRECTIONS[ (self.tile.type, self.type) ]
 
     def get_out_direction( self ):
         """returns the lowest direction"""
-        if self.tile.type == Tile.Type.FLAT:
-            if self.type in [Trail.Type.NW, Trail.Type.EW, Trail.Type.SW]:
-                return Direction.WEST
-            elif self.type in [Trail.Type.NS, Trail.Type.SE]:
-                return Direction.SOUTH
-            elif self.type == Trail.Type.NE:
-                return Direction.EAST
-            else:
-                assert False # Trail type not defined
-                return Direction.WEST
-        else:
-            return self.get_in_direction().get_opposite();
+        return TRAIL_OUT_DIRECTIONS[ (self.tile.type, self.type) ]
 
     def is_switch( self ):
         return self.tile.type == Tile.Type.FLAT and \
@@ -160,7 +127,10 @@ class Tile:
     - neighbors
     - pickup:    None if no pickup available
     - is_selected
+    - views:     the views that draw it, attached by frame.Frame
     """
+    views = None
+
     class Type:
         FLAT, NORTH_SLOPE_TOP, NORTH_SLOPE_BOT, EAST_SLOPE_TOP, EAST_SLOPE_BOT, \
         SOUTH_SLOPE_TOP, SOUTH_SLOPE_BOT, WEST_SLOPE_TOP, WEST_SLOPE_BOT, MAX, \
@@ -186,13 +156,7 @@ class Tile:
         self.neighbors = [None, None, None, None] # North, east, south, west
 
     def get_length( self ):
-        if self.type == Tile.Type.FLAT:
-            if self.trail.type in [Trail.Type.NS, Trail.Type.EW]:
-                return 1000;
-            else:
-                return int( (0.5 * math.pi / 2.0) * 1000 )
-        else:
-            return 2300 / 2
+        return TRAIL_LENGTHS[ (self.type, self.trail.type) ]
 
     def get_angle( self ):
         if self.type == Tile.Type.FLAT:
@@ -213,64 +177,11 @@ class Tile:
         return self.get_neighbor( self.trail.get_out_direction() )
 
     def get_neighbor_offset( self, direction ):
-        if direction == Direction.NORTH:
-            offset = Vec3D(0,-1,0)
-        elif direction == Direction.EAST:
-            offset = Vec3D(1,0,0)
-        elif direction == Direction.SOUTH:
-            offset = Vec3D(0,1,0)
-        elif direction == Direction.WEST:
-            offset = Vec3D(-1,0,0)
+        """Returns the position offset of the neighbor in direction.
 
-        if self.type == Tile.Type.NORTH_SLOPE_TOP:
-            if direction == Direction.NORTH:
-                offset = Vec3D(-1,0,0)
-            elif direction in [Direction.EAST, Direction.WEST]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.NORTH_SLOPE_BOT:
-            if direction == Direction.SOUTH:
-                offset = Vec3D(1,0,0)
-            elif direction in [Direction.EAST, Direction.WEST]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.EAST_SLOPE_TOP:
-            if direction == Direction.EAST:
-                offset = Vec3D(0,1,0)
-            elif direction in [Direction.SOUTH, Direction.NORTH]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.EAST_SLOPE_BOT:
-            if direction == Direction.WEST:
-                offset = Vec3D(0,-1,0)
-            elif direction in [Direction.SOUTH, Direction.NORTH]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.SOUTH_SLOPE_TOP:
-            if direction == Direction.SOUTH:
-                offset = Vec3D(-1,2,0)
-            elif direction in [Direction.EAST, Direction.WEST]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.SOUTH_SLOPE_BOT:
-            if direction == Direction.NORTH:
-                offset = Vec3D(1,-2,0)
-            elif direction in [Direction.EAST, Direction.WEST]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.WEST_SLOPE_TOP:
-            if direction == Direction.WEST:
-                offset = Vec3D(-2,1,0)
-            elif direction in [Direction.SOUTH, Direction.NORTH]:
-                offset = Vec3D(0,0,0)
-
-        elif self.type == Tile.Type.WEST_SLOPE_BOT:
-            if direction == Direction.EAST:
-                offset = Vec3D(2,-1,0)
-            elif direction in [Direction.SOUTH, Direction.NORTH]:
-                offset = Vec3D(0,0,0)
-
-        return offset
+        The returned vector is shared, so don't modify it.
+        """
+        return NEIGHBOR_OFFSETS[ self.type ][ direction.id ]
 
     def get_center( self ):
         return ( self.pos.x * 32  + self.pos.y * 32 + 32,
@@ -278,47 +189,18 @@ class Tile:
 
     def get_screen_position( self, length ):
         """Returns tuple (x,y) of the position"""
-        in_dir = self.trail.get_in_direction()
-        out_dir = self.trail.get_out_direction()
-
-        if in_dir == Direction.NORTH:
-            if self.type == Tile.Type.NORTH_SLOPE_TOP: in_pos = Vec2D(-16, 8)
-            else: in_pos = Vec2D(-16, -8)
-        elif in_dir == Direction.EAST:
-            if self.type == Tile.Type.EAST_SLOPE_TOP: in_pos = Vec2D(16, 8)
-            else: in_pos = Vec2D(16,-8)
-        elif in_dir == Direction.SOUTH:
-            if self.type == Tile.Type.SOUTH_SLOPE_TOP: in_pos = Vec2D(16, 24)
-            else: in_pos = Vec2D(16,8)
-        elif in_dir == Direction.WEST:
-            if self.type == Tile.Type.WEST_SLOPE_TOP: in_pos = Vec2D(-16, 24)
-            else: in_pos = Vec2D(-16, 8)
-
-        if out_dir == Direction.NORTH:
-            if self.type == Tile.Type.SOUTH_SLOPE_BOT: out_pos = Vec2D(-16, -24)
-            else: out_pos = Vec2D(-16, -8)
-        elif out_dir == Direction.EAST:
-            if self.type == Tile.Type.WEST_SLOPE_BOT: out_pos = Vec2D(16, -24)
-            else: out_pos = Vec2D(16,-8)
-        elif out_dir == Direction.SOUTH:
-            if self.type == Tile.Type.NORTH_SLOPE_BOT: out_pos = Vec2D(16, -8)
-            else: out_pos = Vec2D(16,8)
-        elif out_dir == Direction.WEST:
-            if self.type == Tile.Type.EAST_SLOPE_BOT: out_pos = Vec2D(-16, -8)
-            else: out_pos = Vec2D(-16, 8)
+        path = SCREEN_PATHS[ (self.type, self.trail.type) ]
 
+        # interpolate between the two nearest samples
+        sample = length * SCREEN_PATH_SAMPLES / float( self.get_length() )
+        i = min( max( int( sample ), 0 ), SCREEN_PATH_SAMPLES - 1 )
+        interpol = sample - i
+        i *= 2
 
-        if in_dir == out_dir.get_opposite():
-            pos = (in_pos * (self.get_length() - length) + out_pos * length) / self.get_length()
-        else:
-            interpol = float(length) / float( self.get_length() )
-            pos = in_pos - in_pos * math.sin( math.pi * interpol / 2.0 )
-            pos += out_pos * (1.0 - math.cos( math.pi * interpol / 2.0))
-
-        pos += Vec2D( self.pos.x * 32  + self.pos.y * 32 + 32,
-                -self.pos.x * 16  + self.pos.y * 16 + 16 )
-
-        return pos.get_tuple()
+        return (path[i] + (path[i+2] - path[i]) * interpol \
+                + self.pos.x * 32  + self.pos.y * 32 + 32,
+                path[i+1] + (path[i+3] - path[i+1]) * interpol \
+                - self.pos.x * 16  + self.pos.y * 16 + 16)
 
     def get_possible_switches( self, from_dir = None ):
         """Returns the possible trail types"""
@@ -362,6 +244,18 @@ class Tile:
         data = in_file.read( struct.calcsize( Tile.DATA_FORMAT ) )
         data = struct.unpack( Tile.DATA_FORMAT, data )
         #print "tile load", data[0], data[1], data[2], data[3], data[4]
+        return Tile.from_data( data )
+
+    @staticmethod
+    def load_all( buf, offset, count ):
+        """Return count tiles, unpacked at once from buf at offset."""
+        data = struct.unpack_from( Tile.DATA_FORMAT[0] + Tile.DATA_FORMAT[1:] * count,
+                                   buf, offset )
+        return [Tile.from_data( data[i:i+5] ) for i in range( 0, len(data), 5 )]
+
+    @staticmethod
+    def from_data( data ):
+        """Return the tile of the unpacked DATA_FORMAT values."""
         if data[0] == Tile.Type.ENTERANCE:
             return Enterance( Vec3D(data[2], data[3], data[4]), data[1] )
         elif data[0] == Tile.Type.RAILGATE:
@@ -369,6 +263,19 @@ class Tile:
         else:
             return Tile( Vec3D(data[2], data[3], data[4]), data[0], data[1] )
 
+    def clone( self ):
+        """Return a copy with its own position and trail, but without
+        pickup and neighbors."""
+        # faster than copy.copy for these old style classes
+        tile = InstanceType( self.__class__, dict( self.__dict__ ) )
+        tile.pos = Vec3D( self.pos.x, self.pos.y, self.pos.z )
+        tile.trail = InstanceType( Trail, dict( self.trail.__dict__ ) )
+        tile.trail.tile = tile
+        tile.pickup = None
+        tile.is_selected = False
+        tile.neighbors = [None, None, None, None]
+        return tile
+
     def set_selected( self, enable ):
         self.is_selected = enable
 
@@ -421,6 +328,191 @@ class RailGate( Tile ):
         self.is_down = not self.is_down
 
 
+# Transition tables
+#
+# The direction queries only depend on the tile type and the trail type, so
+# they are calculated once here and looked up by Trail and Tile.
+
+def _calc_in_direction( tile_type, trail_type ):
+    if tile_type == Tile.Type.FLAT:
+        if trail_type in [Trail.Type.NS, Trail.Type.NE, Trail.Type.NW]:
+            return Direction.NORTH
+        elif trail_type in [Trail.Type.EW, Trail.Type.SE]:
+            return Direction.EAST
+        elif trail_type == Trail.Type.SW:
+            return Direction.SOUTH
+        else:
+            return None # Trail type not defined!
+
+    elif tile_type in [Tile.Type.NORTH_SLOPE_BOT, Tile.Type.NORTH_SLOPE_TOP]:
+        return Direction.NORTH
+
+    elif tile_type in [Tile.Type.EAST_SLOPE_BOT, Tile.Type.EAST_SLOPE_TOP]:
+        return Direction.EAST
+
+    elif tile_type in [Tile.Type.SOUTH_SLOPE_BOT, Tile.Type.SOUTH_SLOPE_TOP]:
+        return Direction.SOUTH
+
+    elif tile_type in [Tile.Type.WEST_SLOPE_BOT, Tile.Type.WEST_SLOPE_TOP]:
+        return Direction.WEST
+
+    else:
+        return None # Tile type not defined!
+
+def _calc_out_direction( tile_type, trail_type ):
+    if tile_type == Tile.Type.FLAT:
+        if trail_type in [Trail.Type.NW, Trail.Type.EW, Trail.Type.SW]:
+            return Direction.WEST
+        elif trail_type in [Trail.Type.NS, Trail.Type.SE]:
+            return Direction.SOUTH
+        elif trail_type == Trail.Type.NE:
+            return Direction.EAST
+        else:
+            return None # Trail type not defined
+    else:
+        return _calc_in_direction( tile_type, trail_type ).get_opposite()
+
+def _calc_length( tile_type, trail_type ):
+    if tile_type == Tile.Type.FLAT:
+        if trail_type in [Trail.Type.NS, Trail.Type.EW]:
+            return 1000;
+        else:
+            return int( (0.5 * math.pi / 2.0) * 1000 )
+    else:
+        return 2300 / 2
+
+def _calc_neighbor_offset( tile_type, direction ):
+    if direction == Direction.NORTH:
+        offset = Vec3D(0,-1,0)
+    elif direction == Direction.EAST:
+        offset = Vec3D(1,0,0)
+    elif direction == Direction.SOUTH:
+        offset = Vec3D(0,1,0)
+    elif direction == Direction.WEST:
+        offset = Vec3D(-1,0,0)
+
+    if tile_type == Tile.Type.NORTH_SLOPE_TOP:
+        if direction == Direction.NORTH:
+            offset = Vec3D(-1,0,0)
+        elif direction in [Direction.EAST, Direction.WEST]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.NORTH_SLOPE_BOT:
+        if direction == Direction.SOUTH:
+            offset = Vec3D(1,0,0)
+        elif direction in [Direction.EAST, Direction.WEST]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.EAST_SLOPE_TOP:
+        if direction == Direction.EAST:
+            offset = Vec3D(0,1,0)
+        elif direction in [Direction.SOUTH, Direction.NORTH]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.EAST_SLOPE_BOT:
+        if direction == Direction.WEST:
+            offset = Vec3D(0,-1,0)
+        elif direction in [Direction.SOUTH, Direction.NORTH]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.SOUTH_SLOPE_TOP:
+        if direction == Direction.SOUTH:
+            offset = Vec3D(-1,2,0)
+        elif direction in [Direction.EAST, Direction.WEST]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.SOUTH_SLOPE_BOT:
+        if direction == Direction.NORTH:
+            offset = Vec3D(1,-2,0)
+        elif direction in [Direction.EAST, Direction.WEST]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.WEST_SLOPE_TOP:
+        if direction == Direction.WEST:
+            offset = Vec3D(-2,1,0)
+        elif direction in [Direction.SOUTH, Direction.NORTH]:
+            offset = Vec3D(0,0,0)
+
+    elif tile_type == Tile.Type.WEST_SLOPE_BOT:
+        if direction == Direction.EAST:
+            offset = Vec3D(2,-1,0)
+        elif direction in [Direction.SOUTH, Direction.NORTH]:
+            offset = Vec3D(0,0,0)
+
+    return offset
+
+def _calc_screen_path( tile_type, trail_type ):
+    """Returns an array of the x,y screen offsets from the tile center, of
+    SCREEN_PATH_SAMPLES + 1 points along the trail"""
+    tile_length = TRAIL_LENGTHS[ (tile_type, trail_type) ]
+    in_dir = TRAIL_IN_DIRECTIONS[ (tile_type, trail_type) ]
+    out_dir = TRAIL_OUT_DIRECTIONS[ (tile_type, trail_type) ]
+
+    if in_dir == Direction.NORTH:
+        if tile_type == Tile.Type.NORTH_SLOPE_TOP: in_x, in_y = -16, 8
+        else: in_x, in_y = -16, -8
+    elif in_dir == Direction.EAST:
+        if tile_type == Tile.Type.EAST_SLOPE_TOP: in_x, in_y = 16, 8
+        else: in_x, in_y = 16, -8
+    elif in_dir == Direction.SOUTH:
+        if tile_type == Tile.Type.SOUTH_SLOPE_TOP: in_x, in_y = 16, 24
+        else: in_x, in_y = 16, 8
+    elif in_dir == Direction.WEST:
+        if tile_type == Tile.Type.WEST_SLOPE_TOP: in_x, in_y = -16, 24
+        else: in_x, in_y = -16, 8
+
+    if out_dir == Direction.NORTH:
+        if tile_type == Tile.Type.SOUTH_SLOPE_BOT: out_x, out_y = -16, -24
+        else: out_x, out_y = -16, -8
+    elif out_dir == Direction.EAST:
+        if tile_type == Tile.Type.WEST_SLOPE_BOT: out_x, out_y = 16, -24
+        else: out_x, out_y = 16, -8
+    elif out_dir == Direction.SOUTH:
+        if tile_type == Tile.Type.NORTH_SLOPE_BOT: out_x, out_y = 16, -8
+        else: out_x, out_y = 16, 8
+    elif out_dir == Direction.WEST:
+        if tile_type == Tile.Type.EAST_SLOPE_BOT: out_x, out_y = -16, -8
+        else: out_x, out_y = -16, 8
+
+    # plain numbers instead of Vec2D, this runs at import
+    path = array( 'f' )
+    for i in range( SCREEN_PATH_SAMPLES + 1 ):
+        length = tile_length * i / float( SCREEN_PATH_SAMPLES )
+        if in_dir == out_dir.get_opposite():
+            path.append( (in_x * (tile_length - length) + out_x * length) / tile_length )
+            path.append( (in_y * (tile_length - length) + out_y * length) / tile_length )
+        else:
+            interpol = float(length) / float( tile_length )
+            sin = math.sin( math.pi * interpol / 2.0 )
+            cos = 1.0 - math.cos( math.pi * interpol / 2.0 )
+            path.append( in_x - in_x * sin + out_x * cos )
+            path.append( in_y - in_y * sin + out_y * cos )
+
+    return path
+
+TRAIL_IN_DIRECTIONS = {}  # (tile type, trail type) -> Direction
+TRAIL_OUT_DIRECTIONS = {} # (tile type, trail type) -> Direction
+TRAIL_LENGTHS = {}        # (tile type, trail type) -> length
+NEIGHBOR_OFFSETS = []     # [tile type][direction id] -> Vec3D
+SCREEN_PATHS = {}         # (tile type, trail type) -> array of x,y screen offsets
+
+SCREEN_PATH_SAMPLES = 64
+
+for tile_type in range( Tile.Type.MAX ):
+    for trail_type in range( Trail.Type.MAX ):
+        TRAIL_LENGTHS[ (tile_type, trail_type) ] = _calc_length( tile_type, trail_type )
+
+        # Undefined combinations (a flat tile with a hill trail) are left out
+        in_dir = _calc_in_direction( tile_type, trail_type )
+        if in_dir is not None:
+            TRAIL_IN_DIRECTIONS[ (tile_type, trail_type) ] = in_dir
+            TRAIL_OUT_DIRECTIONS[ (tile_type, trail_type) ] = _calc_out_direction( tile_type, trail_type )
+
+            SCREEN_PATHS[ (tile_type, trail_type) ] = _calc_screen_path( tile_type, trail_type )
+
+    NEIGHBOR_OFFSETS.append( [_calc_neighbor_offset( tile_type, direction ) for direction in Direction.ALL] )
+
+
 class TrailPosition:
     """Specifies a position on a trail
 
@@ -646,6 +738,91 @@ class TrailNode:
         return nodes
 
 
+class PathGraph:
+    """The static graph of all trail nodes of a set of tiles.
+
+    Every (tile, in direction) pair is a node with an integer id, and the
+    out nodes of each id are calculated once with TrailNode.get_out_nodes.
+    The graph depends on the tile neighbors and portals, so it must be
+    rebuilt when those change.
+
+    Public members:
+    - trailnodes: shared TrailNode per node id
+    - out_ids: list with the out node ids per node id (None if the node
+      has no valid out nodes)
+    """
+    DIRECTIONS = Direction.ALL + [None]
+
+    def __init__( self, tiles ):
+        self.tile_indices = {}
+        self.trailnodes = []
+        for i in range( 0, len( tiles ) ):
+            self.tile_indices[ tiles[i] ] = i
+            for in_dir in PathGraph.DIRECTIONS:
+                self.trailnodes.append( TrailNode( tiles[i], in_dir ) )
+
+        self.out_ids = []
+        self.out_nodes = []
+        for trailnode in self.trailnodes:
+            outs = None
+            if trailnode.in_dir is not None or not isinstance( trailnode.tile, Enterance ):
+                try:
+                    outs = trailnode.get_out_nodes()
+                except AssertionError: # hill without in tile
+                    pass
+
+            if outs is None:
+                self.out_ids.append( None )
+                self.out_nodes.append( None )
+                continue
+
+            out_ids = [self.get_node_id( out.tile, out.in_dir ) for out in outs]
+            self.out_ids.append( out_ids )
+            self.out_nodes.append( [self.trailnodes[ out_id ] for out_id in out_ids] )
+
+    def clone( self, tiles ):
+        """Return the same graph for tiles, the clones of the tiles of this
+        graph in the same order."""
+        graph = InstanceType( PathGraph, {} )
+        graph.tile_indices = {}
+        graph.trailnodes = []
+        for i in range( 0, len( tiles ) ):
+            graph.tile_indices[ tiles[i] ] = i
+            for in_dir in PathGraph.DIRECTIONS:
+                graph.trailnodes.append( TrailNode( tiles[i], in_dir ) )
+
+        graph.out_ids = self.out_ids
+        graph.out_nodes = []
+        for out_ids in self.out_ids:
+            if out_ids is None:
+                graph.out_nodes.append( None )
+            else:
+                graph.out_nodes.append( [graph.trailnodes[ out_id ] for out_id in out_ids] )
+        return graph
+
+    def get_node_id( self, tile, in_dir ):
+        """Return the node id of tile and in direction"""
+        if in_dir is None:
+            return self.tile_indices[ tile ] * 5 + 4
+        else:
+            return self.tile_indices[ tile ] * 5 + in_dir.id
+
+    def get_trailnode( self, tile, in_dir ):
+        """Return the shared TrailNode of tile and in direction"""
+        return self.trailnodes[ self.get_node_id( tile, in_dir ) ]
+
+    def get_out_nodes( self, trailnode ):
+        """Return the shared out nodes of trailnode.
+
+        Same as trailnode.get_out_nodes(), but without distance, and the
+        returned list may not be modified.
+        """
+        out_nodes = self.out_nodes[ self.get_node_id( trailnode.tile, trailnode.in_dir ) ]
+        if out_nodes is None: # let the TrailNode raise its error
+            return trailnode.get_out_nodes()
+        return out_nodes
+
+
 class PathTree:
     """A tree that contains all path possibilities up to a certain generation.
     """
@@ -1,12 +1,15 @@
 
 import struct
 import random
+import hashlib
+from collections import OrderedDict
+from levelpack import LevelPack
 
 import pygame
 from pygame.locals import *
 import copy
 
-from tiles import Direction, Tile, TrailPosition, Enterance
+from tiles import Direction, Tile, TrailPosition, Enterance, PathGraph
 from player import *
 from pickups import *
 from event import *
@@ -23,39 +26,128 @@ def tilesort( tile1, tile2 ):
         return 0
 
 class Level:
-    """Board or map that contains the tiles and props."""
+    """Board or map that contains the tiles and props.
+
+    Public members:
+    - tiles: all tiles, sorted in drawing order
+    - content_hash: hash of the loaded level file, None when changed since
+    - revision: incremented each time tiles are added, removed or moved
+    - views: the views that draw it, attached by frame.Frame
+
+    The tiles are also indexed on their (x, y) position, so when tile
+    positions are changed from outside, update_tile_map() must be called.
+    """
+    views = None
+
     def __init__( self ):
         self.tiles = []
+        self.tile_map = {}
+        self.tile_indices = None
+        self.path_graph = None
+        self.content_hash = None
+        self.revision = 0
 
     def set_tile( self, tile ):
         self.remove_tile( tile.pos.x, tile.pos.y )
-        self.tiles.append( tile )
-
-        self.tiles.sort( tilesort )
+        self.content_hash = None
+        self.revision += 1
+        self.tiles.insert( self.get_sorted_index( tile ), tile )
+        self.tile_indices = None
+        self.path_graph = None
+        self.tile_map[ (tile.pos.x, tile.pos.y) ] = tile
+
+        # Only the new tile and the tiles it points to can get new links
+        changed_tiles = [tile]
+        for direction in Direction.ALL:
+            offset = tile.get_neighbor_offset( direction )
+            if offset.x <> 0 or offset.y <> 0:
+                neighbor = self.get_tile( tile.pos.x + offset.x, tile.pos.y + offset.y )
+                if neighbor is not None:
+                    changed_tiles.append( neighbor )
 
-        self.update_neighbors();
-        self.align_trails();
+        self.update_changed_tiles( changed_tiles, isinstance( tile, Enterance ) )
 
     def get_tile( self, x, y ):
-        for tile in self.tiles:
-            if tile.pos.x == x and tile.pos.y == y:
-                return tile
-
-        return None
+        return self.tile_map.get( (x, y) )
 
     def remove_tile( self, x, y ):
+        tile = self.tile_map.pop( (x, y), None )
+        if tile is not None:
+            self.tiles.remove( tile )
+            self.tile_indices = None
+            self.path_graph = None
+            self.content_hash = None
+            self.revision += 1
+
+            # Only the old neighbors lose their link
+            changed_tiles = [neighbor for neighbor in tile.neighbors if neighbor is not None]
+            self.update_changed_tiles( changed_tiles, isinstance( tile, Enterance ) )
+
+    def get_sorted_index( self, tile ):
+        """Return the index in tiles where tile should be inserted to keep
+        the drawing order (after tiles with the same sort order)."""
+        key = -tile.pos.x + tile.pos.y
+        low, high = 0, len( self.tiles )
+        while low < high:
+            middle = (low + high) // 2
+            other = self.tiles[ middle ]
+            if key < -other.pos.x + other.pos.y:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def update_changed_tiles( self, changed_tiles, portals_changed ):
+        """Relink and align only the tiles affected by an edit"""
+        for tile in changed_tiles:
+            self.update_tile_neighbors( tile )
+
+        if portals_changed:
+            self.update_portals()
+
+        for tile in changed_tiles:
+            tile.trail.align()
+
+    def get_tile_index( self, tile ):
+        """Return the index of tile in tiles, or None if it isn't in the level"""
+        if self.tile_indices is None:
+            self.tile_indices = {}
+            for i in range( 0, len( self.tiles ) ):
+                self.tile_indices[ self.tiles[i] ] = i
+
+        return self.tile_indices.get( tile )
+
+    def get_path_graph( self ):
+        """Return the PathGraph of this level, shared by all users"""
+        if self.path_graph is None:
+            self.path_graph = PathGraph( self.tiles )
+
+        return self.path_graph
+
+    def update_tile_map( self ):
+        """Rebuild the position index of the tiles"""
+        self.tile_map = {}
+        for tile in self.tiles:
+            self.tile_map[ (tile.pos.x, tile.pos.y) ] = tile
+        self.tile_indices = None
+        self.path_graph = None
+        self.revision += 1
+
+    def move_tiles( self, offset_x, offset_y ):
+        """Shift all tiles over the given offset"""
         for tile in self.tiles:
-            if tile.pos.x == x and tile.pos.y == y:
-                self.tiles.remove( tile )
-                self.update_neighbors()
-                self.align_trails()
-                return
+            tile.pos.x += offset_x
+            tile.pos.y += offset_y
+
+        self.update_tile_map()
+        self.content_hash = None
 
     def update_neighbors( self ):
         for tile in self.tiles:
             self.update_tile_neighbors( tile )
 
         self.update_portals()
+        self.path_graph = None
 
     def update_tile_neighbors( self, tile ):
         if tile is None: return
@@ -101,19 +193,59 @@ class Level:
             tile.save( f )
         f.close()
 
+        # the packed and cached level are outdated now
+        pack = LevelPack.get_instance()
+        if pack is not None:
+            pack.forget( filename )
+        level_cache.forget( filename )
+
     def load( self, filename ):
-        f = open( filename, "rb" )
+        """Load the level file, from the level pack when it's in there."""
+        packed = None
+        pack = LevelPack.get_instance()
+        if pack is not None:
+            packed = pack.get( filename )
+
+        if packed is not None:
+            content, content_hash = packed
+        else:
+            f = open( filename, "rb" )
+            content = f.read()
+            f.close()
+            content_hash = hashlib.md5( content ).hexdigest()
 
-        data = f.read( struct.calcsize("<i") )
-        data = struct.unpack( "<i", data )
-        self.tiles = []
-        for i in range(0, data[0]):
-            self.tiles.append( Tile.load( f ) )
+        self.load_content( content, content_hash )
 
-        f.close()
+    def load_content( self, content, content_hash = None ):
+        """Load the level from the content of a level file."""
+        count = struct.unpack_from( "<i", content )[0]
+        self.tiles = Tile.load_all( content, struct.calcsize("<i"), count )
 
+        self.update_tile_map()
         self.update_neighbors()
 
+        self.content_hash = content_hash
+
+    def clone( self ):
+        """Return a copy of this level with its own tiles.
+
+        The neighbor links and path graph are copied from this level instead
+        of searched again, and the tiles have no pickups.
+        """
+        level = Level()
+        level.tiles = [tile.clone() for tile in self.tiles]
+        for tile, tile_clone in zip( self.tiles, level.tiles ):
+            tile_clone.neighbors = [level.tiles[ self.get_tile_index( neighbor ) ]
+                                    if neighbor is not None else None
+                                    for neighbor in tile.neighbors]
+
+        level.update_tile_map()
+        level.update_portals()
+        if self.path_graph is not None:
+            level.path_graph = self.path_graph.clone( level.tiles )
+        level.content_hash = self.content_hash
+        return level
+
     def get_first_flat_tile( self ):
         for tile in self.tiles:
             if tile.type == Tile.Type.FLAT and not isinstance(tile, Enterance):
@@ -143,14 +275,51 @@ class Level:
         return portals[ random.randint( 0, len(portals)-1 ) ]
 
 
+class LevelCache:
+    """Loaded levels, so that a level file is only parsed once
+
+    get() returns a clone of the cached level, so the cached level is
+    never changed. The path graph is also built once per level. Only the
+    max_count most recently used levels are kept.
+    """
+    def __init__( self, max_count = 8 ):
+        self.max_count = max_count
+        self.clear()
+
+    def clear( self ):
+        self.levels = OrderedDict()
+
+    def get( self, filename ):
+        """Return a new Level with the content of level filename."""
+        level = self.levels.pop( filename, None )
+        if level is None:
+            level = Level()
+            level.load( filename )
+            level.get_path_graph()
+        self.levels[ filename ] = level
+
+        while len( self.levels ) > self.max_count:
+            self.levels.popitem( last = False )
+
+        return level.clone()
+
+    def forget( self, filename ):
+        """Parse level filename again on the next get, like after it's saved."""
+        self.levels.pop( filename, None )
+
+level_cache = LevelCache()
+
+
 class Playfield:
     """Contains all related to the playing area
 
     Public members:
     - level
     - goldcars
+    - views: the views that draw it, attached by frame.Frame
     """
     instance = None
+    views = None
 
     def __init__( self ):
         Playfield.instance = self
@@ -164,7 +333,7 @@ class Playfield:
         self.mirrors = []
 
     def load( self, level_filename ):
-        self.level.load(level_filename)
+        self.level = level_cache.get( level_filename )
 
 
     def add_goldcars( self, goldcar_names ):
@@ -1,5 +1,8 @@
 
 import random
+import hashlib
+
+import pygame
 
 import koon.gfx as gfx
 import koon.geo as geo
@@ -10,14 +13,53 @@ import frame as frm
 import tiles
 
 class LevelView:
+    """Draws the tiles of a level as background.
+
+    The background is baked once, and kept in background_cache for levels
+    that are loaded from file.
+    """
+    BACKGROUND_SIZE = (800, 600)
+    background_cache = None # DiskCache of the baked backgrounds, set by the game
 
     def __init__( self, model ):
         self.model = model
 
         self.background = None
 
+    def get_cache_key( self ):
+        """Return the key of the background in the cache, None if not cacheable."""
+        if self.model.content_hash is None or resman.revision is None:
+            return None
+
+        key = "%s %s %dx%d" % ((self.model.content_hash, resman.revision) + LevelView.BACKGROUND_SIZE)
+        return hashlib.md5( key ).hexdigest()
+
     def init_background( self ):
-        self.background = gfx.Surface( (800,600) )
+        key = None
+        if LevelView.background_cache is not None:
+            key = self.get_cache_key()
+
+        if key is not None:
+            filename = LevelView.background_cache.get( key, ".png" )
+            if filename is not None:
+                try:
+                    self.background = gfx.Surface( pygame.image.load( filename ).convert() )
+                    return
+                except pygame.error:
+                    pass
+
+        self.render_background()
+
+        if key is not None:
+            try:
+                tmp_filename = LevelView.background_cache.get_tmp_filename( key, ".png" )
+                pygame.image.save( self.background.pysurf, tmp_filename )
+                LevelView.background_cache.add( key, ".png" )
+            except (IOError, OSError, pygame.error):
+                pass
+
+    def render_background( self ):
+        self.background = gfx.Surface( LevelView.BACKGROUND_SIZE )
         frame = frm.Frame( self.background, 0, 0 )
         frame.X_OFFSET, frame.Y_OFFSET = 20, 300
 
@@ -58,6 +100,7 @@ class LevelView:
 
     z = property( lambda self: -8000 )
     submodels = property( lambda self: self.model.tiles )
+    static_submodels = True
 
 
 class PlayfieldView:
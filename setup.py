@@ -17,7 +17,7 @@ def find_data_files(srcdir, *wildcard):
     return file_list
 
 gfx = find_data_files('data/800x600/gfx/', '.png')
-levels = find_data_files('data/800x600/levels/', '.lvl')
+levels = find_data_files('data/800x600/levels/', '.lvl', '.pak')
 music = find_data_files('data/800x600/music/', '.ogg')
 snd = find_data_files('data/800x600/snd/', '.wav')
 